@@ -0,0 +1,119 @@
+# benchmarks/alert_ingest_bench.py
+"""
+Sustained /webhook/alert throughput: the old handler (one connection and one
+commit per alert, inline in the async handler) vs the buffered AlertWriter.
+Requests go straight into the ASGI app from `concurrency` concurrent senders;
+Postgres is simulated by sleeping for connect, commit and per-row costs.
+
+    python -m benchmarks.alert_ingest_bench [alerts] [concurrency]
+"""
+import asyncio
+import json
+import sys
+import time
+
+from fastapi import FastAPI
+
+from router import alert_router
+from services.alert_writer import AlertWriter
+
+CONNECT_SECONDS = 0.003
+COMMIT_SECONDS = 0.001
+ROW_SECONDS = 0.00001
+
+
+def single_insert(tenant_id, alert_type, message):
+    # insert_alert_event: fresh connection, one row, one commit
+    time.sleep(CONNECT_SECONDS + COMMIT_SECONDS + ROW_SECONDS)
+
+
+def bulk_insert(rows):
+    # insert_alert_events: open dedicated connection, one statement, one commit
+    time.sleep(COMMIT_SECONDS + ROW_SECONDS * len(rows))
+
+
+def build_app(writer: AlertWriter):
+    app = FastAPI()
+    alert_router.alert_writer = writer
+    app.include_router(alert_router.router)
+
+    @app.post("/webhook/alert/legacy")
+    async def legacy(payload: alert_router.AlertPayload):
+        single_insert(payload.tenant_id, payload.alert_type, payload.message)
+        return {"message": f"✅ Alert received for tenant {payload.tenant_id}"}
+
+    return app
+
+
+async def post(app, path, body: bytes) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    sent = False
+    status = 0
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def hammer(app, path, alerts, concurrency):
+    body = json.dumps({"tenant_id": "bench", "alert_type": "cpu", "message": "high load",
+                       "alert_triggered": True}).encode()
+    statuses = {}
+    remaining = iter(range(alerts))
+
+    async def sender():
+        for _ in remaining:
+            status = await post(app, path, body)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(concurrency)))
+    return time.perf_counter() - started, statuses
+
+
+def main():
+    alerts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    writer = AlertWriter(flush=bulk_insert)
+    app = build_app(writer)
+
+    elapsed, statuses = asyncio.run(hammer(app, "/webhook/alert/legacy", alerts, concurrency))
+    print(f"per-alert insert: {alerts / elapsed:9.0f} alerts/s  ({elapsed:.2f}s, {alerts} connections) {statuses}")
+
+    elapsed, statuses = asyncio.run(hammer(app, "/webhook/alert", alerts, concurrency))
+    drain_started = time.perf_counter()
+    writer.stop()
+    drained = time.perf_counter() - drain_started
+    stats = writer.stats()
+    print(f"buffered writer:  {alerts / elapsed:9.0f} alerts/s  ({elapsed:.2f}s, {stats['batches']} bulk inserts, "
+          f"drain {drained:.2f}s) {statuses} written={stats['written']}")
+
+    # a storm against a stalled database (250 ms per bulk insert) and a 1000-row buffer:
+    # the overflow gets 503 + Retry-After instead of piling up in memory
+    small = AlertWriter(flush=lambda rows: time.sleep(0.25), capacity=1000)
+    app = build_app(small)
+    elapsed, statuses = asyncio.run(hammer(app, "/webhook/alert", alerts, concurrency))
+    small.stop()
+    print(f"slow db, 1000-row buffer: {statuses} written={small.stats()['written']} "
+          f"rejected={small.stats()['rejected']}")
+
+
+if __name__ == "__main__":
+    main()
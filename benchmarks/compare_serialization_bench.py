@@ -0,0 +1,65 @@
+# benchmarks/compare_serialization_bench.py
+"""
+Serialization and transfer size of a large /compare/gsc/queries payload:
+FastAPI's default jsonable_encoder + json.dumps vs orjson, and the
+raw / gzip / brotli body sizes.
+
+    python -m benchmarks.compare_serialization_bench [queries] [days]
+"""
+import gzip
+import json
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from benchmarks.comparison_engine_bench import build_inputs
+from router.compare_router import build_gsc_comparison
+from utils.json_response import dumps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main():
+    query_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 28
+
+    _, _, columns, rows = build_inputs(query_count, days)
+    payload = {
+        "tenant_id": "bench-tenant",
+        "range1": {"start": "2024-01-01", "end": "2024-01-28"},
+        "range2": {"start": "2024-01-29", "end": "2024-02-25"},
+        "gsc_queries_daily": build_gsc_comparison(columns, rows, dim_col="query"),
+    }
+
+    legacy, legacy_s = timed(lambda: json.dumps(jsonable_encoder(payload)).encode())
+    fast, fast_s = timed(lambda: dumps(payload))
+
+    print(f"rows per range: {len(rows) // 2}")
+    print(f"jsonable_encoder + json.dumps: {legacy_s * 1000:8.1f} ms  {len(legacy):>10} bytes")
+    print(f"orjson:                        {fast_s * 1000:8.1f} ms  {len(fast):>10} bytes  "
+          f"({legacy_s / fast_s:.1f}x faster)")
+
+    gzipped, gzip_s = timed(lambda: gzip.compress(fast, compresslevel=6), repeat=3)
+    print(f"gzip (level 6):                {gzip_s * 1000:8.1f} ms  {len(gzipped):>10} bytes  "
+          f"({len(fast) / len(gzipped):.1f}x smaller)")
+    if brotli is not None:
+        compressed, brotli_s = timed(lambda: brotli.compress(fast, quality=4), repeat=3)
+        print(f"brotli (quality 4):            {brotli_s * 1000:8.1f} ms  {len(compressed):>10} bytes  "
+              f"({len(fast) / len(compressed):.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
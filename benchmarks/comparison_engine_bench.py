@@ -0,0 +1,91 @@
+# benchmarks/comparison_engine_bench.py
+"""
+Time to build the /compare/gsc queries comparison from grouped rows:
+the previous dict-loop builder vs the pandas comparison engine
+(row shape and columnar shape).
+
+    python -m benchmarks.comparison_engine_bench [queries] [days]
+"""
+import sys
+import time
+from datetime import date, timedelta
+
+from router.compare_router import GSC_METRICS, build_gsc_comparison
+
+START1 = date(2024, 1, 1)
+
+
+def legacy_build(range1_data, range2_data, dim_col=None):
+    """The dict-indexing builder the engine replaced (calendar-date alignment)."""
+    totals1 = {m: 0 for m in GSC_METRICS}
+    totals2 = {m: 0 for m in GSC_METRICS}
+    daily_comparison = []
+
+    def index_rows(rows):
+        return {(r.get(dim_col) if dim_col else "summary", r["date"]): r for r in rows}
+
+    r1_index = index_rows(range1_data)
+    r2_index = index_rows(range2_data)
+    for key in sorted(set(r1_index) | set(r2_index)):
+        row1 = r1_index.get(key, {})
+        row2 = r2_index.get(key, {})
+        daily_row = {"date": row1.get("date") or row2.get("date")}
+        if dim_col:
+            daily_row[dim_col] = row1.get(dim_col) or row2.get(dim_col)
+        for m in GSC_METRICS:
+            val1 = row1.get(m, 0) or 0
+            val2 = row2.get(m, 0) or 0
+            daily_row[m] = {
+                "range1": val1, "range2": val2, "diff": val2 - val1,
+                "pct_change": (val2 - val1) / val1 * 100 if val1 else None,
+            }
+            totals1[m] += val1
+            totals2[m] += val2
+        daily_comparison.append(daily_row)
+
+    changes = {m: (totals2[m] - totals1[m]) / totals1[m] * 100 if totals1[m] else None for m in GSC_METRICS}
+    return {"percentage_changes": changes, "daily_comparison": daily_comparison}
+
+
+def build_inputs(query_count, days):
+    start2 = START1 + timedelta(days=days)
+    range1, range2, rows = [], [], []
+    for q in range(query_count):
+        query = f"example search query {q}"
+        for d in range(days):
+            for n, start in ((1, START1), (2, start2)):
+                clicks = (q * 7 + d * 3 + n * 5) % 90
+                impressions = clicks * 12 + 40
+                metrics = {"clicks": clicks, "impressions": impressions,
+                           "ctr": clicks / impressions, "position": 7.25 + q % 20}
+                day = start + timedelta(days=d)
+                (range1 if n == 1 else range2).append({"query": query, "date": day, **metrics})
+                offsets = ((day - START1).days, (day - start2).days)
+                rows.append((query, day, n == 1, n == 2, *offsets, *metrics.values()))
+    columns = ["query", "date", "in_range1", "in_range2", "offset_1", "offset_2", *GSC_METRICS]
+    return range1, range2, columns, rows
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main():
+    query_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    range1, range2, columns, rows = build_inputs(query_count, days)
+    print(f"{query_count} queries x {days} days ({len(rows)} grouped rows)")
+
+    legacy_s = timed(lambda: legacy_build(range1, range2, "query"))
+    rows_s = timed(lambda: build_gsc_comparison(columns, rows, "query", "rows"))
+    columnar_s = timed(lambda: build_gsc_comparison(columns, rows, "query", "columnar"))
+
+    print(f"dict loops:         {legacy_s * 1000:8.0f} ms")
+    print(f"engine, rows:       {rows_s * 1000:8.0f} ms  ({legacy_s / rows_s:.1f}x)")
+    print(f"engine, columnar:   {columnar_s * 1000:8.0f} ms  ({legacy_s / columnar_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/export_formats_bench.py
+"""
+Encode time and output size of a gsc_queries_daily-shaped export as
+CSV (raw and gzip, as served through the compression middleware),
+Parquet and Arrow IPC, fed the same cursor-sized batches.
+
+    python -m benchmarks.export_formats_bench [rows]
+"""
+import gzip
+import sys
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+
+from utils.export_formats import ARROW_BATCH_ROWS, CSV_BATCH_ROWS, encode_arrow, encode_csv
+
+# Same shape as psycopg2's cursor.description items
+Column = namedtuple("Column", "name type_code")
+COLUMNS = [
+    Column("id", 23), Column("tenant_id", 25), Column("session_id", 25),
+    Column("date", 1082), Column("query", 25), Column("clicks", 23),
+    Column("impressions", 23), Column("ctr", 701), Column("position", 701),
+]
+
+
+def build_rows(row_count):
+    start = date(2023, 1, 1)
+    return [
+        (
+            i, "bench-tenant", f"bench-tenant_{i}", start + timedelta(days=i % 480),
+            f"example search query {i % 20000}", i % 90, (i % 90) * 12 + 40,
+            round((i % 90) / ((i % 90) * 12 + 40), 4), float(Decimal("7.25") + i % 20),
+        )
+        for i in range(row_count)
+    ]
+
+
+def batches(rows, batch_rows):
+    for offset in range(0, len(rows), batch_rows):
+        yield COLUMNS, rows[offset:offset + batch_rows]
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    rows = build_rows(row_count)
+    print(f"rows: {row_count}")
+
+    csv_bytes, csv_s = timed(lambda: b"".join(encode_csv(batches(rows, CSV_BATCH_ROWS))))
+    print(f"csv:          {csv_s * 1000:8.0f} ms  {len(csv_bytes):>12} bytes")
+    gz_bytes, gz_s = timed(lambda: gzip.compress(csv_bytes, compresslevel=6))
+    print(f"csv + gzip:   {(csv_s + gz_s) * 1000:8.0f} ms  {len(gz_bytes):>12} bytes")
+
+    for fmt in ("parquet", "arrow"):
+        data, seconds = timed(lambda: b"".join(encode_arrow(batches(rows, ARROW_BATCH_ROWS), fmt)))
+        print(f"{fmt + ':':<13} {seconds * 1000:8.0f} ms  {len(data):>12} bytes  "
+              f"({len(csv_bytes) / len(data):.1f}x smaller than csv)")
+
+
+if __name__ == "__main__":
+    main()
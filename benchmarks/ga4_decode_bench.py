@@ -0,0 +1,97 @@
+# benchmarks/ga4_decode_bench.py
+"""
+Per-row cost of turning a GA4 top-pages report into insert tuples:
+the old per-row dict path vs the columnar decoder.
+
+    python -m benchmarks.ga4_decode_bench [rows]
+"""
+import sys
+import time
+from datetime import date
+from itertools import repeat
+
+from google.analytics.data_v1beta.types import DimensionValue, MetricValue, Row, RunReportResponse
+
+from services.ga4_daily_fetch import GA4_REPORTS
+from utils.ga4_utils import decode_report, per_user
+
+TENANT_ID = "bench-tenant"
+SESSION_ID = "bench-session"
+FETCH_DATE = date(2024, 1, 1)
+
+
+def build_response(row_count):
+    return RunReportResponse(rows=[
+        Row(
+            dimension_values=[DimensionValue(value=f"/page/{i}")],
+            metric_values=[
+                MetricValue(value=str(100 + i % 50)),
+                MetricValue(value=str(10 + i % 7)),
+                MetricValue(value="0.42"),
+                MetricValue(value="0.58"),
+                MetricValue(value="73.5"),
+                MetricValue(value=str(300 + i % 11)),
+            ],
+        )
+        for i in range(row_count)
+    ])
+
+
+def legacy_tuples(response):
+    rows = []
+    for row in response.rows:
+        views = int(row.metric_values[0].value)
+        active_users = int(row.metric_values[1].value)
+        rows.append({
+            "tenant_id": TENANT_ID,
+            "session_id": SESSION_ID,
+            "page_path": row.dimension_values[0].value,
+            "views": views,
+            "active_users": active_users,
+            "bounce_rate": float(row.metric_values[2].value),
+            "engagement_rate": row.metric_values[3].value,
+            "avg_engagement_time": row.metric_values[4].value,
+            "event_count": int(row.metric_values[5].value),
+            "views_per_user": round(views / max(active_users, 1), 2),
+            "date": FETCH_DATE,
+        })
+    # what insert_rows did with them
+    keys = rows[0].keys()
+    return [tuple(row[key] for key in keys) for row in rows]
+
+
+def columnar_tuples(response):
+    spec = GA4_REPORTS["ga4_top_pages_daily"]
+    columns = decode_report(
+        response,
+        [column for _, column in spec["dimensions"]],
+        [(column, dtype) for _, column, dtype in spec["metrics"]],
+    )
+    columns["views_per_user"] = per_user(columns["views"], columns["active_users"])
+    # what insert_columns does with them
+    arrays = [col.tolist() for col in columns.values()]
+    row_count = len(arrays[0])
+    constants = (TENANT_ID, SESSION_ID, FETCH_DATE)
+    return list(zip(*arrays, *(repeat(value, row_count) for value in constants)))
+
+
+def bench(fn, response, repeats=5):
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(response)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+if __name__ == "__main__":
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    response = build_response(row_count)
+
+    legacy = bench(legacy_tuples, response)
+    columnar = bench(columnar_tuples, response)
+
+    print(f"rows: {row_count}")
+    print(f"legacy   : {legacy * 1000:8.1f} ms  ({legacy / row_count * 1e6:6.2f} µs/row)")
+    print(f"columnar : {columnar * 1000:8.1f} ms  ({columnar / row_count * 1e6:6.2f} µs/row)")
+    print(f"speedup  : {legacy / columnar:.1f}x")
@@ -0,0 +1,107 @@
+# benchmarks/report_dispatch_bench.py
+"""
+Report send throughput against a local SMTP stand-in: one session sending
+sequentially (the old inline loop) vs SmtpPool fan-out with 2, 4 and 8
+sessions. The stand-in accepts everything except recipients containing
+"reject", and sleeps `latency` seconds per message like a remote relay.
+
+    python -m benchmarks.report_dispatch_bench [recipients] [latency_seconds]
+"""
+import smtplib
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.report_builder import address_message, dicts_to_csv_attachment, render_report_message
+from services.report_dispatch import SmtpPool
+
+
+class StandInHandler(socketserver.StreamRequestHandler):
+    latency = 0.05
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 stand-in ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith("EHLO"):
+                self.wfile.write(b"250-stand-in\r\n250 SIZE 100000000\r\n")
+            elif command.startswith("RCPT") and "REJECT" in command:
+                self.reply("550 mailbox unavailable")
+            elif command.startswith("DATA"):
+                self.reply("354 end with <CRLF>.<CRLF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                time.sleep(self.latency)
+                self.reply("250 queued")
+            elif command.startswith("QUIT"):
+                self.reply("221 bye")
+                return
+            else:
+                # HELO, MAIL, RCPT, RSET, NOOP
+                self.reply("250 ok")
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def build_message():
+    rows = [{"date": f"2024-01-{d % 28 + 1:02d}", "query": f"query {i}", "clicks": i % 50,
+             "impressions": i % 50 * 9} for d in range(28) for i in range(100)]
+    attachments = [dicts_to_csv_attachment(rows, "GSC - Queries", f"queries_{n}.csv") for n in range(4)]
+    return render_report_message("reports@example.com", attachments)
+
+
+def run(port, recipients, rendered, connections):
+    pool = SmtpPool("127.0.0.1", port, starttls=False, size=connections)
+
+    def send(email):
+        try:
+            pool.send("reports@example.com", email, address_message(rendered, email))
+            return True
+        except smtplib.SMTPException:
+            return False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        sent = list(executor.map(send, recipients))
+    elapsed = time.perf_counter() - started
+    pool.close()
+    return elapsed, sum(sent)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    StandInHandler.latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+
+    server = StandInServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    # every 50th address is refused, to show failures stay per-recipient
+    recipients = [f"{'reject' if i % 50 == 49 else 'user'}{i}@example.com" for i in range(count)]
+    rendered = build_message()
+    print(f"{count} recipients, {len(rendered) / 1024:.0f} KB message, "
+          f"{StandInHandler.latency * 1000:.0f} ms relay latency")
+
+    baseline = None
+    for connections in (1, 2, 4, 8):
+        elapsed, sent = run(port, recipients, rendered, connections)
+        baseline = baseline or elapsed
+        print(f"{connections} connection(s): {elapsed:6.2f}s  {count / elapsed:7.1f} msg/s  "
+              f"sent {sent}/{count}  x{baseline / elapsed:.1f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 # db/db.py
 import os
+import threading
+from contextlib import contextmanager
 import psycopg2
-from psycopg2.extras import execute_values
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 from utils.gsc_utils import fetch_gsc_data
+from db.tables import index_commands
 from datetime import date, timedelta
 import uuid,json
+from itertools import repeat
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from typing import Optional,List
@@ -28,54 +33,166 @@ def get_connection():
     return psycopg2.connect(DATABASE_URL)
 
 
-def insert_gsc_summary_daily(rows):
+# Shared pool for long-running reads (streaming exports); created on first use
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 8))
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Borrows a connection from the shared pool, waiting for a free slot when
+    all DB_POOL_MAX connections are in use. The connection's transaction is
+    rolled back before it goes back to the pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(1, DB_POOL_MAX, DATABASE_URL)
+    with _pool_slots:
+        conn = _pool.getconn()
+        try:
+            yield conn
+        finally:
+            if not conn.closed:
+                conn.rollback()
+            _pool.putconn(conn)
+
+
+def insert_gsc_summary_daily(rows, cur=None):
     query = """
         INSERT INTO gsc_summary_daily 
             (date, clicks, impressions, ctr, position, tenant_id, session_id)
         VALUES %s
         ON CONFLICT (session_id) DO NOTHING
     """
-    _insert_bulk(query, rows)
+    _insert_bulk(query, rows, cur=cur)
 
 
-def insert_gsc_queries_daily(rows):
+def insert_gsc_queries_daily(rows, cur=None):
     query = """
         INSERT INTO gsc_queries_daily 
             (date, query, clicks, impressions, ctr, position, tenant_id, session_id)
         VALUES %s
         ON CONFLICT (session_id) DO NOTHING
     """
-    _insert_bulk(query, rows)
+    _insert_bulk(query, rows, cur=cur)
 
 
-def insert_gsc_pages_daily(rows):
+def insert_gsc_pages_daily(rows, cur=None):
     query = """
         INSERT INTO gsc_pages_daily 
             (date, page, clicks, impressions, ctr, position, tenant_id, session_id)
         VALUES %s
         ON CONFLICT (session_id) DO NOTHING
     """
-    _insert_bulk(query, rows)
+    _insert_bulk(query, rows, cur=cur)
 
 
-def insert_gsc_countries_daily(rows):
+def insert_gsc_countries_daily(rows, cur=None):
     query = """
         INSERT INTO gsc_countries_daily 
             (date, country, clicks, impressions, ctr, position, tenant_id, session_id)
         VALUES %s
         ON CONFLICT (session_id) DO NOTHING
     """
-    _insert_bulk(query, rows)
+    _insert_bulk(query, rows, cur=cur)
 
 
-def insert_gsc_devices_daily(rows):
+def insert_gsc_devices_daily(rows, cur=None):
     query = """
         INSERT INTO gsc_devices_daily 
             (date, device, clicks, impressions, ctr, position, tenant_id, session_id)
         VALUES %s
         ON CONFLICT (session_id) DO NOTHING
     """
-    _insert_bulk(query, rows)
+    _insert_bulk(query, rows, cur=cur)
+
+
+def insert_gsc_facts_daily(rows, cur=None):
+    query = """
+        INSERT INTO gsc_facts_daily
+            (date, query, page, country, device, clicks, impressions, ctr, position, tenant_id)
+        VALUES %s
+        ON CONFLICT (tenant_id, date, query, page, country, device) DO NOTHING
+    """
+    _insert_bulk(query, rows, cur=cur)
+
+
+# Rollup table -> dimension column derived from gsc_facts_daily (None = per-day summary)
+GSC_ROLLUPS = {
+    "gsc_summary_daily": None,
+    "gsc_queries_daily": "query",
+    "gsc_pages_daily": "page",
+    "gsc_countries_daily": "country",
+    "gsc_devices_daily": "device",
+}
+
+
+def derive_gsc_rollups(tenant_id: str, day):
+    """
+    Rebuilds the five GSC tables for one tenant/day by aggregating gsc_facts_daily.
+    ctr is recomputed from the summed clicks/impressions and position is
+    impression-weighted. GSC omits anonymized queries from query-dimension rows,
+    so derived totals can be lower than what the API reports without dimensions.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for table, dim_col in GSC_ROLLUPS.items():
+                dim_select = f"{dim_col}, " if dim_col else ""
+                dim_group = f", {dim_col}" if dim_col else ""
+                kind = dim_col or "summary"
+                session_key = f"md5({dim_col})" if dim_col else "'0'"
+                cur.execute(f"DELETE FROM {table} WHERE tenant_id = %s AND date = %s", (tenant_id, day))
+                cur.execute(f"""
+                    INSERT INTO {table}
+                        (date, {dim_select}clicks, impressions, ctr, position, tenant_id, session_id)
+                    SELECT
+                        date, {dim_select}
+                        SUM(clicks),
+                        SUM(impressions),
+                        SUM(clicks)::float / NULLIF(SUM(impressions), 0),
+                        SUM(position * impressions) / NULLIF(SUM(impressions), 0),
+                        tenant_id,
+                        tenant_id || '_' || date || '_{kind}_' || {session_key}
+                    FROM gsc_facts_daily
+                    WHERE tenant_id = %s AND date = %s
+                    GROUP BY tenant_id, date{dim_group}
+                    ON CONFLICT (session_id) DO NOTHING
+                """, (tenant_id, day))
+            bump_data_generation(cur, [tenant_id])
+        conn.commit()
+    print(f"🧮 Derived GSC rollups for tenant {tenant_id} on {day} from gsc_facts_daily")
+
+
+@contextmanager
+def _write_cursor(cur=None):
+    """
+    Yields `cur` when the caller runs its own transaction (nothing is committed
+    here), otherwise a cursor on a new connection committed on exit.
+    """
+    if cur is not None:
+        yield cur
+        return
+    with get_connection() as conn:
+        with conn.cursor() as own:
+            yield own
+        conn.commit()
+
+
+def delete_tenant_day(tenant_id: str, day, tables, cur=None):
+    """
+    Clears one tenant/day from `tables` so a rebuild re-inserts it instead of
+    the ON CONFLICT (session_id) DO NOTHING inserts keeping the old rows.
+    Pass the cursor of the transaction that re-inserts the day, so a failed
+    rebuild rolls the delete back with it.
+    """
+    with _write_cursor(cur) as cur:
+        for table in tables:
+            cur.execute(f"DELETE FROM {table} WHERE tenant_id = %s AND date = %s", (tenant_id, day))
+        bump_data_generation(cur, [tenant_id])
 
 
 def insert_ga4_top_pages_daily(rows):
@@ -153,11 +270,23 @@ def insert_cloudflare_summary(tenant_id: str, session_id: str, date: str, page_v
         VALUES (%s, %s, %s, %s, %s)
         ON CONFLICT DO NOTHING;
     """, (tenant_id, session_id, date, page_views, visits))
+    bump_data_generation(cur, [tenant_id])
     conn.commit()
     cur.close()
     conn.close()
 
 
+def insert_cloudflare_summary_daily(rows, cur=None):
+    query = """
+        INSERT INTO cloudflare_summary_daily
+            (tenant_id, session_id, date, page_views, visits)
+        VALUES %s
+        ON CONFLICT DO NOTHING
+    """
+    columns = ["tenant_id", "session_id", "date", "page_views", "visits"]
+    _insert_bulk(query, rows, columns, cur)
+
+
 def get_or_create_tenant(tenant_id: str):
     query = """
         INSERT INTO tenants (tenant_id)
@@ -174,7 +303,267 @@ def get_or_create_tenant(tenant_id: str):
 ensure_tenant_exists = get_or_create_tenant
 
 
-def _insert_bulk(query, rows, columns=None):
+def bump_data_generation(cur, tenant_ids):
+    """
+    Advances each tenant's data generation. Call on the inserting cursor so the
+    bump commits with the rows; cached reads keyed on the old generation go stale.
+    """
+    for tenant_id in sorted(set(tenant_ids)):
+        cur.execute("""
+            INSERT INTO tenant_data_versions (tenant_id, generation, updated_at)
+            VALUES (%s, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (tenant_id) DO UPDATE
+                SET generation = tenant_data_versions.generation + 1,
+                    updated_at = CURRENT_TIMESTAMP
+        """, (tenant_id,))
+
+
+def get_data_version(tenant_id: str):
+    """
+    Returns (generation, updated_at) of the tenant's data; (0, None) before any ingest.
+    Read on every cached request, so it borrows a pooled connection.
+    """
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT generation, updated_at FROM tenant_data_versions WHERE tenant_id = %s",
+                (tenant_id,),
+            )
+            row = cur.fetchone()
+    return row if row else (0, None)
+
+
+def upsert_standard_comparison(tenant_id: str, endpoint: str, params_key: str,
+                               window_name: str, generation: int, payload: str):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO standard_comparisons
+                    (tenant_id, endpoint, params_key, window_name, generation, payload, computed_at)
+                VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                ON CONFLICT (tenant_id, endpoint, params_key) DO UPDATE
+                    SET window_name = EXCLUDED.window_name,
+                        generation = EXCLUDED.generation,
+                        payload = EXCLUDED.payload,
+                        computed_at = EXCLUDED.computed_at
+                    WHERE standard_comparisons.generation <= EXCLUDED.generation
+            """, (tenant_id, endpoint, params_key, window_name, generation, payload))
+        conn.commit()
+
+
+def prune_standard_comparisons(tenant_id: str, generation: int):
+    """Drops a tenant's precomputed comparisons from older generations (windows that moved on)."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM standard_comparisons WHERE tenant_id = %s AND generation < %s",
+                (tenant_id, generation),
+            )
+        conn.commit()
+
+
+def get_standard_comparison(tenant_id: str, endpoint: str, params_key: str):
+    """
+    Returns the precomputed JSON text for exactly these parameters, or None.
+    A payload computed from an older data generation is never returned.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT s.payload
+                FROM standard_comparisons s
+                JOIN tenant_data_versions v
+                  ON v.tenant_id = s.tenant_id AND v.generation = s.generation
+                WHERE s.tenant_id = %s AND s.endpoint = %s AND s.params_key = %s
+            """, (tenant_id, endpoint, params_key))
+            row = cur.fetchone()
+    return row[0] if row else None
+
+
+def create_report_job(job_id: str, tenant_id: str, request: dict, emails):
+    """
+    Records a queued report job submitted by `tenant_id`, with one queued
+    delivery per distinct recipient.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO report_jobs (job_id, tenant_id, status, request) VALUES (%s, %s, 'queued', %s)",
+                (job_id, tenant_id, json.dumps(request)),
+            )
+            execute_values(
+                cur,
+                "INSERT INTO report_deliveries (job_id, email, status) VALUES %s ON CONFLICT DO NOTHING",
+                [(job_id, email, "queued") for email in emails],
+            )
+        conn.commit()
+
+
+def set_report_job_status(job_id: str, status: str, error: str = None, finished: bool = False):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE report_jobs
+                SET status = %s, error = %s,
+                    finished_at = CASE WHEN %s THEN CURRENT_TIMESTAMP ELSE finished_at END
+                WHERE job_id = %s
+            """, (status, error, finished, job_id))
+        conn.commit()
+
+
+def record_report_delivery(job_id: str, email: str, status: str, error: str = None, attempts: int = 1):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE report_deliveries
+                SET status = %s, error = %s, attempts = %s,
+                    sent_at = CASE WHEN %s = 'sent' THEN CURRENT_TIMESTAMP ELSE sent_at END
+                WHERE job_id = %s AND email = %s
+            """, (status, error, attempts, status, job_id, email))
+        conn.commit()
+
+
+def get_report_job(job_id: str, tenant_id: str):
+    """The job row with its deliveries, or None unless `tenant_id` submitted it."""
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT job_id, status, error, created_at, finished_at
+                FROM report_jobs WHERE job_id = %s AND tenant_id = %s
+            """, (job_id, tenant_id))
+            job = cur.fetchone()
+            if job is None:
+                return None
+            cur.execute("""
+                SELECT email, status, error, attempts, sent_at
+                FROM report_deliveries WHERE job_id = %s ORDER BY email
+            """, (job_id,))
+            job["deliveries"] = cur.fetchall()
+    return dict(job)
+
+
+# Next run of a digest after now(): the next day / Monday / 1st of the month at %(hour)s UTC
+NEXT_DIGEST_RUN_SQL = """
+    (date_trunc(CASE cadence WHEN 'daily' THEN 'day' WHEN 'weekly' THEN 'week' ELSE 'month' END,
+                now() AT TIME ZONE 'UTC')
+     + CASE cadence WHEN 'daily' THEN interval '1 day' WHEN 'weekly' THEN interval '7 days'
+                    ELSE interval '1 month' END
+     + make_interval(hours => %(hour)s)) AT TIME ZONE 'UTC'
+"""
+
+DIGEST_COLUMNS = """
+    id, name, recipients, tables, tenant_id, cadence, enabled, next_run_at,
+    last_run_at, last_period_start, last_period_end, last_artifact
+"""
+
+
+def create_digest(tenant_id: str, name, recipients, tables, cadence, hour: int) -> dict:
+    """Creates a digest of `tenant_id`'s data, owned by that tenant."""
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"""
+                INSERT INTO report_digests (name, recipients, tables, tenant_id, cadence, next_run_at)
+                SELECT name, recipients, tables, tenant_id, cadence, {NEXT_DIGEST_RUN_SQL}
+                FROM (SELECT %(name)s AS name, %(recipients)s::text[] AS recipients,
+                             %(tables)s::text[] AS tables, %(tenant_id)s AS tenant_id,
+                             %(cadence)s AS cadence) d
+                RETURNING {DIGEST_COLUMNS}
+            """, {"name": name, "recipients": recipients, "tables": tables,
+                  "tenant_id": tenant_id, "cadence": cadence, "hour": hour})
+            digest = cur.fetchone()
+        conn.commit()
+    return dict(digest)
+
+
+def list_digests(tenant_id: str) -> list:
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"SELECT {DIGEST_COLUMNS} FROM report_digests WHERE tenant_id = %s ORDER BY id",
+                        (tenant_id,))
+            return [dict(row) for row in cur.fetchall()]
+
+
+def get_digest(digest_id: int, tenant_id: str):
+    """The digest if `tenant_id` owns it, else None."""
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"SELECT {DIGEST_COLUMNS} FROM report_digests WHERE id = %s AND tenant_id = %s",
+                        (digest_id, tenant_id))
+            row = cur.fetchone()
+    return dict(row) if row else None
+
+
+def delete_digest(digest_id: int, tenant_id: str) -> bool:
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM report_digests WHERE id = %s AND tenant_id = %s", (digest_id, tenant_id))
+            deleted = cur.rowcount > 0
+        conn.commit()
+    return deleted
+
+
+def claim_due_digests(lease_seconds: int) -> list:
+    """
+    Leases every due digest for `lease_seconds` and returns them, in one
+    statement. SKIP LOCKED and the lease let several workers poll without
+    building a digest twice; next_run_at only moves once a run succeeds
+    (finish_digest_run), so a failed or crashed run is picked up again.
+    """
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"""
+                UPDATE report_digests
+                SET claimed_until = now() + make_interval(secs => %(lease)s)
+                WHERE id IN (
+                    SELECT id FROM report_digests
+                    WHERE enabled AND next_run_at <= now()
+                      AND (claimed_until IS NULL OR claimed_until <= now())
+                    ORDER BY next_run_at
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING {DIGEST_COLUMNS}
+            """, {"lease": lease_seconds})
+            digests = [dict(row) for row in cur.fetchall()]
+        conn.commit()
+    return digests
+
+
+def finish_digest_run(digest_id: int, hour: int):
+    """Schedules a digest's next period after a successful run and drops its lease."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                UPDATE report_digests
+                SET next_run_at = {NEXT_DIGEST_RUN_SQL}, last_run_at = now(), claimed_until = NULL
+                WHERE id = %(id)s
+            """, {"id": digest_id, "hour": hour})
+        conn.commit()
+
+
+def retry_digest_run(digest_id: int, delay_seconds: int):
+    """Keeps a failed digest due, but not claimable again for `delay_seconds`."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE report_digests
+                SET claimed_until = now() + make_interval(secs => %s)
+                WHERE id = %s
+            """, (delay_seconds, digest_id))
+        conn.commit()
+
+
+def record_digest_artifact(digest_id: int, period_start, period_end, path: str):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE report_digests
+                SET last_period_start = %s, last_period_end = %s, last_artifact = %s
+                WHERE id = %s
+            """, (period_start, period_end, path, digest_id))
+        conn.commit()
+
+
+def _insert_bulk(query, rows, columns=None, cur=None):
     if not rows:
         print("⚠️ No rows to insert for:", query.split()[2])
         return
@@ -183,10 +572,9 @@ def _insert_bulk(query, rows, columns=None):
     else:
         values = [tuple(row.values()) for row in rows]
     print(f"✅ Inserting {len(values)} rows into table: {query.split()[2]}")
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            execute_values(cur, query, values)
-        conn.commit()
+    with _write_cursor(cur) as cur:
+        execute_values(cur, query, values)
+        bump_data_generation(cur, (row.get("tenant_id") for row in rows))
 
 
 def insert_rows(table_name, rows):
@@ -209,9 +597,44 @@ def insert_rows(table_name, rows):
     with get_connection() as conn:
         with conn.cursor() as cur:
             execute_values(cur, insert_query, values)
+            bump_data_generation(cur, (row.get("tenant_id") for row in rows))
         conn.commit()
 
 
+def insert_columns(table_name, columns, constants=None, cur=None):
+    """
+    Bulk insert column arrays (lists or numpy arrays of equal length).
+    `constants` are values shared by every row (tenant_id, session_id, date)
+    and are repeated at tuple-build time instead of being stored per row.
+    Runs in the caller's transaction when given its `cur`.
+    """
+    constants = constants or {}
+    arrays = [col.tolist() if hasattr(col, "tolist") else list(col) for col in columns.values()]
+    row_count = len(arrays[0]) if arrays else 0
+    if not row_count:
+        print(f"⚠️ No rows to insert for: {table_name}")
+        return
+
+    names = ', '.join([*columns, *constants])
+    insert_query = f"""
+        INSERT INTO {table_name} ({names})
+        VALUES %s
+        ON CONFLICT DO NOTHING
+    """
+
+    values = list(zip(*arrays, *(repeat(value, row_count) for value in constants.values())))
+
+    if "tenant_id" in constants:
+        tenant_ids = [constants["tenant_id"]]
+    elif "tenant_id" in columns:
+        tenant_ids = arrays[list(columns).index("tenant_id")]
+    else:
+        tenant_ids = []
+
+    with _write_cursor(cur) as cur:
+        execute_values(cur, insert_query, values, page_size=1000)
+        bump_data_generation(cur, tenant_ids)
+
 
 def insert_alert_event(tenant_id: str, alert_type: str, message: str | None):
     conn = get_connection()  
@@ -228,6 +651,40 @@ def insert_alert_event(tenant_id: str, alert_type: str, message: str | None):
     conn.close()
 
 
+# The alert writer's own connection: exports hold pooled connections for whole
+# downloads, and alert flushes must not queue behind them
+_alert_conn = None
+_alert_conn_lock = threading.Lock()
+
+
+def insert_alert_events(rows):
+    """
+    Bulk insert of (tenant_id, alert_type, message, received_at) tuples in one
+    statement and one commit, on a dedicated connection outside the shared pool.
+    A failed insert drops the connection; the next call reconnects.
+    """
+    global _alert_conn
+    if not rows:
+        return
+    with _alert_conn_lock:
+        if _alert_conn is None or _alert_conn.closed:
+            _alert_conn = get_connection()
+        try:
+            with _alert_conn.cursor() as cur:
+                execute_values(cur, """
+                    INSERT INTO alert_events (tenant_id, alert_type, alert_data, created_at)
+                    VALUES %s
+                """, [
+                    (tenant_id, alert_type, json.dumps({"message": message}), received_at)
+                    for tenant_id, alert_type, message, received_at in rows
+                ], page_size=1000)
+            _alert_conn.commit()
+        except Exception:
+            _alert_conn.close()
+            _alert_conn = None
+            raise
+
+
 def setup_tables():
     commands = [
         """
@@ -328,6 +785,22 @@ def setup_tables():
         )
         """,
         """
+        CREATE TABLE IF NOT EXISTS gsc_facts_daily (
+            id BIGSERIAL PRIMARY KEY,
+            date DATE NOT NULL,
+            query TEXT,
+            page TEXT,
+            country TEXT,
+            device TEXT,
+            clicks INT,
+            impressions INT,
+            ctr FLOAT,
+            position FLOAT,
+            tenant_id TEXT NOT NULL,
+            UNIQUE (tenant_id, date, query, page, country, device)
+        )
+        """,
+        """
         CREATE TABLE IF NOT EXISTS ga4_top_pages_daily (
             id SERIAL PRIMARY KEY,
             tenant_id TEXT,
@@ -399,13 +872,105 @@ def setup_tables():
             page_views INTEGER,
             visits INTEGER
         );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS tenant_data_versions (
+            tenant_id TEXT PRIMARY KEY,
+            generation BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS fetch_completions (
+            lock_key BIGINT PRIMARY KEY,
+            completed_at TIMESTAMPTZ NOT NULL
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS backfill_chunks (
+            id SERIAL PRIMARY KEY,
+            tenant_id TEXT NOT NULL,
+            source TEXT NOT NULL,
+            chunk_start DATE NOT NULL,
+            chunk_end DATE NOT NULL,
+            completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (tenant_id, source, chunk_start, chunk_end)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS standard_comparisons (
+            tenant_id TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            params_key TEXT NOT NULL,
+            window_name TEXT NOT NULL,
+            generation BIGINT NOT NULL,
+            payload TEXT NOT NULL,
+            computed_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (tenant_id, endpoint, params_key)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS report_jobs (
+            job_id TEXT PRIMARY KEY,
+            tenant_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            request JSONB,
+            error TEXT,
+            created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMPTZ
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS report_deliveries (
+            job_id TEXT NOT NULL REFERENCES report_jobs (job_id) ON DELETE CASCADE,
+            email TEXT NOT NULL,
+            status TEXT NOT NULL,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            sent_at TIMESTAMPTZ,
+            PRIMARY KEY (job_id, email)
+        );
+        """,
         """
+        CREATE TABLE IF NOT EXISTS report_digests (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL,
+            recipients TEXT[] NOT NULL,
+            tables TEXT[] NOT NULL,
+            tenant_id TEXT NOT NULL,
+            cadence TEXT NOT NULL,
+            enabled BOOLEAN NOT NULL DEFAULT TRUE,
+            next_run_at TIMESTAMPTZ NOT NULL,
+            last_run_at TIMESTAMPTZ,
+            last_period_start DATE,
+            last_period_end DATE,
+            last_artifact TEXT,
+            claimed_until TIMESTAMPTZ,
+            created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_report_digests_due ON report_digests (next_run_at) WHERE enabled",
+        "CREATE INDEX IF NOT EXISTS idx_report_digests_tenant ON report_digests (tenant_id)"
     ]
     conn = get_connection()
     cur = conn.cursor()
     for command in commands:
         cur.execute(command)
     conn.commit()
+
+    # pg_trgm backs the "dimension contains" filters; it needs extension privileges
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        conn.commit()
+        trigram = True
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"⚠️ pg_trgm unavailable, skipping trigram indexes: {e}")
+        trigram = False
+
+    for command in index_commands(trigram):
+        cur.execute(command)
+    conn.commit()
     cur.close()
     conn.close()
 
@@ -474,3 +1039,36 @@ def fetch_all(table_name, tenant_id):
             columns = [desc[0] for desc in cur.description]
             result = [dict(zip(columns, row)) for row in rows]
             return result
+
+
+def iter_query_batches(query, params=None, batch_rows: int = 5000, pooled: bool = False):
+    """
+    Runs `query` on a server-side (named) cursor and yields (columns, rows)
+    batches of up to `batch_rows`, so a result set never sits in memory whole.
+    `columns` is the cursor description (items have .name and .type_code).
+    The first batch is yielded even when the result is empty, so callers always get the columns.
+    With `pooled`, the connection is borrowed from the shared pool.
+    """
+    if pooled:
+        with pooled_connection() as conn:
+            yield from _iter_batches(conn, query, params, batch_rows)
+        return
+
+    conn = get_connection()
+    try:
+        yield from _iter_batches(conn, query, params, batch_rows)
+    finally:
+        conn.close()
+
+
+def _iter_batches(conn, query, params, batch_rows):
+    with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+        cur.itersize = batch_rows
+        cur.execute(query, params)
+        rows = cur.fetchmany(batch_rows)
+        columns = cur.description
+        yield columns, rows
+        while len(rows) == batch_rows:
+            rows = cur.fetchmany(batch_rows)
+            if rows:
+                yield columns, rows
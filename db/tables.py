@@ -0,0 +1,156 @@
+# db/tables.py
+
+# Daily fact tables served by the API.
+# dimension: the per-row breakdown column (None for per-day summary tables)
+# metrics: numeric columns, with how they roll up across rows (see rollup_sql):
+#   "sum"                      additive counts
+#   ("ratio", num, den)        recomputed as SUM(num) / SUM(den)
+#   ("weighted", weight)       average weighted by another column
+# sort_metric: metric with a keyset index, the usual "top rows" ordering
+GSC_METRICS_SPEC = {
+    "clicks": "sum",
+    "impressions": "sum",
+    "ctr": ("ratio", "clicks", "impressions"),
+    "position": ("weighted", "impressions"),
+}
+
+# GA4 page/country/browser rows carry no session count, so their session-based
+# rates are weighted by active users, the closest available volume
+DATA_TABLES = {
+    "gsc_summary_daily": {
+        "dimension": None,
+        "metrics": GSC_METRICS_SPEC,
+        "sort_metric": "clicks",
+    },
+    "gsc_queries_daily": {
+        "dimension": "query",
+        "metrics": GSC_METRICS_SPEC,
+        "sort_metric": "clicks",
+    },
+    "gsc_pages_daily": {
+        "dimension": "page",
+        "metrics": GSC_METRICS_SPEC,
+        "sort_metric": "clicks",
+    },
+    "gsc_countries_daily": {
+        "dimension": "country",
+        "metrics": GSC_METRICS_SPEC,
+        "sort_metric": "clicks",
+    },
+    "gsc_devices_daily": {
+        "dimension": "device",
+        "metrics": GSC_METRICS_SPEC,
+        "sort_metric": "clicks",
+    },
+    "ga4_top_pages_daily": {
+        "dimension": "page_path",
+        "metrics": {
+            "views": "sum", "active_users": "sum",
+            "views_per_user": ("ratio", "views", "active_users"),
+            "avg_engagement_time": ("weighted", "active_users"), "event_count": "sum",
+            "bounce_rate": ("weighted", "active_users"),
+            "engagement_rate": ("weighted", "active_users"),
+        },
+        "sort_metric": "views",
+    },
+    "ga4_traffic_acquisition_daily": {
+        "dimension": "source_medium",
+        "metrics": {
+            "sessions": "sum", "engaged_sessions": "sum",
+            "engagement_rate": ("ratio", "engaged_sessions", "sessions"),
+            "avg_engagement_time": ("weighted", "sessions"),
+            "events_per_session": ("ratio", "total_events", "sessions"),
+            "total_events": "sum",
+        },
+        "sort_metric": "sessions",
+    },
+    "ga4_country_metrics_daily": {
+        "dimension": "country",
+        "metrics": {
+            "active_users": "sum", "new_users": "sum", "engaged_sessions": "sum",
+            "engaged_sessions_per_user": ("ratio", "engaged_sessions", "active_users"),
+            "engagement_rate": ("weighted", "active_users"),
+            "avg_engagement_time": ("weighted", "active_users"), "event_count": "sum",
+        },
+        "sort_metric": "active_users",
+    },
+    "ga4_browser_metrics_daily": {
+        "dimension": "browser",
+        "metrics": {
+            "active_users": "sum", "new_users": "sum", "engaged_sessions": "sum",
+            "engaged_sessions_per_user": ("ratio", "engaged_sessions", "active_users"),
+            "engagement_rate": ("weighted", "active_users"),
+            "avg_engagement_time": ("weighted", "active_users"), "event_count": "sum",
+        },
+        "sort_metric": "active_users",
+    },
+    "cloudflare_summary_daily": {
+        "dimension": None,
+        "metrics": {"page_views": "sum", "visits": "sum"},
+        "sort_metric": "page_views",
+    },
+}
+
+
+def rollup_sql(table: str, metric: str, where: str = None, prefix: str = "") -> str:
+    """
+    SQL aggregate of `metric` over a group of `table` rows. Ratios are
+    recomputed from their summed parts and averages weighted by volume, never
+    averaged row by row. `where` adds a FILTER to every aggregate; `prefix`
+    qualifies the columns (e.g. "t.").
+    """
+    rollup = DATA_TABLES[table]["metrics"][metric]
+    agg_filter = f" FILTER (WHERE {where})" if where else ""
+
+    def total(expr):
+        return f"SUM({expr}){agg_filter}"
+
+    if rollup == "sum":
+        return total(f"{prefix}{metric}")
+    if rollup[0] == "ratio":
+        _, num, den = rollup
+        return f"(({total(f'{prefix}{num}')})::float8 / NULLIF({total(f'{prefix}{den}')}, 0))"
+    _, weight = rollup
+    return (f"(({total(f'{prefix}{metric} * {prefix}{weight}')})::float8 "
+            f"/ NULLIF({total(f'{prefix}{weight}')}, 0))")
+
+
+# URL path under /data -> table (matches the existing export URLs)
+TABLE_PATHS = {
+    "gsc/summary": "gsc_summary_daily",
+    "gsc/queries": "gsc_queries_daily",
+    "gsc/pages": "gsc_pages_daily",
+    "gsc/countries": "gsc_countries_daily",
+    "gsc/devices": "gsc_devices_daily",
+    "ga4/top_pages": "ga4_top_pages_daily",
+    "ga4/traffic": "ga4_traffic_acquisition_daily",
+    "ga4/countries": "ga4_country_metrics_daily",
+    "ga4/browsers": "ga4_browser_metrics_daily",
+    "cloudflare/summary": "cloudflare_summary_daily",
+}
+
+
+def index_commands(trigram: bool = False) -> list:
+    """CREATE INDEX statements backing keyset pagination and dimension filters."""
+    commands = []
+    for table, spec in DATA_TABLES.items():
+        commands.append(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_tenant_date_id "
+            f"ON {table} (tenant_id, date DESC, id DESC)"
+        )
+        commands.append(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_tenant_{spec['sort_metric']}_id "
+            f"ON {table} (tenant_id, {spec['sort_metric']} DESC, id DESC)"
+        )
+        dim_col = spec["dimension"]
+        if dim_col:
+            commands.append(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_tenant_{dim_col} "
+                f"ON {table} (tenant_id, {dim_col})"
+            )
+            if trigram:
+                commands.append(
+                    f"CREATE INDEX IF NOT EXISTS idx_{table}_{dim_col}_trgm "
+                    f"ON {table} USING gin ({dim_col} gin_trgm_ops)"
+                )
+    return commands
@@ -11,7 +11,7 @@ if (!getToken()) {
   window.location.href = "login.html";
 }
 
-async function compareData(platform) {
+async function compareData(platform, page = 1) {
   const start1 = document.getElementById("start1").value;
   const end1 = document.getElementById("end1").value;
   const start2 = document.getElementById("start2").value;
@@ -30,7 +30,7 @@ async function compareData(platform) {
         "Content-Type": "application/json",
         "Authorization": "Bearer " + getToken(),
       },
-      body: JSON.stringify({ start1, end1, start2, end2 }),
+      body: JSON.stringify({ start1, end1, start2, end2, page }),
     });
 
     if (!response.ok) {
@@ -225,13 +225,21 @@ new Chart(ctxLineComparison, {
 
 // ---------------- GSC ----------------
 else if (platform.toLowerCase() === "gsc") {
+  const changeCell = (pct) => {
+    if (pct === null || pct === undefined) return "<td>-</td>";
+    const color = pct > 0 ? "green" : (pct < 0 ? "red" : "black");
+    return `<td style="color:${color}; font-weight:bold;">${pct > 0 ? "+" : ""}${pct.toFixed(2)}%</td>`;
+  };
+  const fmt = (v) => (typeof v === "number" && !Number.isInteger(v)) ? v.toFixed(3) : (v ?? "-");
+  let pager = null;
+
   for (const [tableName, tableData] of Object.entries(data.comparison || data)) {
     const tableTitle = tableName.replace(/^gsc_|_daily$/g, "").toUpperCase();
     html += `<h4 style="margin-top: 20px; margin-bottom: 10px;">${tableTitle}</h4>`;
 
-    // Extract keys (exclude "date")
-    const sampleData = tableData.range1?.data?.[0] || {};
-    let keys = Object.keys(sampleData).filter(k => k.toLowerCase() !== "date");
+    const metrics = Object.keys(tableData.totals || {});
+    const range1Label = `${tableData.range1?.start ?? "-"} – ${tableData.range1?.end ?? "-"}`;
+    const range2Label = `${tableData.range2?.start ?? "-"} – ${tableData.range2?.end ?? "-"}`;
 
     // ✅ Add chart containers
     const chartId1 = `${platform}_${tableName}_range1_chart`;
@@ -240,91 +248,87 @@ else if (platform.toLowerCase() === "gsc") {
       <div style="display:flex; gap:20px; margin-bottom:20px;">
         <div style="flex:1;">
           <canvas id="${chartId1}" width="220" height="220"></canvas>
-          <p style="text-align:center; font-size:13px;">
-            ${tableData.range1?.start ?? "-"} – ${tableData.range1?.end ?? "-"}
-          </p>
+          <p style="text-align:center; font-size:13px;">${range1Label}</p>
         </div>
         <div style="flex:1;">
           <canvas id="${chartId2}" width="220" height="220"></canvas>
-          <p style="text-align:center; font-size:13px;">
-            ${tableData.range2?.start ?? "-"} – ${tableData.range2?.end ?? "-"}
-          </p>
+          <p style="text-align:center; font-size:13px;">${range2Label}</p>
         </div>
       </div>
     `;
 
+    // Rows: ranked dimension values, or the day-aligned series for the summary table
+    let label, rows;
+    if (tableData.top) {
+      label = tableName.replace(/ies$/, "y").replace(/s$/, "").toUpperCase();
+      const dimKey = Object.keys(tableData.top.rows[0] || {}).find(k => !metrics.includes(k));
+      rows = tableData.top.rows.map(r => ({ label: r[dimKey] ?? "-", metrics: r }));
+      pager = tableData.top;
+    } else {
+      label = "DAY";
+      const daily = tableData.daily || { offset: [] };
+      rows = daily.offset.map((offset, i) => ({
+        label: `Day ${offset + 1} (${daily.date_1[i] ?? "-"} / ${daily.date_2[i] ?? "-"})`,
+        metrics: Object.fromEntries(metrics.map(m => [m, {
+          range1: daily[`${m}_1`][i], range2: daily[`${m}_2`][i], pct_change: daily[`${m}_pct`][i],
+        }])),
+      }));
+    }
+    rows.unshift({ label: "TOTAL", metrics: tableData.totals });
+
     // Build table
     html += `<table border="1" cellspacing="0" cellpadding="5" style="width:100%; border-collapse:collapse;">`;
-    html += `<thead><tr><th>S.NO</th><th>DATE RANGE</th>`;
-    keys.forEach((key) => html += `<th>${key.replace(/_/g," ").toUpperCase()}</th>`);
+    html += `<thead><tr><th>${label}</th><th>DATE RANGE</th>`;
+    metrics.forEach((m) => html += `<th>${m.toUpperCase()}</th>`);
     html += `</tr></thead><tbody>`;
 
-    const rows = Math.max(tableData.range1?.data?.length || 0, tableData.range2?.data?.length || 0);
-    for (let i = 0; i < rows; i++) {
-      const r1 = tableData.range1?.data?.[i] || {};
-      const r2 = tableData.range2?.data?.[i] || {};
-
-      html += `<tr><td rowspan="3" style="text-align:center; vertical-align:middle;">${i+1}</td>`;
-
-      // Range 1
-      html += `<td>${tableData.range1?.start ?? "-"} – ${tableData.range1?.end ?? "-"}</td>`;
-      keys.forEach(k => html += `<td>${r1[k] ?? "-"}</td>`);
-      html += `</tr>`;
-
-      // Range 2
-      html += `<tr><td>${tableData.range2?.start ?? "-"} – ${tableData.range2?.end ?? "-"}</td>`;
-      keys.forEach(k => html += `<td>${r2[k] ?? "-"}</td>`);
+    rows.forEach(row => {
+      html += `<tr><td rowspan="3" style="text-align:center; vertical-align:middle;">${row.label}</td>`;
+      html += `<td>${range1Label}</td>`;
+      metrics.forEach(m => html += `<td>${fmt(row.metrics[m]?.range1)}</td>`);
+      html += `</tr><tr><td>${range2Label}</td>`;
+      metrics.forEach(m => html += `<td>${fmt(row.metrics[m]?.range2)}</td>`);
+      html += `</tr><tr><td>% Change</td>`;
+      metrics.forEach(m => html += changeCell(row.metrics[m]?.pct_change));
       html += `</tr>`;
+    });
+    html += `</tbody></table>`;
 
-      // % Change
-      html += `<tr><td>% Change</td>`;
-      keys.forEach(k => {
-        const v1 = r1[k] || 0, v2 = r2[k] || 0;
-        let change = (v1 && v2) ? ((v2 - v1) / v1) * 100 : (v2 ? 100 : (v1 ? -100 : 0));
-        if (isNaN(change)) change = 0;
-        const color = change > 0 ? "green" : (change < 0 ? "red" : "black");
-        html += `<td style="color:${color}; font-weight:bold;">${change.toFixed(2)}%</td>`;
-      });
-      html += `</tr>`;
+    if (tableData.top && tableData.top.total_rows > tableData.top.rows.length) {
+      const shown = (tableData.top.page - 1) * tableData.top.limit + tableData.top.rows.length;
+      html += `<p style="font-size:13px;">Top ${shown} of ${tableData.top.total_rows} by change in ${tableData.top.metric}</p>`;
     }
-    html += `</tbody></table>`;
 
-    // ✅ Generate Pie Charts (all columns in ONE pie chart per range)
+    // ✅ Generate Pie Charts (range totals of each metric)
     setTimeout(() => {
-      const ctx1 = document.getElementById(chartId1);
-      const ctx2 = document.getElementById(chartId2);
-
-      if (ctx1 && tableData.range1?.data?.length) {
-        const totals1 = keys.map(k => tableData.range1.data.reduce((s,row)=>s+(row[k]||0),0));
-        new Chart(ctx1, {
+      [[chartId1, "range1", "Range 1"], [chartId2, "range2", "Range 2"]].forEach(([chartId, key, title]) => {
+        const ctx = document.getElementById(chartId);
+        if (!ctx || !metrics.length) return;
+        new Chart(ctx, {
           type: "pie",
           data: {
-            labels: keys,
+            labels: metrics,
             datasets: [{
-              data: totals1,
+              data: metrics.map(m => tableData.totals[m][key] || 0),
               backgroundColor: ["#FF6384","#36A2EB","#FFCE56","#4BC0C0","#9966FF","#FF9F40","#8BC34A"]
             }]
           },
-          options: { plugins:{ title:{ display:true, text:`${tableTitle} - Range 1` }, legend:{ position:"bottom" } } }
+          options: { plugins:{ title:{ display:true, text:`${tableTitle} - ${title}` }, legend:{ position:"bottom" } } }
         });
-      }
-
-      if (ctx2 && tableData.range2?.data?.length) {
-        const totals2 = keys.map(k => tableData.range2.data.reduce((s,row)=>s+(row[k]||0),0));
-        new Chart(ctx2, {
-          type: "pie",
-          data: {
-            labels: keys,
-            datasets: [{
-              data: totals2,
-              backgroundColor: ["#FF6384","#36A2EB","#FFCE56","#4BC0C0","#9966FF","#FF9F40","#8BC34A"]
-            }]
-          },
-          options: { plugins:{ title:{ display:true, text:`${tableTitle} - Range 2` }, legend:{ position:"bottom" } } }
-        });
-      }
+      });
     }, 300);
   }
+
+  // Pages move through every dimension table's ranking together
+  if (pager) {
+    const lastPage = Math.max(1, ...Object.values(data.comparison || {})
+      .filter(t => t.top).map(t => Math.ceil(t.top.total_rows / t.top.limit)));
+    html += `<div style="margin-top:20px;">`;
+    if (pager.page > 1) html += `<button onclick="compareData('gsc', ${pager.page - 1})">Previous</button> `;
+    html += `Page ${pager.page} of ${lastPage} `;
+    if (pager.page < lastPage) html += `<button onclick="compareData('gsc', ${pager.page + 1})">Next</button>`;
+    html += `</div>`;
+  }
 }
 
 
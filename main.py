@@ -10,15 +10,20 @@ from router.auth_router import router as auth_router
 from router.alert_router import router as alert_router
 from router.tenant_router import router as tenant_router
 from router import report_router
+from services.report_dispatch import report_dispatcher
+from services.digests import digest_scheduler
+from services.alert_writer import alert_writer
 
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse  
 from router import compare_router
 from fastapi.middleware.cors import CORSMiddleware
 from router import data_router 
+from utils.json_response import FastJSONResponse
+from utils.compression import CompressionMiddleware
 load_dotenv()
 
-app = FastAPI(title="SEO Analytics API")
+app = FastAPI(title="SEO Analytics API", default_response_class=FastJSONResponse)
 
 # ⏳ Initialize DB Tables
 setup_tables()
@@ -35,6 +40,20 @@ app.include_router(data_router.router)
 app.include_router(compare_router.router)
 app.include_router(report_router.router)
 
+
+@app.on_event("startup")
+def start_background_work():
+    digest_scheduler.start()
+
+
+@app.on_event("shutdown")
+def drain_background_work():
+    # alerts first: they are acknowledged but not yet stored
+    alert_writer.stop(timeout=10)
+    digest_scheduler.stop()
+    report_dispatcher.stop()
+
+
 app.mount("/static", StaticFiles(directory="frontend"), name="static")
 @app.get("/")
 def root():
@@ -52,3 +71,6 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+# 🗜️ gzip/brotli for payloads over 1 KB
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
@@ -2,7 +2,7 @@
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from db.db import insert_alert_event
+from services.alert_writer import BufferFull, alert_writer
 
 router = APIRouter()
 
@@ -13,15 +13,13 @@ class AlertPayload(BaseModel):
     message: str
     alert_triggered: bool
 
-# Webhook endpoint for receiving alerts
-@router.post("/webhook/alert")
+# Webhook endpoint for receiving alerts; events are written in batches by alert_writer
+@router.post("/webhook/alert", status_code=202)
 async def receive_alert(payload: AlertPayload):
     try:
-        insert_alert_event(
-            tenant_id=payload.tenant_id,
-            alert_type=payload.alert_type,
-            message=payload.message,
-        )
-        return {"message": f"✅ Alert received for tenant {payload.tenant_id}"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"❌ Error: {str(e)}")
+        alert_writer.submit(payload.tenant_id, payload.alert_type, payload.message)
+    except BufferFull:
+        # backpressure: the sender retries instead of this process buffering without bound
+        raise HTTPException(status_code=503, detail="Alert buffer full, retry later",
+                            headers={"Retry-After": "1"})
+    return {"message": f"✅ Alert received for tenant {payload.tenant_id}"}
@@ -1,10 +1,14 @@
 # router/compare_router.py
 from fastapi import APIRouter, Depends,Query, HTTPException
-from pydantic import BaseModel
-from db.db import get_connection
+from pydantic import BaseModel, Field
+from db.db import get_connection, get_standard_comparison
+from db.tables import DATA_TABLES, GSC_METRICS_SPEC, TABLE_PATHS, rollup_sql
 from utils.jwt_utils import get_current_user
+from utils.response_cache import cached_json, params_key
 from models.token_data import TokenData
-from datetime import date
+from services import comparison_engine
+from services.standard_comparisons import SOURCE_LAG_DAYS, standard_windows
+from datetime import date, timedelta
 import psycopg2.extras
 
 router = APIRouter(prefix="/compare", tags=["Comparison"])
@@ -18,105 +22,193 @@ class CompareRequest(BaseModel):
     end2: date
 
 
-# ---------------- GSC ---------------- #
-def fetch_gsc_data(conn, tenant_id, table, dim_col, start_date, end_date):
+def precomputed_or(tenant_id, endpoint, params, compute):
     """
-    Fetch GSC data for a table and date range.
-    Returns list of dicts.
+    Cache-miss path of the compare endpoints: a standard window (last 7 days,
+    last 28, month, YoY) is read from what the post-ingest refresh stored for
+    exactly these parameters; anything else is computed on demand.
     """
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    payload = get_standard_comparison(tenant_id, endpoint, params_key(params))
+    return payload if payload is not None else compute()
 
-    dims = f"{dim_col}," if dim_col else ""
-    group_by = f"GROUP BY {dims} date"
 
-    cursor.execute(f"""
-        SELECT 
-            {dims} date,
-            SUM(clicks) AS clicks,
-            SUM(impressions) AS impressions,
-            AVG(ctr) AS ctr,
-            AVG(position) AS position
-        FROM {table}
-        WHERE tenant_id=%s AND date BETWEEN %s AND %s
-        {group_by}
-        ORDER BY date
-    """, (tenant_id, start_date, end_date))
+@router.get("/windows")
+def compare_windows(current_user: TokenData = Depends(get_current_user)):
+    """Today's standard windows per source; requests using them are served precomputed."""
+    return {source: standard_windows(lag_days=lag) for source, lag in SOURCE_LAG_DAYS.items()}
 
-    rows = cursor.fetchall()
-    cursor.close()
-    return rows
 
+# ---------------- GSC ---------------- #
+GSC_METRICS = ["clicks", "impressions", "ctr", "position"]
 
-def calculate_percentage_change(val1, val2):
-    if val1 is None or val2 is None:
-        return None
-    if val1 == 0:
-        return None
-    return ((val2 - val1) / val1) * 100
+
+def fetch_gsc_comparison(conn, tenant_id, table, dim_col, req: CompareRequest):
+    """
+    One pass over the union of both ranges, grouped by (dimension, date).
+    Each group is tagged with the range(s) its date falls in and its day
+    offset from both range starts; since the date is part of the group key,
+    one aggregate per metric serves both ranges.
+    Returns (column names, row tuples) for the comparison engine.
+    """
+    dims = f"{dim_col}, " if dim_col else ""
+    in_range1 = "date BETWEEN %(start1)s AND %(end1)s"
+    in_range2 = "date BETWEEN %(start2)s AND %(end2)s"
+
+    aggregates = [f"{rollup_sql(table, m)} AS {m}" for m in GSC_METRICS]
+
+    query = f"""
+        SELECT
+            {dims}date,
+            {in_range1} AS in_range1,
+            {in_range2} AS in_range2,
+            date - %(start1)s::date AS offset_1,
+            date - %(start2)s::date AS offset_2,
+            {", ".join(aggregates)}
+        FROM {table}
+        WHERE tenant_id = %(tenant_id)s AND ({in_range1} OR {in_range2})
+        GROUP BY {dims}date
+    """
+    with conn.cursor() as cur:
+        cur.execute(query, {
+            "tenant_id": tenant_id,
+            "start1": req.start1, "end1": req.end1, "start2": req.start2, "end2": req.end2,
+        })
+        return [desc[0] for desc in cur.description], cur.fetchall()
 
 
-def build_gsc_comparison(range1_data, range2_data, dim_col=None):
+def build_gsc_comparison(columns, rows, dim_col=None, shape="rows"):
     """
-    Calculates percentage changes and daily comparison per row.
-    Returns a dict with percentage_changes and daily_comparison array.
+    Aligns both ranges by (dimension, day offset) in the comparison engine.
+    shape="rows" returns each range's rows, percentage_changes and the
+    per-row daily_comparison; shape="columnar" returns percentage_changes
+    and the aligned table as one list per column.
     """
-    # Aggregate total metrics for range1 and range2
-    totals1 = {"clicks": 0, "impressions": 0, "ctr": 0, "position": 0}
-    totals2 = {"clicks": 0, "impressions": 0, "ctr": 0, "position": 0}
+    range1, range2 = comparison_engine.split_ranges(rows, columns, dim_col, GSC_METRICS)
+    aligned = comparison_engine.align_ranges(range1, range2, dim_col, GSC_METRICS)
+    changes = comparison_engine.percentage_changes(aligned, GSC_METRICS, GSC_METRICS_SPEC)
 
-    daily_comparison = []
+    if shape == "columnar":
+        return {
+            "percentage_changes": changes,
+            "columns": comparison_engine.to_columns(aligned, dim_col, GSC_METRICS),
+        }
+    return {
+        "range1_data": comparison_engine.range_records(range1, dim_col, GSC_METRICS),
+        "range2_data": comparison_engine.range_records(range2, dim_col, GSC_METRICS),
+        "percentage_changes": changes,
+        "daily_comparison": comparison_engine.to_rows(aligned, dim_col, GSC_METRICS),
+    }
 
-    # Helper: index rows by dimension + date for alignment
-    def index_rows(rows):
-        idx = {}
-        for r in rows:
-            key = (r.get(dim_col) if dim_col else "summary", r["date"])
-            idx[key] = r
-        return idx
 
-    r1_index = index_rows(range1_data)
-    r2_index = index_rows(range2_data)
+def fetch_gsc_summary(conn, tenant_id, table, dim_col, req):
+    """
+    Per-dimension totals of both ranges in one pass (FILTER per range),
+    plus the table-wide totals from the same scan via GROUPING SETS.
+    Returns (totals row, one page of dimension rows ranked by the absolute
+    change of req.metric, total number of dimension values).
+    """
+    in_range1 = "date BETWEEN %(start1)s AND %(end1)s"
+    in_range2 = "date BETWEEN %(start2)s AND %(end2)s"
+
+    aggregates, comparisons = [], []
+    for m in GSC_METRICS:
+        aggregates.append(f"COALESCE({rollup_sql(table, m, in_range1)}, 0) AS {m}_1")
+        aggregates.append(f"COALESCE({rollup_sql(table, m, in_range2)}, 0) AS {m}_2")
+        comparisons.append(f"{m}_1, {m}_2, {m}_2 - {m}_1 AS {m}_diff, "
+                           f"CASE WHEN {m}_1 <> 0 THEN ({m}_2 - {m}_1)::float8 * 100 / {m}_1 END AS {m}_pct")
+
+    if dim_col:
+        grouping = f"{dim_col} AS dimension, GROUPING({dim_col}) = 1 AS is_total"
+        group_by = f"GROUP BY GROUPING SETS (({dim_col}), ())"
+    else:
+        grouping = "NULL AS dimension, TRUE AS is_total"
+        group_by = ""
+
+    query = f"""
+        WITH grouped AS (
+            SELECT {grouping}, {", ".join(aggregates)}
+            FROM {table}
+            WHERE tenant_id = %(tenant_id)s AND ({in_range1} OR {in_range2})
+            {group_by}
+        ), ranked AS (
+            SELECT dimension, is_total, {", ".join(comparisons)},
+                   COUNT(*) FILTER (WHERE NOT is_total) OVER () AS total_rows,
+                   ROW_NUMBER() OVER (
+                       ORDER BY is_total DESC, ABS({req.metric}_2 - {req.metric}_1) DESC, dimension COLLATE "C"
+                   ) AS rn
+            FROM grouped
+        )
+        SELECT * FROM ranked
+        WHERE is_total OR rn BETWEEN %(first)s AND %(last)s
+        ORDER BY rn
+    """
+    # rn 1 is the totals row, so dimension rows start at 2
+    first = (req.page - 1) * req.limit + 2
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute(query, {
+            "tenant_id": tenant_id,
+            "start1": req.start1, "end1": req.end1, "start2": req.start2, "end2": req.end2,
+            "first": first, "last": first + req.limit - 1,
+        })
+        rows = cur.fetchall()
 
-    all_keys = set(r1_index.keys()) | set(r2_index.keys())
+    totals = next((r for r in rows if r["is_total"]), None)
+    page = [r for r in rows if not r["is_total"]]
+    total_rows = rows[0]["total_rows"] if rows else 0
+    return totals, page, total_rows
 
-    for key in sorted(all_keys):
-        row1 = r1_index.get(key, {})
-        row2 = r2_index.get(key, {})
 
-        daily_row = {
-            "date": row1.get("date") or row2.get("date"),
+def metric_changes(row) -> dict:
+    return {
+        m: {
+            "range1": row[f"{m}_1"] if row else 0,
+            "range2": row[f"{m}_2"] if row else 0,
+            "diff": row[f"{m}_diff"] if row else 0,
+            "pct_change": row[f"{m}_pct"] if row else None,
         }
-        if dim_col:
-            daily_row[dim_col] = row1.get(dim_col) or row2.get(dim_col)
-
-        for metric in ["clicks", "impressions", "ctr", "position"]:
-            val1 = row1.get(metric, 0) or 0
-            val2 = row2.get(metric, 0) or 0
-            daily_row[metric] = {
-                "range1": val1,
-                "range2": val2,
-                "diff": val2 - val1,
-                "pct_change": calculate_percentage_change(val1, val2),
-            }
-            totals1[metric] += val1
-            totals2[metric] += val2
+        for m in GSC_METRICS
+    }
 
-        daily_comparison.append(daily_row)
 
-    # Overall percentage changes
-    percentage_changes = {
-        metric: calculate_percentage_change(totals1[metric], totals2[metric])
-        for metric in totals1
-    }
+class GscCompareRequest(CompareRequest):
+    # summary: totals plus a ranked page of dimension values (daily series for the summary table)
+    # rows / columnar: every aligned (dimension, day offset) row
+    shape: str = Field("summary", pattern="^(summary|rows|columnar)$")
+    metric: str = Field("clicks", pattern="^(clicks|impressions|ctr|position)$")
+    limit: int = Field(25, ge=1, le=500)
+    page: int = Field(1, ge=1)
 
-    return {
-        "percentage_changes": percentage_changes,
-        "daily_comparison": daily_comparison
+
+@router.post("/gsc")
+def compare_gsc(req: GscCompareRequest, current_user: TokenData = Depends(get_current_user)):
+    params = req.model_dump()
+    return cached_json(current_user.tenant_id, "compare/gsc", params, lambda: precomputed_or(
+        current_user.tenant_id, "compare/gsc", params, lambda: compute_gsc_comparison(req, current_user)))
+
+
+def build_gsc_summary(conn, tenant_id, table, dim_col, req: GscCompareRequest) -> dict:
+    totals, page, total_rows = fetch_gsc_summary(conn, tenant_id, table, dim_col, req)
+    summary = {
+        "totals": metric_changes(totals),
+        "percentage_changes": {m: totals[f"{m}_pct"] if totals else None for m in GSC_METRICS},
     }
+    if dim_col:
+        summary["top"] = {
+            "metric": req.metric,
+            "page": req.page,
+            "limit": req.limit,
+            "total_rows": total_rows,
+            "rows": [{dim_col: row["dimension"], **metric_changes(row)} for row in page],
+        }
+    else:
+        # one row per day: the day-offset aligned series is small enough to send whole
+        columns, rows = fetch_gsc_comparison(conn, tenant_id, table, None, req)
+        comparison = build_gsc_comparison(columns, rows, None, "columnar")
+        summary["daily"] = comparison["columns"]
+    return summary
 
 
-@router.post("/gsc")
-def compare_gsc(req: CompareRequest, current_user: TokenData = Depends(get_current_user)):
+def compute_gsc_comparison(req: GscCompareRequest, current_user: TokenData):
     conn = get_connection()
     try:
         tenant_id = current_user.tenant_id
@@ -132,14 +224,24 @@ def compare_gsc(req: CompareRequest, current_user: TokenData = Depends(get_curre
         result = {}
 
         for name, (table, dim_col) in tables.items():
-            range1 = fetch_gsc_data(conn, tenant_id, table, dim_col, req.start1, req.end1)
-            range2 = fetch_gsc_data(conn, tenant_id, table, dim_col, req.start2, req.end2)
+            ranges = {
+                "range1": {"start": req.start1, "end": req.end1},
+                "range2": {"start": req.start2, "end": req.end2},
+            }
+            if req.shape == "summary":
+                result[name] = {**ranges, **build_gsc_summary(conn, tenant_id, table, dim_col, req)}
+                continue
+
+            columns, rows = fetch_gsc_comparison(conn, tenant_id, table, dim_col, req)
+            comparison = build_gsc_comparison(columns, rows, dim_col, req.shape)
 
-            comparison = build_gsc_comparison(range1, range2, dim_col)
+            if req.shape == "columnar":
+                result[name] = {**ranges, **comparison}
+                continue
 
             result[name] = {
-                "range1": {"start": req.start1, "end": req.end1, "data": range1},
-                "range2": {"start": req.start2, "end": req.end2, "data": range2},
+                "range1": {**ranges["range1"], "data": comparison["range1_data"]},
+                "range2": {**ranges["range2"], "data": comparison["range2_data"]},
                 "percentage_changes": comparison["percentage_changes"],
                 "daily_comparison": comparison["daily_comparison"],
             }
@@ -148,22 +250,122 @@ def compare_gsc(req: CompareRequest, current_user: TokenData = Depends(get_curre
     finally:
         conn.close()
 
+# ---------------- Top movers ---------------- #
+# Dimension tables movers can rank (URL path -> table), and each source's default
+MOVERS_TABLES = {path: TABLE_PATHS[path] for path in ("gsc/queries", "gsc/pages", "ga4/top_pages")}
+DEFAULT_MOVERS_TABLE = {"gsc": "queries", "ga4": "top_pages"}
+
+
+class MoversRequest(CompareRequest):
+    table: str = None
+    metric: str = None
+    limit: int = Field(10, ge=1, le=100)
+
+
+def fetch_movers(conn, tenant_id, table, metric, req: MoversRequest):
+    """
+    Per-dimension totals of `metric` for both ranges in one pass: the union of
+    the two ranges is scanned once (an OR of two date ranges on the
+    tenant/date index), each range is summed with FILTER, and ROW_NUMBER
+    windows pick the top `limit` gains and losses.
+    """
+    dim_col = DATA_TABLES[table]["dimension"]
+    query = f"""
+        WITH totals AS (
+            SELECT
+                {dim_col} AS dimension,
+                COALESCE(SUM({metric}) FILTER (WHERE date BETWEEN %(start1)s AND %(end1)s), 0) AS range1,
+                COALESCE(SUM({metric}) FILTER (WHERE date BETWEEN %(start2)s AND %(end2)s), 0) AS range2
+            FROM {table}
+            WHERE tenant_id = %(tenant_id)s
+              AND (date BETWEEN %(start1)s AND %(end1)s OR date BETWEEN %(start2)s AND %(end2)s)
+            GROUP BY {dim_col}
+        ), ranked AS (
+            SELECT
+                dimension, range1, range2,
+                range2 - range1 AS diff,
+                CASE WHEN range1 <> 0 THEN (range2 - range1) * 100.0 / range1 END AS pct_change,
+                ROW_NUMBER() OVER (ORDER BY range2 - range1 DESC, dimension) AS gain_rank,
+                ROW_NUMBER() OVER (ORDER BY range2 - range1 ASC, dimension) AS loss_rank
+            FROM totals
+        )
+        SELECT dimension, range1, range2, diff, pct_change, gain_rank, loss_rank
+        FROM ranked
+        WHERE (gain_rank <= %(limit)s AND diff > 0) OR (loss_rank <= %(limit)s AND diff < 0)
+    """
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute(query, {
+            "tenant_id": tenant_id, "limit": req.limit,
+            "start1": req.start1, "end1": req.end1, "start2": req.start2, "end2": req.end2,
+        })
+        rows = cur.fetchall()
+
+    def shape(row):
+        return {dim_col: row["dimension"], "range1": row["range1"], "range2": row["range2"],
+                "diff": row["diff"], "pct_change": row["pct_change"]}
+
+    winners = sorted((r for r in rows if r["diff"] > 0), key=lambda r: r["gain_rank"])
+    losers = sorted((r for r in rows if r["diff"] < 0), key=lambda r: r["loss_rank"])
+    return [shape(r) for r in winners], [shape(r) for r in losers]
+
+
+def compute_movers(source: str, req: MoversRequest, current_user: TokenData):
+    name = req.table or DEFAULT_MOVERS_TABLE[source]
+    table = MOVERS_TABLES.get(f"{source}/{name}")
+    if not table:
+        raise HTTPException(status_code=400, detail=f"Movers are not available for {source}/{name}")
+    spec = DATA_TABLES[table]
+    metric = req.metric or spec["sort_metric"]
+    if spec["metrics"].get(metric) != "sum":
+        raise HTTPException(status_code=400, detail=f"{metric} is not a summable metric of {source}/{name}")
+
+    conn = get_connection()
+    try:
+        winners, losers = fetch_movers(conn, current_user.tenant_id, table, metric, req)
+    finally:
+        conn.close()
+
+    return {
+        "platform": source,
+        "table": name,
+        "metric": metric,
+        "range1": {"start": req.start1, "end": req.end1},
+        "range2": {"start": req.start2, "end": req.end2},
+        "winners": winners,
+        "losers": losers,
+    }
+
+
+@router.post("/gsc/movers")
+def compare_gsc_movers(req: MoversRequest, current_user: TokenData = Depends(get_current_user)):
+    """Top-K queries or pages (`table`) by gain and by loss of `metric` (default clicks) between the ranges."""
+    return cached_json(current_user.tenant_id, "compare/gsc/movers", req.model_dump(),
+                       lambda: compute_movers("gsc", req, current_user))
+
+
+@router.post("/ga4/movers")
+def compare_ga4_movers(req: MoversRequest, current_user: TokenData = Depends(get_current_user)):
+    """Same as /gsc/movers for GA4 pages (`table=top_pages`, default metric views)."""
+    return cached_json(current_user.tenant_id, "compare/ga4/movers", req.model_dump(),
+                       lambda: compute_movers("ga4", req, current_user))
+
+
 # ---------------- GA4 ---------------- #
 def fetch_ga4_data(conn, tenant_id, start_date, end_date, table_name):
     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
         if table_name == "ga4_top_pages_daily":
             cur.execute(
-                """
+                f"""
                 SELECT
                     date,
                     page_path,
                     SUM(views) AS total_views,
                     SUM(active_users) AS total_active_users,
-                    AVG(views_per_user) AS avg_views_per_user,
-                    AVG(avg_engagement_time) AS avg_engagement_time,
+                    {rollup_sql("ga4_top_pages_daily", "views_per_user")} AS avg_views_per_user,
+                    {rollup_sql("ga4_top_pages_daily", "avg_engagement_time")} AS avg_engagement_time,
                     SUM(event_count) AS total_event_count,
-                    AVG(bounce_rate) AS avg_bounce_rate,
-                    AVG(engagement_rate) AS avg_engagement_rate
+                    {rollup_sql("ga4_top_pages_daily", "bounce_rate")} AS avg_bounce_rate,
+                    {rollup_sql("ga4_top_pages_daily", "engagement_rate")} AS avg_engagement_rate
                 FROM ga4_top_pages_daily
                 WHERE tenant_id = %s
                     AND date BETWEEN %s AND %s
@@ -176,14 +378,14 @@ def fetch_ga4_data(conn, tenant_id, start_date, end_date, table_name):
 
         elif table_name == "ga4_traffic_acquisition_daily":
             cur.execute(
-                """
+                f"""
                 SELECT
                     date,
                     SUM(sessions) AS total_sessions,
                     SUM(engaged_sessions) AS total_engaged_sessions,
-                    AVG(engagement_rate) AS avg_engagement_rate,
-                    AVG(avg_engagement_time) AS avg_engagement_time,
-                    AVG(events_per_session) AS avg_events_per_session,
+                    {rollup_sql("ga4_traffic_acquisition_daily", "engagement_rate")} AS avg_engagement_rate,
+                    {rollup_sql("ga4_traffic_acquisition_daily", "avg_engagement_time")} AS avg_engagement_time,
+                    {rollup_sql("ga4_traffic_acquisition_daily", "events_per_session")} AS avg_events_per_session,
                     SUM(total_events) AS total_events
                 FROM ga4_traffic_acquisition_daily
                 WHERE tenant_id = %s
@@ -197,16 +399,16 @@ def fetch_ga4_data(conn, tenant_id, start_date, end_date, table_name):
 
         elif table_name == "ga4_country_metrics_daily":
             cur.execute(
-                """
+                f"""
                 SELECT
                     date,
                     country,
                     SUM(active_users) AS total_active_users,
                     SUM(new_users) AS total_new_users,
                     SUM(engaged_sessions) AS total_engaged_sessions,
-                    AVG(engaged_sessions_per_user) AS avg_engaged_sessions_per_user,
-                    AVG(engagement_rate) AS avg_engagement_rate,
-                    AVG(avg_engagement_time) AS avg_engagement_time,
+                    {rollup_sql("ga4_country_metrics_daily", "engaged_sessions_per_user")} AS avg_engaged_sessions_per_user,
+                    {rollup_sql("ga4_country_metrics_daily", "engagement_rate")} AS avg_engagement_rate,
+                    {rollup_sql("ga4_country_metrics_daily", "avg_engagement_time")} AS avg_engagement_time,
                     SUM(event_count) AS total_event_count
                 FROM ga4_country_metrics_daily
                 WHERE tenant_id = %s
@@ -220,16 +422,16 @@ def fetch_ga4_data(conn, tenant_id, start_date, end_date, table_name):
 
         elif table_name == "ga4_browser_metrics_daily":
             cur.execute(
-                """
+                f"""
                 SELECT
                     date,
                     browser,
                     SUM(active_users) AS total_active_users,
                     SUM(new_users) AS total_new_users,
                     SUM(engaged_sessions) AS total_engaged_sessions,
-                    AVG(engaged_sessions_per_user) AS avg_engaged_sessions_per_user,
-                    AVG(engagement_rate) AS avg_engagement_rate,
-                    AVG(avg_engagement_time) AS avg_engagement_time,
+                    {rollup_sql("ga4_browser_metrics_daily", "engaged_sessions_per_user")} AS avg_engaged_sessions_per_user,
+                    {rollup_sql("ga4_browser_metrics_daily", "engagement_rate")} AS avg_engagement_rate,
+                    {rollup_sql("ga4_browser_metrics_daily", "avg_engagement_time")} AS avg_engagement_time,
                     SUM(event_count) AS total_event_count
                 FROM ga4_browser_metrics_daily
                 WHERE tenant_id = %s
@@ -263,6 +465,12 @@ def compare_ga4(
     req: CompareRequest,
     current_user: TokenData = Depends(get_current_user),
 ):
+    params = req.model_dump()
+    return cached_json(current_user.tenant_id, "compare/ga4", params, lambda: precomputed_or(
+        current_user.tenant_id, "compare/ga4", params, lambda: compute_ga4_comparison(req, current_user)))
+
+
+def compute_ga4_comparison(req: CompareRequest, current_user: TokenData):
     conn = get_connection()
     try:
         tables = [
@@ -312,6 +520,12 @@ def compare_cloudflare(
     req: CompareRequest,
     current_user: TokenData = Depends(get_current_user),
 ):
+    params = req.model_dump()
+    return cached_json(current_user.tenant_id, "compare/cloudflare", params, lambda: precomputed_or(
+        current_user.tenant_id, "compare/cloudflare", params, lambda: compute_cloudflare_comparison(req, current_user)))
+
+
+def compute_cloudflare_comparison(req: CompareRequest, current_user: TokenData):
     conn = get_connection()
     try:
         range1 = fetch_cloudflare_summary(conn, current_user.tenant_id, req.start1, req.end1)
@@ -323,3 +537,117 @@ def compare_cloudflare(
         }
     finally:
         conn.close()
+
+
+# ---------------- N-period trends ---------------- #
+# Per-day rollup table each source's trend is computed from
+PERIOD_TABLES = {
+    "gsc": "gsc_summary_daily",
+    "ga4": "ga4_traffic_acquisition_daily",
+    "cloudflare": "cloudflare_summary_daily",
+}
+
+
+class Period(BaseModel):
+    start: date
+    end: date
+
+
+class PeriodsRequest(BaseModel):
+    # either explicit periods, or `count` back-to-back periods of `period_days` ending at `end`
+    periods: list[Period] = None
+    period_days: int = Field(None, ge=1, le=366)
+    count: int = Field(12, ge=2, le=52)
+    end: date = None
+    sources: list[str] = list(PERIOD_TABLES)
+
+
+def resolve_periods(req: PeriodsRequest) -> list:
+    if req.periods:
+        periods = sorted(((p.start, p.end) for p in req.periods))
+        if len(periods) > 52:
+            raise HTTPException(status_code=400, detail="At most 52 periods per request")
+    elif req.period_days:
+        last_end = req.end or date.today() - timedelta(days=1)
+        periods = []
+        for i in reversed(range(req.count)):
+            end = last_end - timedelta(days=i * req.period_days)
+            periods.append((end - timedelta(days=req.period_days - 1), end))
+    else:
+        raise HTTPException(status_code=400, detail="Pass either periods or period_days")
+
+    if any(start > end for start, end in periods):
+        raise HTTPException(status_code=400, detail="Each period needs start <= end")
+    return periods
+
+
+def period_subquery(table: str) -> str:
+    """
+    Aggregates of `table` per period, with the change from the previous
+    period (LAG over the period index), as a JSON array ordered by period.
+    """
+    selects = []
+    for m in DATA_TABLES[table]["metrics"]:
+        value = rollup_sql(table, m, prefix="t.")
+        selects.append(f"{value} AS {m}")
+        previous = f"LAG({value}) OVER (ORDER BY p.idx)"
+        selects.append(f"{value} - {previous} AS {m}_delta")
+        selects.append(f"CASE WHEN {previous} <> 0 THEN "
+                       f"({value} - {previous})::float8 * 100 / {previous} END AS {m}_pct")
+    return f"""
+        SELECT COALESCE(json_agg(r ORDER BY r.period), '[]'::json) FROM (
+            SELECT p.idx AS period, p.start_date AS start, p.end_date AS end,
+                   {", ".join(selects)}
+            FROM periods p
+            LEFT JOIN {table} t
+                   ON t.tenant_id = %(tenant_id)s AND t.date BETWEEN p.start_date AND p.end_date
+            GROUP BY p.idx, p.start_date, p.end_date
+        ) r
+    """
+
+
+def fetch_period_trends(tenant_id: str, periods: list, sources: list) -> str:
+    """
+    Every source's per-period aggregates and period-over-period deltas in one
+    SQL round trip: the periods are a VALUES list joined to each source's
+    daily rollup by date range, so each table is read once per request.
+    Returns the payload as JSON text.
+    """
+    params = {"tenant_id": tenant_id}
+    values = []
+    for i, (start, end) in enumerate(periods):
+        values.append(f"({i}, %(start_{i})s::date, %(end_{i})s::date)")
+        params[f"start_{i}"] = start
+        params[f"end_{i}"] = end
+
+    sections = [f"'{source}', ({period_subquery(PERIOD_TABLES[source])})" for source in sources]
+    query = f"""
+        WITH periods (idx, start_date, end_date) AS (VALUES {", ".join(values)})
+        SELECT json_build_object(
+            'periods', (SELECT json_agg(json_build_object('start', start_date, 'end', end_date) ORDER BY idx)
+                        FROM periods),
+            {", ".join(sections)}
+        )::text
+    """
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+@router.post("/periods")
+def compare_periods(req: PeriodsRequest, current_user: TokenData = Depends(get_current_user)):
+    """
+    Trend across N periods, e.g. {"period_days": 7, "count": 12} for 12 weeks
+    ending yesterday, for GSC, GA4 (traffic acquisition) and Cloudflare.
+    """
+    unknown = [s for s in req.sources if s not in PERIOD_TABLES]
+    if unknown or not req.sources:
+        raise HTTPException(status_code=400, detail=f"sources must be among {', '.join(PERIOD_TABLES)}")
+    periods = resolve_periods(req)
+    return cached_json(current_user.tenant_id, "compare/periods",
+                       {"periods": periods, "sources": sorted(set(req.sources))},
+                       lambda: fetch_period_trends(current_user.tenant_id, periods, sorted(set(req.sources))))
@@ -1,13 +1,18 @@
 # router/data_router.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from utils.jwt_utils import get_current_user
 from db.db import get_connection
+from db.tables import DATA_TABLES, TABLE_PATHS, rollup_sql
+from utils.response_cache import cached_json, export_freshness
+from utils.export_formats import EXPORT_FORMATS, format_available, iter_export
+from utils.zip_stream import prefetch_entries, stream_zip
 from models.token_data import TokenData
-from io import StringIO
-import csv 
+from datetime import date, datetime, timedelta
 import zipfile
-import io
+import base64
+import json
+import psycopg2.extras
 
 router = APIRouter(prefix="/data", tags=["Data Viewer"])
 
@@ -25,94 +30,167 @@ def parse_range_clause(range_val):
         raise HTTPException(status_code=400, detail="Invalid range parameter")
 
 
-@router.get("/gsc")
-def get_gsc_data(range: str = None, start: str = None, end: str = None, user: TokenData = Depends(get_current_user)):
-    conn = get_connection()
-    cur = conn.cursor()
+def parse_fields(fields, allowed) -> list:
+    """Splits a `fields=a,b` parameter; None/empty means every allowed column."""
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def table_columns(table, group_by=None) -> list:
+    """Columns a /data read can return for `table`, raw or grouped."""
+    spec = DATA_TABLES[table]
+    if group_by == "date":
+        return ["date", *spec["metrics"]]
+    if group_by == "dimension":
+        return [*filter(None, [spec["dimension"]]), *spec["metrics"]]
+    return ["id", "date", *filter(None, [spec["dimension"]]), *spec["metrics"]]
+
+
+def check_group_by(group_by):
+    if group_by not in (None, "date", "dimension"):
+        raise HTTPException(status_code=400, detail="group_by must be 'date' or 'dimension'")
+
+
+def group_key(table, group_by):
+    return "date" if group_by == "date" else DATA_TABLES[table]["dimension"]
+
+
+def aggregate(table, metric) -> str:
+    return rollup_sql(table, metric)
+
+
+def section_query(table, where, fields=None, group_by=None, limit=100) -> str:
+    """
+    SELECT for one /data section: the latest `limit` rows, or with `group_by`
+    the metrics aggregated in SQL per date (latest first) or per dimension value
+    (largest sort metric first; tables without a dimension collapse to one total row).
+    `fields` is an already-validated column list; None selects everything.
+    Returns None when none of `fields` exist in this table.
+    """
+    columns = [c for c in fields if c in table_columns(table, group_by)] if fields else None
+    if columns == []:
+        return None
+
+    if not group_by:
+        select = ", ".join(columns) if columns else "*"
+        return f"SELECT {select} FROM {table} WHERE {where} ORDER BY date DESC LIMIT {limit}"
+
+    key = group_key(table, group_by)
+    columns = columns or table_columns(table, group_by)
+    select = ", ".join(c if c == key else f"{aggregate(table, c)} AS {c}" for c in columns)
+    if group_by == "date":
+        return f"SELECT {select} FROM {table} WHERE {where} GROUP BY date ORDER BY date DESC LIMIT {limit}"
+    if not key:
+        return f"SELECT {select} FROM {table} WHERE {where}"
+    sort_metric = DATA_TABLES[table]["sort_metric"]
+    return (f"SELECT {select} FROM {table} WHERE {where} GROUP BY {key} "
+            f"ORDER BY {aggregate(table, sort_metric)} DESC LIMIT {limit}")
+
+
+def parse_section_fields(sections, fields, group_by) -> list:
+    allowed = {c for table in sections.values() for c in table_columns(table, group_by)}
+    return parse_fields(fields, allowed)
+
+
+def fetch_sections_json(tenant_id, sections, range_val=None, start=None, end=None,
+                        fields=None, group_by=None) -> str:
+    """
+    Reads every section (name -> table) in one SQL round trip.
+    Each section is a json_agg subquery of its section_query rows, and Postgres
+    returns the whole payload as JSON text, so rows never become Python objects.
+    """
+    check_group_by(group_by)
+    columns = parse_section_fields(sections, fields, group_by)
+    where = "tenant_id = %s"
+    params = [tenant_id]
 
-    def fetch(table):
-        query = f"SELECT * FROM {table} WHERE tenant_id = %s"
-        params = [user.tenant_id]
+    if start and end:
+        where += " AND date BETWEEN %s AND %s"
+        params += [start, end]
+    elif range_val:
+        where += parse_range_clause(range_val)
+
+    subqueries = []
+    all_params = []
+    for name, table in sections.items():
+        query = section_query(table, where, columns, group_by)
+        if query is None:
+            subqueries.append(f"'{name}', '[]'::json")
+            continue
+        subqueries.append(f"""
+            '{name}', (
+                SELECT COALESCE(json_agg(t), '[]'::json) FROM (
+                    {query}
+                ) t
+            )""")
+        all_params += params
 
-        if start and end:
-            query += " AND date BETWEEN %s AND %s"
-            params += [start, end]
-        elif range:
-            query += parse_range_clause(range)
-
-        query += " ORDER BY date DESC LIMIT 100"
-        cur.execute(query, tuple(params))
-        columns = [desc[0] for desc in cur.description]
-        return [dict(zip(columns, row)) for row in cur.fetchall()]
-
-    result = {
-        "summary": fetch("gsc_summary_daily"),
-        "queries": fetch("gsc_queries_daily"),
-        "pages": fetch("gsc_pages_daily"),
-        "countries": fetch("gsc_countries_daily"),
-        "devices": fetch("gsc_devices_daily"),
-    }
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT json_build_object({','.join(subqueries)})::text", all_params)
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
 
-    cur.close()
-    conn.close()
-    return result
 
+@router.get("/gsc")
+def get_gsc_data(request: Request, range: str = None, start: str = None, end: str = None,
+                 fields: str = None, group_by: str = None, user: TokenData = Depends(get_current_user)):
+    return cached_json(user.tenant_id, "data/gsc", {"range": range, "start": start, "end": end,
+                                                      "fields": fields, "group_by": group_by},
+                       lambda: fetch_sections_json(user.tenant_id, {
+                           "summary": "gsc_summary_daily",
+                           "queries": "gsc_queries_daily",
+                           "pages": "gsc_pages_daily",
+                           "countries": "gsc_countries_daily",
+                           "devices": "gsc_devices_daily",
+                       }, range, start, end, fields, group_by), request)
 
-@router.get("/ga4")
-def get_ga4_data(range: str = None, start: str = None, end: str = None, user: TokenData = Depends(get_current_user)):
-    conn = get_connection()
-    cur = conn.cursor()
 
-    def fetch(table):
-        query = f"SELECT * FROM {table} WHERE tenant_id = %s"
-        params = [user.tenant_id]
+@router.get("/ga4")
+def get_ga4_data(request: Request, range: str = None, start: str = None, end: str = None,
+                 fields: str = None, group_by: str = None, user: TokenData = Depends(get_current_user)):
+    return cached_json(user.tenant_id, "data/ga4", {"range": range, "start": start, "end": end,
+                                                      "fields": fields, "group_by": group_by},
+                       lambda: fetch_sections_json(user.tenant_id, {
+                           "top_pages": "ga4_top_pages_daily",
+                           "traffic": "ga4_traffic_acquisition_daily",
+                           "countries": "ga4_country_metrics_daily",
+                           "browsers": "ga4_browser_metrics_daily",
+                       }, range, start, end, fields, group_by), request)
 
-        if start and end:
-            query += " AND date BETWEEN %s AND %s"
-            params += [start, end]
-        elif range:
-            query += parse_range_clause(range)
-
-        query += " ORDER BY date DESC LIMIT 100"
-        cur.execute(query, tuple(params))
-        columns = [desc[0] for desc in cur.description]
-        return [dict(zip(columns, row)) for row in cur.fetchall()]
-
-    result = {
-        "top_pages": fetch("ga4_top_pages_daily"),
-        "traffic": fetch("ga4_traffic_acquisition_daily"),
-        "countries": fetch("ga4_country_metrics_daily"),
-        "browsers": fetch("ga4_browser_metrics_daily"),
-    }
 
-    cur.close()
-    conn.close()
-    return result
+@router.get("/cloudflare")
+def get_cf_data(request: Request, range: str = None, start: str = None, end: str = None,
+                fields: str = None, group_by: str = None, user: TokenData = Depends(get_current_user)):
+    return cached_json(user.tenant_id, "data/cloudflare", {"range": range, "start": start, "end": end,
+                                                            "fields": fields, "group_by": group_by},
+                       lambda: fetch_cf_rows(user.tenant_id, range, start, end, fields, group_by), request)
 
 
-@router.get("/cloudflare")
-def get_cf_data(range: str = None, start: str = None, end: str = None, user: TokenData = Depends(get_current_user)):
-    conn = get_connection()
-    cur = conn.cursor()
+def fetch_cf_rows(tenant_id, range=None, start=None, end=None, fields=None, group_by=None):
+    table = "cloudflare_summary_daily"
+    check_group_by(group_by)
+    columns = parse_fields(fields, table_columns(table, group_by))
 
-    query = "SELECT * FROM cloudflare_summary_daily WHERE tenant_id = %s"
-    params = [user.tenant_id]
+    where = "tenant_id = %s"
+    params = [tenant_id]
 
     if start and end:
-        query += " AND date BETWEEN %s AND %s"
+        where += " AND date BETWEEN %s AND %s"
         params += [start, end]
     elif range:
-        if range == "today":
-            query += " AND date = CURRENT_DATE"
-        else:
-            try:
-                days = int(range)
-                query += f" AND date >= CURRENT_DATE - INTERVAL '{days} day'"
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid range parameter")
+        where += parse_range_clause(range)
 
-    query += " ORDER BY date DESC LIMIT 100"
-    cur.execute(query, tuple(params))
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(section_query(table, where, columns, group_by), tuple(params))
 
     columns = [desc[0] for desc in cur.description]
     rows = cur.fetchall()
@@ -121,291 +199,375 @@ def get_cf_data(range: str = None, start: str = None, end: str = None, user: Tok
     conn.close()
     return [dict(zip(columns, row)) for row in rows]
 
-# --- Helper function to generate CSV ---
-def generate_csv(rows, headers):
-    csv_file = StringIO()
-    writer = csv.writer(csv_file)
-    writer.writerow(headers)
-    writer.writerows(rows)
-    csv_file.seek(0)
-    return csv_file
 
-# --- GSC CSV Export ---
+# --- Cross-source daily overview ---
+OVERVIEW_DEFAULT_DAYS = 28
+OVERVIEW_MAX_DAYS = 731
+
+OVERVIEW_QUERY = """
+WITH spine AS (
+    SELECT d::date AS date
+    FROM generate_series(%(start)s::date, %(end)s::date, interval '1 day') d
+),
+gsc AS (
+    SELECT date, SUM(clicks) AS clicks, SUM(impressions) AS impressions
+    FROM gsc_summary_daily
+    WHERE tenant_id = %(tenant_id)s AND date BETWEEN %(start)s AND %(end)s
+    GROUP BY date
+),
+ga4 AS (
+    SELECT date, SUM(sessions) AS sessions, SUM(engaged_sessions) AS engaged_sessions
+    FROM ga4_traffic_acquisition_daily
+    WHERE tenant_id = %(tenant_id)s AND date BETWEEN %(start)s AND %(end)s
+    GROUP BY date
+),
+cf AS (
+    SELECT date, SUM(page_views) AS page_views, SUM(visits) AS visits
+    FROM cloudflare_summary_daily
+    WHERE tenant_id = %(tenant_id)s AND date BETWEEN %(start)s AND %(end)s
+    GROUP BY date
+),
+days AS (
+    SELECT s.date, gsc.clicks, gsc.impressions, ga4.sessions, ga4.engaged_sessions,
+           cf.page_views, cf.visits
+    FROM spine s
+    LEFT JOIN gsc USING (date)
+    LEFT JOIN ga4 USING (date)
+    LEFT JOIN cf USING (date)
+),
+totals AS (
+    SELECT SUM(clicks) AS clicks, SUM(impressions) AS impressions,
+           SUM(sessions) AS sessions, SUM(engaged_sessions) AS engaged_sessions,
+           SUM(page_views) AS page_views, SUM(visits) AS visits
+    FROM days
+)
+SELECT json_build_object(
+    'start', %(start)s::date,
+    'end', %(end)s::date,
+    'days', (SELECT COALESCE(json_agg(t ORDER BY t.date), '[]'::json)
+             FROM (SELECT d.*, {ratios} FROM days d) t),
+    'totals', (SELECT row_to_json(t) FROM (SELECT d.*, {ratios} FROM totals d) t)
+)::text
+"""
+
+# name -> (numerator, denominator); NULL when the denominator is missing or 0
+OVERVIEW_RATIOS = {
+    "sessions_per_click": ("sessions", "clicks"),
+    "visits_per_click": ("visits", "clicks"),
+    "sessions_per_visit": ("sessions", "visits"),
+    "ctr": ("clicks", "impressions"),
+    "engagement_rate": ("engaged_sessions", "sessions"),
+}
+
+
+def resolve_overview_range(range_val=None, start=None, end=None):
+    """Concrete (start, end) dates for the overview's date spine."""
+    try:
+        if start and end:
+            start_date = datetime.strptime(start, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end, "%Y-%m-%d").date()
+        elif range_val == "today":
+            start_date = end_date = date.today()
+        else:
+            days = int(range_val) if range_val else OVERVIEW_DEFAULT_DAYS
+            end_date = date.today()
+            start_date = end_date - timedelta(days=days)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid range parameter")
 
-@router.get("/gsc/summary/export")
-def export_gsc_data(user: TokenData = Depends(get_current_user)):
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end_date - start_date).days + 1 > OVERVIEW_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Overview spans at most {OVERVIEW_MAX_DAYS} days")
+    return start_date, end_date
+
+
+def fetch_overview_json(tenant_id, start_date, end_date) -> str:
+    """
+    One statement: each source is aggregated per day in its own CTE, the three
+    are LEFT JOINed onto a generate_series date spine (days without data stay
+    NULL rather than 0), and Postgres renders the series, totals and ratios as JSON.
+    """
+    ratios = ", ".join(
+        f"ROUND({num}::numeric / NULLIF({den}, 0), 4) AS {name}"
+        for name, (num, den) in OVERVIEW_RATIOS.items()
+    )
     conn = get_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT * FROM gsc_summary_daily
-                WHERE tenant_id = %s
-                ORDER BY date DESC
-            """, [user.tenant_id])
-            rows = cur.fetchall()
-            headers = [desc[0] for desc in cur.description]
-            csv_file = generate_csv(rows, headers)
+            cur.execute(OVERVIEW_QUERY.format(ratios=ratios),
+                        {"tenant_id": tenant_id, "start": start_date, "end": end_date})
+            return cur.fetchone()[0]
     finally:
         conn.close()
 
+
+@router.get("/overview")
+def get_overview(request: Request, range: str = None, start: str = None, end: str = None,
+                 user: TokenData = Depends(get_current_user)):
+    start_date, end_date = resolve_overview_range(range, start, end)
+    return cached_json(user.tenant_id, "data/overview", {"start": start_date, "end": end_date},
+                       lambda: fetch_overview_json(user.tenant_id, start_date, end_date), request)
+
+
+def encode_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != 2:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def resolve_table(source: str, name: str) -> str:
+    table = TABLE_PATHS.get(f"{source}/{name}")
+    if not table:
+        raise HTTPException(status_code=404, detail=f"Unknown table: {source}/{name}")
+    return table
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@router.get("/{source}/{name}/rows")
+def get_table_rows(
+    request: Request,
+    source: str,
+    name: str,
+    range: str = None,
+    start: str = None,
+    end: str = None,
+    sort: str = None,
+    order: str = "desc",
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = None,
+    dimension_equals: str = None,
+    dimension_contains: str = None,
+    min_impressions: int = None,
+    fields: str = None,
+    group_by: str = None,
+    user: TokenData = Depends(get_current_user),
+):
+    """
+    Keyset-paginated rows of one table, e.g. /data/gsc/queries/rows.
+    Rows are ordered by (sort, id); pass back `next_cursor` as `cursor` for the
+    next page, so a deep page costs the same index range scan as the first.
+    `fields` limits the returned columns (the sort and key columns are always
+    included). `group_by=date|dimension` pages through metrics aggregated in
+    SQL per date or per dimension value instead, keyed on that column.
+    """
+    table = resolve_table(source, name)
+    spec = DATA_TABLES[table]
+    dim_col = spec["dimension"]
+
+    check_group_by(group_by)
+    if group_by == "dimension" and not dim_col:
+        raise HTTPException(status_code=400, detail=f"{source}/{name} has no dimension to group by")
+    key = group_key(table, group_by) if group_by else "id"
+    columns = parse_fields(fields, table_columns(table, group_by))
+
+    sort = sort or (spec["sort_metric"] if group_by == "dimension" else "date")
+    if sort not in table_columns(table, group_by) or sort in ("id", dim_col):
+        raise HTTPException(status_code=400, detail=f"Cannot sort {source}/{name} by {sort}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+
+    where = "tenant_id = %s"
+    params = [user.tenant_id]
+
+    if start and end:
+        where += " AND date BETWEEN %s AND %s"
+        params += [start, end]
+    elif range:
+        where += parse_range_clause(range)
+
+    if dimension_equals is not None or dimension_contains is not None:
+        if not dim_col:
+            raise HTTPException(status_code=400, detail=f"{source}/{name} has no dimension to filter on")
+        if dimension_equals is not None:
+            where += f" AND {dim_col} = %s"
+            params.append(dimension_equals)
+        if dimension_contains is not None:
+            where += f" AND {dim_col} ILIKE %s"
+            params.append(f"%{escape_like(dimension_contains)}%")
+
+    if min_impressions is not None:
+        if "impressions" not in spec["metrics"]:
+            raise HTTPException(status_code=400, detail=f"{source}/{name} has no impressions")
+        where += " AND impressions >= %s"
+        params.append(min_impressions)
+
+    # NULL sort keys would break the row comparison below; ingest always writes metrics
+    if sort != "date" and not group_by:
+        where += f" AND {sort} IS NOT NULL"
+
+    keyset = f"({sort}, {key}) {'<' if order == 'desc' else '>'} (%s, %s)"
+    select = ", ".join(dict.fromkeys([*columns, sort, key])) if columns else "*"
+
+    if group_by:
+        aggregates = ", ".join(f"{aggregate(table, m)} AS {m}" for m in spec["metrics"])
+        query = f"""
+            SELECT {select} FROM (
+                SELECT {key}, {aggregates} FROM {table}
+                WHERE {where}
+                GROUP BY {key}
+            ) g
+            WHERE {keyset if cursor else 'TRUE'}
+            ORDER BY {sort} {order}, {key} {order}
+            LIMIT %s
+        """
+    else:
+        if cursor:
+            where += f" AND {keyset}"
+        query = f"""
+            SELECT {select} FROM {table}
+            WHERE {where}
+            ORDER BY {sort} {order}, id {order}
+            LIMIT %s
+        """
+    if cursor:
+        params += decode_cursor(cursor)
+    params.append(limit + 1)
+
+    def fetch_page():
+        conn = get_connection()
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cur.execute(query, params)
+                rows = cur.fetchall()
+        finally:
+            conn.close()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][sort], rows[-1][key]])
+
+        return {"rows": rows, "next_cursor": next_cursor, "sort": sort, "order": order}
+
+    return cached_json(user.tenant_id, f"data/{source}/{name}/rows", {
+        "range": range, "start": start, "end": end, "sort": sort, "order": order,
+        "limit": limit, "cursor": cursor, "dimension_equals": dimension_equals,
+        "dimension_contains": dimension_contains, "min_impressions": min_impressions,
+        "fields": fields, "group_by": group_by,
+    }, fetch_page, request)
+
+
+# --- Streaming exports (csv / parquet / arrow) ---
+EXPORT_FORMAT_PATTERN = "^(csv|parquet|arrow)$"
+
+
+def check_export_format(fmt: str):
+    if not format_available(fmt):
+        raise HTTPException(status_code=501, detail=f"{fmt} export requires pyarrow, which is not installed")
+
+
+def export_table(request: Request, tenant_id: str, table: str, order_by: str, filename: str, fmt: str = "csv"):
+    check_export_format(fmt)
+    not_modified, freshness = export_freshness(request, tenant_id)
+    if not_modified:
+        return not_modified
+    media_type, extension = EXPORT_FORMATS[fmt]
+    query = f"SELECT * FROM {table} WHERE tenant_id = %s ORDER BY {order_by}"
     return StreamingResponse(
-        csv_file,
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=gsc_data.csv"}
+        iter_export(query, (tenant_id,), fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}{extension}", **freshness}
     )
+
+# --- GSC CSV Export ---
+
+@router.get("/gsc/summary/export")
+def export_gsc_data(request: Request, format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN), user: TokenData = Depends(get_current_user)):
+    return export_table(request, user.tenant_id, "gsc_summary_daily", "date DESC", "gsc_data", format)
+
 # --- GSC Queries ---
 @router.get("/gsc/queries/export")
-def export_gsc_queries(user: TokenData = Depends(get_current_user)):
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT * FROM gsc_queries_daily
-                WHERE tenant_id = %s
-                ORDER BY date DESC
-            """, [user.tenant_id])
-            rows = cur.fetchall()
-            headers = [desc[0] for desc in cur.description]
-            csv_file = generate_csv(rows, headers)
-    finally:
-        conn.close()
+def export_gsc_queries(request: Request, format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN), user: TokenData = Depends(get_current_user)):
+    return export_table(request, user.tenant_id, "gsc_queries_daily", "date DESC", "gsc_queries", format)
 
-    return StreamingResponse(
-        csv_file,
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=gsc_queries.csv"}
-    )
 # --- GSC Pages ---
 @router.get("/gsc/pages/export")
-def export_gsc_pages(user: TokenData = Depends(get_current_user)):
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT * FROM gsc_pages_daily
-                WHERE tenant_id = %s
-                ORDER BY date DESC
-            """, [user.tenant_id])
-            rows = cur.fetchall()
-            headers = [desc[0] for desc in cur.description]
-            csv_file = generate_csv(rows, headers)
-    finally:
-        conn.close()
-
-    return StreamingResponse(
-        csv_file,
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=gsc_pages.csv"}
-    )
+def export_gsc_pages(request: Request, format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN), user: TokenData = Depends(get_current_user)):
+    return export_table(request, user.tenant_id, "gsc_pages_daily", "date DESC", "gsc_pages", format)
 
 # --- GSC Devices ---
 @router.get("/gsc/devices/export")
-def export_gsc_devices(user: TokenData = Depends(get_current_user)):
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT * FROM gsc_devices_daily
-                WHERE tenant_id = %s
-                ORDER BY date DESC
-            """, [user.tenant_id])
-            rows = cur.fetchall()
-            headers = [desc[0] for desc in cur.description]
-            csv_file = generate_csv(rows, headers)
-    finally:
-        conn.close()
-
-    return StreamingResponse(
-        csv_file,
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=gsc_devices.csv"}
-    )
+def export_gsc_devices(request: Request, format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN), user: TokenData = Depends(get_current_user)):
+    return export_table(request, user.tenant_id, "gsc_devices_daily", "date DESC", "gsc_devices", format)
 
 # --- GSC Countries ---
 @router.get("/gsc/countries/export")
-def export_gsc_countries(user: TokenData = Depends(get_current_user)):
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT * FROM gsc_countries_daily
-                WHERE tenant_id = %s
-                ORDER BY date DESC
-            """, [user.tenant_id])
-            rows = cur.fetchall()
-            headers = [desc[0] for desc in cur.description]
-            csv_file = generate_csv(rows, headers)
-    finally:
-        conn.close()
-
-    return StreamingResponse(
-        csv_file,
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=gsc_countries.csv"}
-    )
+def export_gsc_countries(request: Request, format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN), user: TokenData = Depends(get_current_user)):
+    return export_table(request, user.tenant_id, "gsc_countries_daily", "date DESC", "gsc_countries", format)
 
 
 # --- GA4 CSV Export ---
 @router.get("/ga4/top_pages/export")
-def export_ga4_top_pages(user: TokenData = Depends(get_current_user)):
-    conn = get_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT * FROM ga4_top_pages_daily
-            WHERE tenant_id = %s
-            ORDER BY views DESC
-        """, [user.tenant_id])
-        rows = cur.fetchall()
-        headers = [desc[0] for desc in cur.description]
-        csv_file = generate_csv(rows, headers)
-    finally:
-        cur.close()
-        conn.close()
-
-    return StreamingResponse(
-        csv_file,
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=ga4_top_pages.csv"}
-    )
+def export_ga4_top_pages(request: Request, format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN), user: TokenData = Depends(get_current_user)):
+    return export_table(request, user.tenant_id, "ga4_top_pages_daily", "views DESC", "ga4_top_pages", format)
 
 # --- GA4 Traffic Acquisition CSV Export ---
 @router.get("/ga4/traffic/export")
-def export_ga4_traffic(user: TokenData = Depends(get_current_user)):
-    conn = get_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT * FROM ga4_traffic_acquisition_daily
-            WHERE tenant_id = %s
-            ORDER BY date DESC
-        """, [user.tenant_id])
-        rows = cur.fetchall()
-        headers = [desc[0] for desc in cur.description]
-        csv_file = generate_csv(rows, headers)
-    finally:
-        cur.close()
-        conn.close()
-
-    return StreamingResponse(
-        csv_file,
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=ga4_traffic.csv"}
-    )
+def export_ga4_traffic(request: Request, format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN), user: TokenData = Depends(get_current_user)):
+    return export_table(request, user.tenant_id, "ga4_traffic_acquisition_daily", "date DESC", "ga4_traffic", format)
 
 # --- GA4 Countries CSV Export ---
 @router.get("/ga4/countries/export")
-def export_ga4_countries(user: TokenData = Depends(get_current_user)):
-    conn = get_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT * FROM ga4_country_metrics_daily
-            WHERE tenant_id = %s
-            ORDER BY date DESC
-        """, [user.tenant_id])
-        rows = cur.fetchall()
-        headers = [desc[0] for desc in cur.description]
-        csv_file = generate_csv(rows, headers)
-    finally:
-        cur.close()
-        conn.close()
-
-    return StreamingResponse(
-        csv_file,
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=ga4_countries.csv"}
-    )
+def export_ga4_countries(request: Request, format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN), user: TokenData = Depends(get_current_user)):
+    return export_table(request, user.tenant_id, "ga4_country_metrics_daily", "date DESC", "ga4_countries", format)
 
 # --- GA4 Browsers CSV Export ---
 @router.get("/ga4/browsers/export")
-def export_ga4_browsers(user: TokenData = Depends(get_current_user)):
-    conn = get_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT * FROM ga4_browser_metrics_daily
-            WHERE tenant_id = %s
-            ORDER BY date DESC
-        """, [user.tenant_id])
-        rows = cur.fetchall()
-        headers = [desc[0] for desc in cur.description]
-        csv_file = generate_csv(rows, headers)
-    finally:
-        cur.close()
-        conn.close()
-
-    return StreamingResponse(
-        csv_file,
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=ga4_browsers.csv"}
-    )
+def export_ga4_browsers(request: Request, format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN), user: TokenData = Depends(get_current_user)):
+    return export_table(request, user.tenant_id, "ga4_browser_metrics_daily", "date DESC", "ga4_browsers", format)
 
 # --- Cloudflare CSV Export ---
 @router.get("/cloudflare/export")
-def export_cloudflare_data(user: TokenData = Depends(get_current_user)):
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT * FROM cloudflare_summary_daily
-                WHERE tenant_id = %s
-                ORDER BY date DESC
-            """, [user.tenant_id])
-            rows = cur.fetchall()
-            headers = [desc[0] for desc in cur.description]
-            csv_file = generate_csv(rows, headers)
-    finally:
-        conn.close()
+def export_cloudflare_data(request: Request, format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN), user: TokenData = Depends(get_current_user)):
+    return export_table(request, user.tenant_id, "cloudflare_summary_daily", "date DESC", "cloudflare_data", format)
 
-    return StreamingResponse(
-        csv_file,
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=cloudflare_data.csv"}
-    )
+# Upper bound for /export/all?workers=, kept below DB_POOL_MAX
+EXPORT_MAX_WORKERS = 4
 
-@router.get("/export/all")
-def export_all(user: TokenData = Depends(get_current_user)):
-    conn = get_connection()
-    cur = conn.cursor()
 
-    # List of tables to export
-    tables = {
-        "gsc_summary_daily": "SELECT * FROM gsc_summary_daily WHERE tenant_id = %s",
-        "gsc_queries_daily": "SELECT * FROM gsc_queries_daily WHERE tenant_id = %s",
-        "gsc_pages_daily": "SELECT * FROM gsc_pages_daily WHERE tenant_id = %s",
-        "gsc_countries_daily": "SELECT * FROM gsc_countries_daily WHERE tenant_id = %s",
-        "gsc_devices_daily": "SELECT * FROM gsc_devices_daily WHERE tenant_id = %s",
-        "ga4_traffic_acquisition_daily": "SELECT * FROM ga4_traffic_acquisition_daily WHERE tenant_id = %s",
-        "ga4_top_pages_daily": "SELECT * FROM ga4_top_pages_daily WHERE tenant_id = %s",
-        "ga4_country_metrics_daily": "SELECT * FROM ga4_country_metrics_daily WHERE tenant_id = %s",
-        "ga4_browser_metrics_daily": "SELECT * FROM ga4_browser_metrics_daily WHERE tenant_id = %s",
-        "cloudflare_summary_daily": "SELECT * FROM cloudflare_summary_daily WHERE tenant_id = %s"
-    }
-
-    # In-memory zip
-    zip_buffer = io.BytesIO()
-
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for table_name, query in tables.items():
-            cur.execute(query, (user.tenant_id,))
-            rows = cur.fetchall()
-            headers = [desc[0] for desc in cur.description]
-
-            # Create CSV in memory
-            csv_buffer = io.StringIO()
-            writer = csv.writer(csv_buffer)
-            writer.writerow(headers)
-            writer.writerows(rows)
-
-            # Add CSV file to zip
-            zip_file.writestr(f"{table_name}.csv", csv_buffer.getvalue())
-
-    conn.close()
-
-    zip_buffer.seek(0)
+@router.get("/export/all")
+def export_all(
+    request: Request,
+    workers: int = Query(1, ge=1, le=EXPORT_MAX_WORKERS),
+    format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN),
+    user: TokenData = Depends(get_current_user),
+):
+    """
+    Streams every table as an entry (csv, parquet or arrow) of one ZIP archive. Rows go from a
+    server-side cursor through the compressor to the client, so the download
+    starts immediately and memory stays bounded. With workers > 1, up to that
+    many tables are read concurrently on pooled connections.
+    """
+    check_export_format(format)
+    not_modified, freshness = export_freshness(request, user.tenant_id)
+    if not_modified:
+        return not_modified
+
+    _, extension = EXPORT_FORMATS[format]
+    entries = [
+        (f"{table_name}{extension}",
+         iter_export(f"SELECT * FROM {table_name} WHERE tenant_id = %s", (user.tenant_id,), format, pooled=True))
+        for table_name in DATA_TABLES
+    ]
+    if workers > 1:
+        entries = prefetch_entries(entries, workers=workers)
+
+    # parquet and arrow entries are already compressed
+    compression = zipfile.ZIP_DEFLATED if format == "csv" else zipfile.ZIP_STORED
     return StreamingResponse(
-        zip_buffer,
+        stream_zip(entries, compression),
         media_type="application/zip",
-        headers={"Content-Disposition": "attachment; filename=all_data_export.zip"}
-    )
\ No newline at end of file
+        headers={"Content-Disposition": "attachment; filename=all_data_export.zip", **freshness}
+    )
@@ -1,15 +1,44 @@
 # router/fetch_router.py
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from pydantic import BaseModel, Field
 from datetime import datetime, timedelta
 from services.gsc_daily_fetch import run_gsc_fetch_for_tenant
 from services.ga4_daily_fetch import run_ga4_fetch_for_tenant
 from services.cloudflare_service import CloudflareAnalyticsExtractor
-from db.db import insert_cloudflare_summary, get_tenant_credentials
+from db.db import insert_cloudflare_summary_daily, get_tenant_credentials
 from utils.jwt_utils import get_current_user, TokenData
 from services.credential_service import get_credentials_for_service
+from services.single_flight import fetch_once
+from services.raw_archive import archive_cloudflare_response
+from services.backfill import (
+    BACKFILL_MAX_DAYS_PER_MINUTE,
+    BACKFILL_MAX_WORKERS,
+    backfill_jobs,
+    default_range,
+    run_backfill,
+)
+from services.post_ingest import run_post_ingest
+from typing import Optional
+import uuid
 router = APIRouter(prefix="/fetch", tags=["Manual Fetch (Secured)"])
 
 
+# Handlers are plain `def` so FastAPI runs them in its threadpool: concurrent
+# requests then overlap and fetch_once can collapse them into one API call.
+class FetchRequest(BaseModel):
+    start_date: str
+    end_date: str
+
+
+class BackfillRequest(BaseModel):
+    source: str
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    chunk_days: int = Field(7, ge=1)
+    workers: int = Field(min(4, BACKFILL_MAX_WORKERS), ge=1, le=BACKFILL_MAX_WORKERS)
+    days_per_minute: int = Field(BACKFILL_MAX_DAYS_PER_MINUTE, ge=1, le=BACKFILL_MAX_DAYS_PER_MINUTE)
+
+
 def date_range_list(start_date: str, end_date: str) -> list:
     start = datetime.strptime(start_date, "%Y-%m-%d").date()
     end = datetime.strptime(end_date, "%Y-%m-%d").date()
@@ -18,12 +47,15 @@ def date_range_list(start_date: str, end_date: str) -> list:
 
 
 @router.post("/gsc")
-async def fetch_gsc(request: Request, user: TokenData = Depends(get_current_user)):
+def fetch_gsc(
+    request: FetchRequest,
+    background_tasks: BackgroundTasks,
+    user: TokenData = Depends(get_current_user),
+):
     try:
         tenant_id = user.tenant_id
-        data = await request.json()  
-        start_date = data.get("start_date")
-        end_date = data.get("end_date")
+        start_date = request.start_date
+        end_date = request.end_date
 
         # GSC fetch is always 3 days behind
         adjusted_dates = [
@@ -32,8 +64,10 @@ async def fetch_gsc(request: Request, user: TokenData = Depends(get_current_user
 
         for target_date in adjusted_dates:
             print(f"🔐 Authenticated GSC fetch for tenant {tenant_id} on {target_date}")
-            run_gsc_fetch_for_tenant(tenant_id, target_date)
+            fetch_once(tenant_id, "gsc", target_date,
+                       lambda: run_gsc_fetch_for_tenant(tenant_id, target_date))
 
+        background_tasks.add_task(run_post_ingest, tenant_id)
         return {"message": "GSC data fetched", "tenant_id": tenant_id}
 
     except Exception as e:
@@ -42,12 +76,15 @@ async def fetch_gsc(request: Request, user: TokenData = Depends(get_current_user
 
 
 @router.post("/ga4")
-async def fetch_ga4(request: Request, user: TokenData = Depends(get_current_user)):
+def fetch_ga4(
+    request: FetchRequest,
+    background_tasks: BackgroundTasks,
+    user: TokenData = Depends(get_current_user),
+):
     try:
         tenant_id = user.tenant_id
-        data = await request.json()
-        start_date = data.get("start_date")
-        end_date = data.get("end_date")
+        start_date = request.start_date
+        end_date = request.end_date
 
         creds = get_credentials_for_service(tenant_id, "ga4")
         service_account = (
@@ -62,13 +99,14 @@ async def fetch_ga4(request: Request, user: TokenData = Depends(get_current_user
 
         for target_date in date_range_list(start_date, end_date):
             print(f"🔐 Authenticated GA4 fetch for tenant {tenant_id} on {target_date}")
-            run_ga4_fetch_for_tenant(
+            fetch_once(tenant_id, "ga4", target_date, lambda: run_ga4_fetch_for_tenant(
                 tenant_id,
                 target_date,
                 service_account=service_account,
                 property_id=property_id  
-            )
+            ))
 
+        background_tasks.add_task(run_post_ingest, tenant_id)
         return {"message": "GA4 data fetched", "tenant_id": tenant_id}
 
     except Exception as e:
@@ -76,12 +114,15 @@ async def fetch_ga4(request: Request, user: TokenData = Depends(get_current_user
         return {"error": str(e)}
 
 @router.post("/cloudflare")
-async def fetch_cloudflare(request: Request, user: TokenData = Depends(get_current_user)):
+def fetch_cloudflare(
+    request: FetchRequest,
+    background_tasks: BackgroundTasks,
+    user: TokenData = Depends(get_current_user),
+):
     try:
         tenant_id = user.tenant_id
-        data = await request.json()  
-        start_date = data.get("start_date")
-        end_date = data.get("end_date")
+        start_date = request.start_date
+        end_date = request.end_date
 
         print(f"🔐 Authenticated Cloudflare fetch for tenant {tenant_id} on {start_date} to {end_date}")
 
@@ -93,17 +134,27 @@ async def fetch_cloudflare(request: Request, user: TokenData = Depends(get_curre
             return {"error": "Missing Cloudflare API token or zone_id for this tenant"}
 
         extractor = CloudflareAnalyticsExtractor(api_token, zone_id)
-        raw_data = extractor.get_pageviews_and_visits(start_date, end_date)
-        df = extractor.format_data_to_dataframe(raw_data)
-
-        for _, row in df.iterrows():
-            insert_cloudflare_summary(
-                tenant_id=tenant_id,
-                session_id=f"{tenant_id}_{row['date']}",
-                date=row["date"],
-                page_views=row["page_views"],
-                visits=row["visits"]
-            )
+
+        def fetch_day(day):
+            raw_data = extractor.get_pageviews_and_visits(str(day), str(day))
+            archive_cloudflare_response(tenant_id, raw_data)
+            df = extractor.format_data_to_dataframe(raw_data)
+
+            insert_cloudflare_summary_daily([
+                {
+                    "tenant_id": tenant_id,
+                    "session_id": f"{tenant_id}_{row['date']}",
+                    "date": row["date"],
+                    "page_views": int(row["page_views"]),
+                    "visits": int(row["visits"]),
+                }
+                for row in df.to_dict(orient="records")
+            ])
+
+        # keyed per day like GSC/GA4, so overlapping ranges share the days they have in common
+        for target_date in date_range_list(start_date, end_date):
+            fetch_once(tenant_id, "cloudflare", target_date, lambda: fetch_day(target_date))
+        background_tasks.add_task(run_post_ingest, tenant_id)
 
         return {
             "message": "Cloudflare data fetched",
@@ -114,3 +165,40 @@ async def fetch_cloudflare(request: Request, user: TokenData = Depends(get_curre
     except Exception as e:
         print("Error in Cloudflare fetch:", e)
         return {"error": str(e)}
+
+
+@router.post("/backfill")
+def start_backfill(
+    request: BackfillRequest,
+    background_tasks: BackgroundTasks,
+    user: TokenData = Depends(get_current_user),
+):
+    if request.source not in ("gsc", "ga4"):
+        raise HTTPException(status_code=400, detail="source must be 'gsc' or 'ga4'")
+
+    start, end = default_range(request.source)
+    try:
+        if request.start_date:
+            start = datetime.strptime(request.start_date, "%Y-%m-%d").date()
+        if request.end_date:
+            end = datetime.strptime(request.end_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    if start > end:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+
+    job_id = str(uuid.uuid4())
+    background_tasks.add_task(
+        run_backfill, user.tenant_id, request.source, start, end,
+        chunk_days=request.chunk_days, workers=request.workers,
+        days_per_minute=request.days_per_minute, job_id=job_id,
+    )
+    return {"message": "Backfill started", "job_id": job_id, "start": start, "end": end}
+
+
+@router.get("/backfill/{job_id}")
+def backfill_status(job_id: str, user: TokenData = Depends(get_current_user)):
+    progress = backfill_jobs.get(job_id)
+    if progress is None or progress.tenant_id != user.tenant_id:
+        raise HTTPException(status_code=404, detail="Backfill job not found on this worker")
+    return progress.as_dict()
@@ -1,14 +1,12 @@
 # router/report_router.py
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from db.db import fetch_all, get_connection
-import smtplib, ssl, os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
-from io import StringIO
-import csv
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from db.db import create_digest, delete_digest, get_report_job, list_digests
+from db.tables import TABLE_PATHS
+from services.digests import DIGEST_CADENCES, DIGEST_HOUR_UTC, resend_digest
+from services.report_builder import get_all_tenants
+from services.report_dispatch import report_dispatcher, smtp_settings
+from utils.jwt_utils import TokenData, get_current_user
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,135 +19,73 @@ class ReportRequest(BaseModel):
     ga4: list[str] = []
     cf: list[str] = []
 
-# ---------------- Helper functions ----------------
+# ---------------- Main endpoint ----------------
 
-def dicts_to_csv_attachment(data, metric_name="Report", filename="report.csv"):
-    if not data:
-        data = []
+@router.post("/api/send-report", status_code=202)
+def send_report(req: ReportRequest, user: TokenData = Depends(get_current_user)):
+    """Queues the report; building and sending happen on the background dispatcher."""
+    if not req.emails:
+        raise HTTPException(status_code=400, detail="No recipients given")
 
-    if isinstance(data[0], tuple):
-        headers = [f"col{i}" for i in range(len(data[0]))]
-        rows = data
-    else:
-        headers = list(data[0].keys()) if data else []
-        rows = [tuple(d[h] for h in headers) for d in data]
+    settings = smtp_settings()
+    if not settings["user"] or not settings["password"]:
+        raise HTTPException(status_code=500, detail="SMTP credentials not set in .env")
 
-    headers = ["Metric"] + headers
-    rows = [(metric_name, *row) for row in rows]
+    if not get_all_tenants():
+        raise HTTPException(status_code=400, detail="No tenants found in DB")
 
-    csv_buffer = StringIO()
-    writer = csv.writer(csv_buffer)
-    writer.writerow(headers)
-    writer.writerows(rows)
+    job_id = report_dispatcher.submit(req.model_dump(), user.tenant_id)
+    return {
+        "message": f"Report queued for {len(set(req.emails))} recipient(s).",
+        "job_id": job_id,
+        "status_url": f"/api/send-report/{job_id}",
+    }
 
-    mime_part = MIMEBase('application', 'octet-stream')
-    mime_part.set_payload(csv_buffer.getvalue())
-    encoders.encode_base64(mime_part)
-    mime_part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
 
-    return mime_part
+@router.get("/api/send-report/{job_id}")
+def report_status(job_id: str, user: TokenData = Depends(get_current_user)):
+    """Job status and per-recipient outcome, for the tenant that submitted it."""
+    job = get_report_job(job_id, user.tenant_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
 
-def get_all_tenants():
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT DISTINCT tenant_id FROM tenants")
-            return [row[0] for row in cur.fetchall()]
 
-# ---------------- Main endpoint ----------------
+# ---------------- Scheduled digests ----------------
 
-@router.post("/api/send-report")
-async def send_report(req: ReportRequest):
-    tenants = get_all_tenants()
-    if not tenants:
-        raise HTTPException(status_code=400, detail="No tenants found in DB")
+class DigestRequest(BaseModel):
+    name: str
+    recipients: list[str] = Field(min_length=1)
+    # /data table paths, e.g. "gsc/queries"
+    tables: list[str] = Field(min_length=1)
+    cadence: str = Field("weekly", pattern=f"^({'|'.join(DIGEST_CADENCES)})$")
 
-    smtp_user = os.getenv("EMAIL_ACCOUNT")
-    smtp_pass = os.getenv("EMAIL_PASSWORD")
-    smtp_server = os.getenv("SMTP_HOST", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", 587))
 
-    if not smtp_user or not smtp_pass:
-        raise HTTPException(status_code=500, detail="SMTP credentials not set in .env")
+# Digests belong to the caller's tenant and only ever contain that tenant's data
+@router.post("/api/digests", status_code=201)
+def add_digest(req: DigestRequest, user: TokenData = Depends(get_current_user)):
+    unknown = [path for path in req.tables if path not in TABLE_PATHS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown tables: {', '.join(unknown)}")
+    return create_digest(user.tenant_id, req.name, req.recipients, req.tables, req.cadence, DIGEST_HOUR_UTC)
 
-    context = ssl.create_default_context()
 
-    gsc_mapping = {
-        "GSC - Summary": "gsc_summary_daily",
-        "GSC - Queries": "gsc_queries_daily",
-        "GSC - Page": "gsc_pages_daily",
-        "GSC - Country": "gsc_countries_daily",
-        "GSC - Device": "gsc_devices_daily",
-    }
+@router.get("/api/digests")
+def get_digests(user: TokenData = Depends(get_current_user)):
+    return list_digests(user.tenant_id)
 
-    ga4_mapping = {
-        "GA4 - Page": "ga4_top_pages_daily",
-        "GA4 - Traffic": "ga4_traffic_acquisition_daily",
-        "GA4 - Country": "ga4_country_metrics_daily",
-        "GA4 - Browser": "ga4_browser_metrics_daily",
-    }
 
-    cf_mapping = {
-        "CF - Cloudflare CSV": "cloudflare_summary_daily"
-    }
+@router.delete("/api/digests/{digest_id}")
+def remove_digest(digest_id: int, user: TokenData = Depends(get_current_user)):
+    if not delete_digest(digest_id, user.tenant_id):
+        raise HTTPException(status_code=404, detail="Digest not found")
+    return {"message": "Digest deleted", "id": digest_id}
+
 
-    try:
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls(context=context)
-            server.login(smtp_user, smtp_pass)
-
-            for email in req.emails:
-                msg = MIMEMultipart()
-                msg["Subject"] = "📊 Analytics CSV Report"
-                msg["From"] = smtp_user
-                msg["To"] = email
-
-                msg.attach(MIMEText("Please find attached CSV reports for all metrics.", "plain"))
-
-                for tenant_id in tenants:
-                    # GSC CSV attachments
-                    for key in req.gsc:
-                        table_name = gsc_mapping.get(key)
-                        if table_name:
-                            data = fetch_all(table_name, tenant_id)
-                            safe_name = key.replace(" ", "").replace("-", "")
-                            csv_attachment = dicts_to_csv_attachment(
-                                data,
-                                metric_name=key,
-                                filename=f"{safe_name}.csv"
-                            )
-                            msg.attach(csv_attachment)
-
-                    # GA4 CSV attachments
-                    for key in req.ga4:
-                        table_name = ga4_mapping.get(key)
-                        if table_name:
-                            data = fetch_all(table_name, tenant_id)
-                            safe_name = key.replace(" ", "").replace("-", "")
-                            csv_attachment = dicts_to_csv_attachment(
-                                data,
-                                metric_name=key,
-                                filename=f"{safe_name}.csv"
-                            )
-                            msg.attach(csv_attachment)
-
-                    # Cloudflare CSV attachments
-                    for key in req.cf:
-                        table_name = cf_mapping.get(key)
-                        if table_name:
-                            data = fetch_all(table_name, tenant_id)
-                            safe_name = key.replace(" ", "").replace("-", "")
-                            csv_attachment = dicts_to_csv_attachment(
-                                data,
-                                metric_name=key,
-                                filename=f"{safe_name}.csv"
-                            )
-                            msg.attach(csv_attachment)
-
-                print(f"Sending report to {email}...")
-                server.sendmail(smtp_user, [email], msg.as_string())
-
-    except Exception as e:
-        print("SMTP error:", e)
-        raise HTTPException(status_code=500, detail=f"Email sending failed: {e}")
-
-    return {"message": "Report sent successfully with CSV attachments for GSC, GA4, and Cloudflare."}
\ No newline at end of file
+@router.post("/api/digests/{digest_id}/send", status_code=202)
+def send_digest_now(digest_id: int, user: TokenData = Depends(get_current_user)):
+    """Re-sends the last generated archive (generating it first if there is none)."""
+    job_id = resend_digest(digest_id, user.tenant_id)
+    if job_id is None:
+        raise HTTPException(status_code=404, detail="Digest not found")
+    return {"message": "Digest queued", "job_id": job_id, "status_url": f"/api/send-report/{job_id}"}
@@ -0,0 +1,152 @@
+# services/alert_writer.py
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from db.db import insert_alert_events
+
+ALERT_BATCH_ROWS = int(os.getenv("ALERT_BATCH_ROWS", 500))
+ALERT_FLUSH_SECONDS = float(os.getenv("ALERT_FLUSH_SECONDS", 0.2))
+ALERT_BUFFER_ROWS = int(os.getenv("ALERT_BUFFER_ROWS", 10000))
+# Attempts per batch before it is logged and dropped
+ALERT_FLUSH_ATTEMPTS = 3
+
+_STOP = object()
+
+
+class BufferFull(Exception):
+    """The alert buffer is at capacity; the caller should retry later."""
+
+
+class AlertWriter:
+    """
+    Buffers alert events in memory and writes them with one bulk insert per
+    batch, when `batch_rows` events are waiting or the oldest has waited
+    `flush_seconds`, whichever comes first. The buffer holds at most
+    `capacity` events; past that, submit raises BufferFull instead of
+    queuing unbounded work. Events are timestamped on receipt, so batching
+    does not shift created_at. Buffered events are lost if the process dies
+    before a flush; stop() drains everything on a clean shutdown.
+    """
+
+    def __init__(self, flush=insert_alert_events, batch_rows: int = ALERT_BATCH_ROWS,
+                 flush_seconds: float = ALERT_FLUSH_SECONDS, capacity: int = ALERT_BUFFER_ROWS):
+        self.flush = flush
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self._events = queue.Queue(maxsize=capacity)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.batches = 0
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="alert-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, tenant_id: str, alert_type: str, message: str | None):
+        """Queues one event without blocking; raises BufferFull when at capacity or shutting down."""
+        if self._stopping.is_set():
+            self.rejected += 1
+            raise BufferFull()
+        self._ensure_worker()
+        try:
+            self._events.put_nowait((tenant_id, alert_type, message, datetime.now(timezone.utc)))
+        except queue.Full:
+            self.rejected += 1
+            raise BufferFull() from None
+
+    def _next_batch(self):
+        """Waits for the first event, then collects until the batch fills or its deadline passes."""
+        while True:
+            try:
+                first = self._events.get(timeout=self.flush_seconds)
+                break
+            except queue.Empty:
+                # stop() may not have found room for the sentinel in a full buffer
+                if self._stopping.is_set():
+                    return [], True
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_rows:
+            remaining = deadline - time.monotonic()
+            try:
+                event = self._events.get(timeout=remaining) if remaining > 0 else self._events.get_nowait()
+            except queue.Empty:
+                break
+            if event is _STOP:
+                return batch, True
+            batch.append(event)
+        return batch, False
+
+    def _write(self, batch):
+        for attempt in range(1, ALERT_FLUSH_ATTEMPTS + 1):
+            try:
+                self.flush(batch)
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                print(f"⚠️ Alert flush of {len(batch)} events failed (attempt {attempt}): {e}")
+                if attempt < ALERT_FLUSH_ATTEMPTS:
+                    time.sleep(0.1 * 2 ** attempt)
+        self.dropped += len(batch)
+        print(f"❌ Dropped {len(batch)} alert events after {ALERT_FLUSH_ATTEMPTS} attempts")
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._write(batch)
+        # events submitted before stop() queued ahead of the sentinel; anything racing it is written here
+        leftover = []
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if event is not _STOP:
+                leftover.append(event)
+        for offset in range(0, len(leftover), self.batch_rows):
+            self._write(leftover[offset:offset + self.batch_rows])
+
+    def stop(self, timeout: float = 30):
+        """
+        Writes every buffered event, then stops the worker, waiting at most
+        `timeout` seconds in total; a flush stuck on the database past that is
+        abandoned with the (daemon) worker.
+        """
+        deadline = time.monotonic() + timeout
+        self._stopping.set()
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            # the sentinel wakes an idle worker at once; a full buffer is covered by _stopping
+            self._events.put(_STOP, timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Full:
+            pass
+        thread.join(max(0.0, deadline - time.monotonic()))
+
+    def stats(self) -> dict:
+        return {
+            "buffered": self._events.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+        }
+
+
+alert_writer = AlertWriter()
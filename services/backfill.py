@@ -0,0 +1,242 @@
+# services/backfill.py
+import argparse
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+from db.db import DB_POOL_MAX, get_connection
+from services.credential_service import get_credentials_for_service
+from services.ga4_daily_fetch import run_ga4_fetch_for_tenant
+from services.gsc_daily_fetch import run_gsc_fetch_for_tenant
+from services.post_ingest import run_post_ingest
+from services.single_flight import fetch_once
+
+# GSC keeps ~16 months of history
+GSC_HISTORY_DAYS = 486
+# Each worker holds a database connection while it stores a day
+BACKFILL_MAX_WORKERS = DB_POOL_MAX
+# Day fetches per minute a backfill may start, within the Google API quota
+BACKFILL_MAX_DAYS_PER_MINUTE = int(os.getenv("BACKFILL_MAX_DAYS_PER_MINUTE", 60))
+
+# In-process job registry for the status endpoint; checkpoints live in backfill_chunks
+backfill_jobs = {}
+
+
+class _RateLimiter:
+    """Spaces calls at least 60/per_minute seconds apart across all threads."""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_until = max(now, self._next_at)
+            self._next_at = wait_until + self.interval
+        if wait_until > now:
+            time.sleep(wait_until - now)
+
+
+class BackfillProgress:
+    def __init__(self, job_id, tenant_id, source, total_days, skipped_days):
+        self.job_id = job_id
+        self.tenant_id = tenant_id
+        self.source = source
+        self.total_days = total_days
+        self.skipped_days = skipped_days
+        self.done_days = 0
+        self.failed_chunks = []
+        self.status = "running"
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def chunk_done(self, days: int):
+        with self._lock:
+            self.done_days += days
+
+    def chunk_failed(self, chunk_start, chunk_end, error):
+        with self._lock:
+            self.failed_chunks.append({"start": str(chunk_start), "end": str(chunk_end), "error": str(error)})
+
+    def as_dict(self) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        remaining = self.total_days - self.skipped_days - self.done_days
+        days_per_min = self.done_days / elapsed * 60 if elapsed and self.done_days else 0.0
+        eta = remaining / days_per_min * 60 if days_per_min else None
+        return {
+            "job_id": self.job_id,
+            "tenant_id": self.tenant_id,
+            "source": self.source,
+            "status": self.status,
+            "total_days": self.total_days,
+            "skipped_days": self.skipped_days,
+            "done_days": self.done_days,
+            "remaining_days": remaining,
+            "elapsed_seconds": round(elapsed, 1),
+            "days_per_minute": round(days_per_min, 2),
+            "eta_seconds": round(eta) if eta is not None else None,
+            "failed_chunks": self.failed_chunks,
+        }
+
+
+def split_chunks(start: date, end: date, chunk_days: int) -> list:
+    if chunk_days < 1:
+        raise ValueError("chunk_days must be at least 1")
+    chunks = []
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def get_completed_days(tenant_id: str, source: str) -> set:
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT chunk_start, chunk_end FROM backfill_chunks
+                WHERE tenant_id = %s AND source = %s
+            """, (tenant_id, source))
+            rows = cur.fetchall()
+    days = set()
+    for chunk_start, chunk_end in rows:
+        days.update(chunk_start + timedelta(days=i) for i in range((chunk_end - chunk_start).days + 1))
+    return days
+
+
+def mark_chunk_done(tenant_id: str, source: str, chunk_start: date, chunk_end: date):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO backfill_chunks (tenant_id, source, chunk_start, chunk_end)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (tenant_id, source, chunk_start, chunk_end) DO NOTHING
+            """, (tenant_id, source, chunk_start, chunk_end))
+        conn.commit()
+
+
+def _day_fetcher(tenant_id: str, source: str):
+    if source == "gsc":
+        return lambda day: run_gsc_fetch_for_tenant(tenant_id, day)
+
+    if source == "ga4":
+        creds = get_credentials_for_service(tenant_id, "ga4")
+        service_account = creds.get("SERVICEACCOUNTJSON") or creds.get("SERVICEACCOUNT")
+        property_id = creds.get("PROPERTYID")
+        if not service_account:
+            raise ValueError("Missing GA4 service account JSON for this tenant")
+        return lambda day: run_ga4_fetch_for_tenant(
+            tenant_id, day, service_account=service_account, property_id=property_id
+        )
+
+    raise ValueError(f"Unsupported backfill source: {source}")
+
+
+def default_range(source: str):
+    """Full history available from the API, ending at the newest complete day."""
+    if source == "gsc":
+        end = date.today() - timedelta(days=3)
+        return end - timedelta(days=GSC_HISTORY_DAYS - 1), end
+    end = date.today() - timedelta(days=1)
+    return end - timedelta(days=GSC_HISTORY_DAYS - 1), end
+
+
+def run_backfill(tenant_id: str, source: str, start: date, end: date,
+                 chunk_days: int = 7, workers: int = 4, days_per_minute: int = 60,
+                 job_id: str = None) -> dict:
+    """
+    Backfills [start, end] in chunks of `chunk_days`, `workers` chunks at a time,
+    never starting more than `days_per_minute` day fetches per minute.
+    Each finished chunk is checkpointed in backfill_chunks, so a re-run
+    skips chunks whose days are already covered and resumes where it stopped.
+    workers and days_per_minute are capped at BACKFILL_MAX_WORKERS and
+    BACKFILL_MAX_DAYS_PER_MINUTE.
+    """
+    if workers < 1 or days_per_minute < 1:
+        raise ValueError("workers and days_per_minute must be at least 1")
+    if start > end:
+        raise ValueError("start must not be after end")
+    workers = min(workers, BACKFILL_MAX_WORKERS)
+    days_per_minute = min(days_per_minute, BACKFILL_MAX_DAYS_PER_MINUTE)
+    job_id = job_id or str(uuid.uuid4())
+    fetch_day = _day_fetcher(tenant_id, source)
+    limiter = _RateLimiter(days_per_minute)
+
+    completed = get_completed_days(tenant_id, source)
+    all_chunks = split_chunks(start, end, chunk_days)
+    pending = [
+        (chunk_start, chunk_end) for chunk_start, chunk_end in all_chunks
+        if any(chunk_start + timedelta(days=i) not in completed
+               for i in range((chunk_end - chunk_start).days + 1))
+    ]
+    total_days = (end - start).days + 1
+    pending_days = sum((chunk_end - chunk_start).days + 1 for chunk_start, chunk_end in pending)
+
+    progress = BackfillProgress(job_id, tenant_id, source, total_days, total_days - pending_days)
+    backfill_jobs[job_id] = progress
+    print(f"🧱 Backfill {source} for tenant {tenant_id}: {len(pending)}/{len(all_chunks)} chunks "
+          f"pending ({start} → {end})")
+
+    def run_chunk(chunk_start, chunk_end):
+        day = chunk_start
+        while day <= chunk_end:
+            if day not in completed:
+                limiter.wait()
+                fetch_once(tenant_id, source, day, lambda: fetch_day(day))
+            day += timedelta(days=1)
+        mark_chunk_done(tenant_id, source, chunk_start, chunk_end)
+        return (chunk_end - chunk_start).days + 1
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_chunk, *chunk): chunk for chunk in pending}
+        for future in as_completed(futures):
+            chunk_start, chunk_end = futures[future]
+            try:
+                progress.chunk_done(future.result())
+            except Exception as e:
+                print(f"❌ Backfill chunk {chunk_start} → {chunk_end} failed: {e}")
+                progress.chunk_failed(chunk_start, chunk_end, e)
+                continue
+            stats = progress.as_dict()
+            print(f"📦 {chunk_start} → {chunk_end} done | {stats['done_days']}/{pending_days} days | "
+                  f"{stats['days_per_minute']} days/min | ETA {stats['eta_seconds']}s")
+
+    progress.status = "failed" if progress.failed_chunks else "completed"
+    print(f"✅ Backfill {source} for tenant {tenant_id} {progress.status}.")
+    if progress.done_days:
+        run_post_ingest(tenant_id)
+    return progress.as_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable chunked GSC/GA4 backfill")
+    parser.add_argument("source", choices=["gsc", "ga4"])
+    parser.add_argument("tenant_id")
+    parser.add_argument("--start", help="YYYY-MM-DD (default: start of available history)")
+    parser.add_argument("--end", help="YYYY-MM-DD (default: newest complete day)")
+    parser.add_argument("--chunk-days", type=int, default=7)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--days-per-minute", type=int, default=60)
+    args = parser.parse_args()
+
+    start, end = default_range(args.source)
+    if args.start:
+        start = datetime.strptime(args.start, "%Y-%m-%d").date()
+    if args.end:
+        end = datetime.strptime(args.end, "%Y-%m-%d").date()
+
+    run_backfill(args.tenant_id, args.source, start, end,
+                 chunk_days=args.chunk_days, workers=args.workers,
+                 days_per_minute=args.days_per_minute)
+
+
+if __name__ == "__main__":
+    main()
@@ -66,7 +66,8 @@ class CloudflareAnalyticsExtractor:
         """
         return self._execute_query(query)
 
-    def format_data_to_dataframe(self, raw_data: Dict) -> pd.DataFrame:
+    @staticmethod
+    def format_data_to_dataframe(raw_data: Dict) -> pd.DataFrame:
         try:
             zones = raw_data.get('data', {}).get('viewer', {}).get('zones', [])
             if not zones or 'httpRequests1dGroups' not in zones[0]:
@@ -0,0 +1,117 @@
+# services/comparison_engine.py
+import numpy as np
+import pandas as pd
+
+
+def split_ranges(rows, columns, dim_col, metrics):
+    """
+    Splits one-pass comparison rows (dimension, date, in_range1, in_range2,
+    offset_1, offset_2, metrics) into a frame per range with dimension, date,
+    day offset from that range's start, and the metric columns.
+    A date inside both ranges (overlapping periods) lands in both frames.
+    """
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    keys = [dim_col, "date"] if dim_col else ["date"]
+
+    ranges = []
+    for n in (1, 2):
+        mask = frame[f"in_range{n}"].astype(bool)
+        part = frame.loc[mask, keys + list(metrics)].reset_index(drop=True)
+        part["offset"] = frame.loc[mask, f"offset_{n}"].to_numpy(dtype="int64")
+        ranges.append(part)
+    return ranges[0], ranges[1]
+
+
+def align_ranges(range1: pd.DataFrame, range2: pd.DataFrame, dim_col, metrics) -> pd.DataFrame:
+    """
+    Outer-joins the two ranges on (dimension, day offset) so day N of range 1
+    lines up with day N of range 2, then computes per-row diffs and percent
+    changes as column operations. A side with no row contributes 0 (and no date).
+    Columns: dimension, offset, date_1, date_2, <m>_1, <m>_2, <m>_diff, <m>_pct.
+    """
+    keys = [dim_col, "offset"] if dim_col else ["offset"]
+    merged = pd.merge(range1, range2, on=keys, how="outer", suffixes=("_1", "_2"), sort=True)
+
+    for m in metrics:
+        v1 = merged[f"{m}_1"].fillna(0).to_numpy(dtype="float64")
+        v2 = merged[f"{m}_2"].fillna(0).to_numpy(dtype="float64")
+        merged[f"{m}_1"] = v1
+        merged[f"{m}_2"] = v2
+        merged[f"{m}_diff"] = v2 - v1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            merged[f"{m}_pct"] = np.where(v1 != 0, (v2 - v1) / v1 * 100, np.nan)
+    return merged
+
+
+def _range_total(aligned: pd.DataFrame, metric, rollup, n) -> float:
+    # same roll-up as db.tables.rollup_sql: ratios from summed parts, weighted averages by volume
+    def total(column):
+        return float(aligned[f"{column}_{n}"].sum())
+
+    if rollup is None or rollup == "sum":
+        return total(metric)
+    if rollup[0] == "ratio":
+        den = total(rollup[2])
+        return total(rollup[1]) / den if den else 0.0
+    weight = aligned[f"{rollup[1]}_{n}"]
+    den = float(weight.sum())
+    return float((aligned[f"{metric}_{n}"] * weight).sum()) / den if den else 0.0
+
+
+def percentage_changes(aligned: pd.DataFrame, metrics, rollups=None) -> dict:
+    """
+    Percent change of each metric's range total, None where range 1 totals 0.
+    `rollups` (metric -> DATA_TABLES roll-up) makes ratio and weighted metrics
+    total correctly; without it every metric is summed.
+    """
+    rollups = rollups or {}
+    changes = {}
+    for m in metrics:
+        total1 = _range_total(aligned, m, rollups.get(m), 1)
+        total2 = _range_total(aligned, m, rollups.get(m), 2)
+        changes[m] = (total2 - total1) / total1 * 100 if total1 else None
+    return changes
+
+
+def _values(series: pd.Series) -> list:
+    # NaN/NaT -> None and numpy scalars -> Python, in one pass
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def to_columns(aligned: pd.DataFrame, dim_col, metrics) -> dict:
+    """Columnar shape: one list per column, no per-row objects."""
+    names = ([dim_col] if dim_col else []) + ["offset", "date_1", "date_2"]
+    for m in metrics:
+        names += [f"{m}_1", f"{m}_2", f"{m}_diff", f"{m}_pct"]
+    return {name: _values(aligned[name]) for name in names}
+
+
+def to_rows(aligned: pd.DataFrame, dim_col, metrics) -> list:
+    """
+    Row shape of daily_comparison: one dict per aligned (dimension, offset)
+    with {range1, range2, diff, pct_change} per metric. Built from column lists.
+    """
+    columns = to_columns(aligned, dim_col, metrics)
+    rows = []
+    for i, offset in enumerate(columns["offset"]):
+        date_1, date_2 = columns["date_1"][i], columns["date_2"][i]
+        row = {"date": date_1 or date_2, "offset": offset, "date1": date_1, "date2": date_2}
+        if dim_col:
+            row[dim_col] = columns[dim_col][i]
+        for m in metrics:
+            row[m] = {
+                "range1": columns[f"{m}_1"][i],
+                "range2": columns[f"{m}_2"][i],
+                "diff": columns[f"{m}_diff"][i],
+                "pct_change": columns[f"{m}_pct"][i],
+            }
+        rows.append(row)
+    return rows
+
+
+def range_records(frame: pd.DataFrame, dim_col, metrics) -> list:
+    """A range's rows as dicts ordered by date, the `data` arrays of the response."""
+    names = ([dim_col] if dim_col else []) + ["date"] + list(metrics)
+    frame = frame.sort_values("date", kind="stable")
+    columns = [_values(frame[name]) for name in names]
+    return [dict(zip(names, values)) for values in zip(*columns)]
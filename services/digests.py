@@ -0,0 +1,204 @@
+# services/digests.py
+import os
+import threading
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from email import encoders
+from email.mime.base import MIMEBase
+
+from db.db import (
+    claim_due_digests,
+    create_report_job,
+    finish_digest_run,
+    get_digest,
+    record_digest_artifact,
+    retry_digest_run,
+    set_report_job_status,
+)
+from db.tables import DATA_TABLES, TABLE_PATHS, rollup_sql
+from services.report_builder import render_report_message
+from services.report_dispatch import report_dispatcher, send_rendered, smtp_settings
+from utils.export_formats import iter_export
+from utils.zip_stream import stream_zip
+
+DIGEST_CADENCES = ("daily", "weekly", "monthly")
+# Generated archives live in DIGEST_DIR/<digest id>/<period start>_<period end>.zip
+DIGEST_DIR = os.getenv("DIGEST_DIR", "digests")
+DIGEST_HOUR_UTC = int(os.getenv("DIGEST_HOUR_UTC", 6))
+DIGEST_POLL_SECONDS = int(os.getenv("DIGEST_POLL_SECONDS", 60))
+# A claimed digest is left to its worker this long before another may take it over
+DIGEST_LEASE_SECONDS = int(os.getenv("DIGEST_LEASE_SECONDS", 3600))
+# Wait before a failed digest run is tried again for the same period
+DIGEST_RETRY_SECONDS = int(os.getenv("DIGEST_RETRY_SECONDS", 900))
+DIGEST_SCHEDULER_ENABLED = os.getenv("DIGEST_SCHEDULER_ENABLED", "true").lower() not in ("0", "false", "no")
+# Dimension values per table in a digest, largest first
+DIGEST_TOP_ROWS = 1000
+
+
+def digest_period(cadence: str, today: date):
+    """The complete period a digest run on `today` covers: yesterday, last Mon-Sun, or last month."""
+    if cadence == "daily":
+        day = today - timedelta(days=1)
+        return day, day
+    if cadence == "weekly":
+        monday = today - timedelta(days=today.weekday())
+        return monday - timedelta(days=7), monday - timedelta(days=1)
+    month_end = today.replace(day=1) - timedelta(days=1)
+    return month_end.replace(day=1), month_end
+
+
+def rollup_query(table: str):
+    """
+    Per-period rollup of one table: per-day totals for summary tables, the
+    top dimension values over the whole period for the others.
+    """
+    spec = DATA_TABLES[table]
+    metrics = ", ".join(f"{rollup_sql(table, m)} AS {m}" for m in spec["metrics"])
+    where = "tenant_id = %s AND date BETWEEN %s AND %s"
+    dim_col = spec["dimension"]
+    if not dim_col:
+        return f"SELECT date, {metrics} FROM {table} WHERE {where} GROUP BY date ORDER BY date"
+    return (f"SELECT {dim_col}, {metrics} FROM {table} WHERE {where} "
+            f"GROUP BY {dim_col} ORDER BY {rollup_sql(table, spec['sort_metric'])} DESC "
+            f"LIMIT {DIGEST_TOP_ROWS}")
+
+
+def artifact_path(digest_id: int, start: date, end: date) -> str:
+    return os.path.join(DIGEST_DIR, str(digest_id), f"{start}_{end}.zip")
+
+
+def build_digest_archive(digest: dict, start: date, end: date) -> str:
+    """
+    Streams one CSV per table rollup of the owning tenant's data into a single
+    deflated ZIP on disk and records it as the digest's latest artifact.
+    Returns its path.
+    """
+    tenant_id = digest["tenant_id"]
+    entries = (
+        (f"{tenant_id}/{path.replace('/', '_')}.csv",
+         iter_export(rollup_query(TABLE_PATHS[path]), (tenant_id, start, end), "csv"))
+        for path in digest["tables"]
+    )
+
+    path = artifact_path(digest["id"], start, end)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(partial, "wb") as f:
+        for chunk in stream_zip(entries):
+            f.write(chunk)
+    os.replace(partial, path)
+
+    record_digest_artifact(digest["id"], start, end, path)
+    return path
+
+
+def render_digest(digest: dict, start: date, end: date, path: str, sender: str) -> str:
+    part = MIMEBase("application", "zip")
+    with open(path, "rb") as f:
+        part.set_payload(f.read())
+    encoders.encode_base64(part)
+    part.add_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
+    return render_report_message(
+        sender, [part],
+        subject=f"📊 {digest['name']}: {start} → {end}",
+        body=f"Your {digest['cadence']} analytics digest for {start} to {end} is attached as one ZIP archive.",
+    )
+
+
+def deliver_digest(job_id: str, digest: dict, start: date, end: date, path: str = None):
+    """Report job body: builds the archive first when there is no `path`, then mails it."""
+    settings = smtp_settings()
+    try:
+        if path is None:
+            set_report_job_status(job_id, "building")
+            path = build_digest_archive(digest, start, end)
+        rendered = render_digest(digest, start, end, path, settings["user"])
+        send_rendered(job_id, list(dict.fromkeys(digest["recipients"])), rendered, settings)
+    except Exception as e:
+        print(f"❌ Digest job {job_id} failed: {e}")
+        set_report_job_status(job_id, "failed", str(e), finished=True)
+
+
+def send_digest(digest: dict, start: date, end: date, path: str = None) -> str:
+    """
+    Queues a report job delivering the archive at `path`, or building the
+    period's archive on the dispatcher thread first when `path` is None.
+    Returns its job id.
+    """
+    job_id = str(uuid.uuid4())
+    recipients = list(dict.fromkeys(digest["recipients"]))
+    create_report_job(job_id, digest["tenant_id"],
+                      {"digest_id": digest["id"], "start": str(start), "end": str(end)}, recipients)
+    report_dispatcher.enqueue(deliver_digest, job_id, digest, start, end, path)
+    return job_id
+
+
+def run_digest(digest: dict, today: date = None) -> str:
+    """Generates the digest's current period from the rollup tables and sends it."""
+    start, end = digest_period(digest["cadence"], today or datetime.now(timezone.utc).date())
+    path = build_digest_archive(digest, start, end)
+    print(f"🗂️ Digest {digest['id']} ({digest['name']}) built for {start} → {end}: {path}")
+    return send_digest(digest, start, end, path)
+
+
+def resend_digest(digest_id: int, tenant_id: str):
+    """
+    Sends the latest generated archive again without querying; a digest that
+    was never generated, or whose file is gone, is generated for its current
+    period as part of the queued job. Returns the job id, or None when the
+    digest does not exist or `tenant_id` does not own it.
+    """
+    digest = get_digest(digest_id, tenant_id)
+    if digest is None:
+        return None
+    path = digest["last_artifact"]
+    if path and os.path.exists(path):
+        return send_digest(digest, digest["last_period_start"], digest["last_period_end"], path)
+    start, end = digest_period(digest["cadence"], datetime.now(timezone.utc).date())
+    return send_digest(digest, start, end)
+
+
+class DigestScheduler:
+    """Polls for due digests every `interval` seconds on a background thread."""
+
+    def __init__(self, interval: int = DIGEST_POLL_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_due(self) -> int:
+        due = claim_due_digests(DIGEST_LEASE_SECONDS)
+        for digest in due:
+            # the period follows the due date, so a run retried past midnight still covers it
+            due_date = digest["next_run_at"].astimezone(timezone.utc).date()
+            try:
+                run_digest(digest, due_date)
+            except Exception as e:
+                print(f"❌ Digest {digest['id']} failed, retrying in {DIGEST_RETRY_SECONDS}s: {e}")
+                retry_digest_run(digest["id"], DIGEST_RETRY_SECONDS)
+                continue
+            finish_digest_run(digest["id"], DIGEST_HOUR_UTC)
+        return len(due)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_due()
+            except Exception as e:
+                print(f"❌ Digest scheduler poll failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if not DIGEST_SCHEDULER_ENABLED or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="digest-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+digest_scheduler = DigestScheduler()
@@ -1,13 +1,99 @@
 # services/ga4_daily_fetch.py
 from datetime import date
-from db.db import insert_rows, ensure_tenant_exists, get_connection
-import uuid, json
+from db.db import insert_columns, ensure_tenant_exists, get_connection
+import json
+import numpy as np
 
 from google.analytics.data_v1beta import BetaAnalyticsDataClient
-from google.analytics.data_v1beta.types import DateRange, Dimension, Metric, RunReportRequest
+from google.analytics.data_v1beta.types import DateRange, Dimension, Metric, RunReportRequest, RunReportResponse
 from google.oauth2 import service_account
+from google.protobuf import json_format
 from sqlalchemy.orm import Session
 from services.credential_service import get_credentials_for_service
+from services.raw_archive import archive_response
+from utils.ga4_utils import decode_report, per_user
+
+
+# Per table: GA4 dimensions and metrics, in request order, with the column and dtype they decode to.
+GA4_REPORTS = {
+    "ga4_top_pages_daily": {
+        "dimensions": [("pagePath", "page_path")],
+        "metrics": [
+            ("screenPageViews", "views", np.int64),
+            ("activeUsers", "active_users", np.int64),
+            ("bounceRate", "bounce_rate", np.float64),
+            ("engagementRate", "engagement_rate", np.float64),
+            ("averageSessionDuration", "avg_engagement_time", np.float64),
+            ("eventCount", "event_count", np.int64),
+        ],
+    },
+    "ga4_traffic_acquisition_daily": {
+        "dimensions": [("sessionSourceMedium", "source_medium")],
+        "metrics": [
+            ("sessions", "sessions", np.int64),
+            ("engagedSessions", "engaged_sessions", np.int64),
+            ("engagementRate", "engagement_rate", np.float64),
+            ("averageSessionDuration", "avg_engagement_time", np.float64),
+            ("eventsPerSession", "events_per_session", np.float64),
+            ("eventCount", "total_events", np.int64),
+        ],
+    },
+    "ga4_country_metrics_daily": {
+        "dimensions": [("country", "country")],
+        "metrics": [
+            ("activeUsers", "active_users", np.int64),
+            ("newUsers", "new_users", np.int64),
+            ("engagedSessions", "engaged_sessions", np.int64),
+            ("engagementRate", "engagement_rate", np.float64),
+            ("averageSessionDuration", "avg_engagement_time", np.float64),
+            ("eventCount", "event_count", np.int64),
+        ],
+    },
+    "ga4_browser_metrics_daily": {
+        "dimensions": [("browser", "browser")],
+        "metrics": [
+            ("activeUsers", "active_users", np.int64),
+            ("newUsers", "new_users", np.int64),
+            ("engagedSessions", "engaged_sessions", np.int64),
+            ("engagementRate", "engagement_rate", np.float64),
+            ("averageSessionDuration", "avg_engagement_time", np.float64),
+            ("eventCount", "event_count", np.int64),
+        ],
+    },
+}
+
+
+# Per table: derived per-user column -> numerator column
+GA4_DERIVED = {
+    "ga4_top_pages_daily": ("views_per_user", "views"),
+    "ga4_country_metrics_daily": ("engaged_sessions_per_user", "engaged_sessions"),
+    "ga4_browser_metrics_daily": ("engaged_sessions_per_user", "engaged_sessions"),
+}
+
+
+def decode_ga4_report(table_name, response):
+    """Decode one report into the column arrays of `table_name`, derived columns included."""
+    spec = GA4_REPORTS[table_name]
+    columns = decode_report(
+        response,
+        [column for _, column in spec["dimensions"]],
+        [(column, dtype) for _, column, dtype in spec["metrics"]],
+    )
+    if table_name in GA4_DERIVED:
+        column, numerator = GA4_DERIVED[table_name]
+        columns[column] = per_user(columns[numerator], columns["active_users"])
+    return columns
+
+
+def response_to_dict(response) -> dict:
+    return json_format.MessageToDict(RunReportResponse.pb(response), preserving_proto_field_name=True)
+
+
+def response_from_dict(payload: dict):
+    """Rebuild an archived report as a raw protobuf message (decode_report accepts either)."""
+    message = RunReportResponse.pb()()
+    json_format.ParseDict(payload, message, ignore_unknown_fields=True)
+    return message
 
 
 def run_report(client, property_id, dimensions, metrics, fetch_date):
@@ -55,117 +141,50 @@ def fetch_ga4_data(tenant_id, fetch_date, session_id):
     client = BetaAnalyticsDataClient(credentials=credentials)
 
     print(f"🔍 Using GA4 Property ID: {property_id}")
-    def safe_report(dimensions, metrics):
+    def fetch_report(table_name):
+        spec = GA4_REPORTS[table_name]
         try:
-            return run_report(client, property_id, dimensions, metrics, fetch_date).rows
+            response = run_report(
+                client, property_id,
+                [name for name, _ in spec["dimensions"]],
+                [name for name, _, _ in spec["metrics"]],
+                fetch_date,
+            )
         except Exception as e:
-            print(f"❌ Error fetching {dimensions}: {e}")
-            return []
-
-    # --- Top Pages ---
-    top_pages = []
-    for row in safe_report(
-        ["pagePath"],
-        ["screenPageViews", "activeUsers", "bounceRate", "engagementRate", "averageSessionDuration", "eventCount"]
-    ):
-        views = int(row.metric_values[0].value)
-        active_users = int(row.metric_values[1].value)
-        top_pages.append({
-            "tenant_id": tenant_id,
-            "session_id": session_id,
-            "page_path": row.dimension_values[0].value,
-            "views": views,
-            "active_users": active_users,
-            "bounce_rate": float(row.metric_values[2].value),
-            "engagement_rate": row.metric_values[3].value,
-            "avg_engagement_time": row.metric_values[4].value,
-            "event_count": int(row.metric_values[5].value),
-            "views_per_user": round(views / max(active_users, 1), 2),
-            "date": fetch_date
-        })
-
-    # --- Traffic Acquisition ---
-    traffic_sources = []
-    for row in safe_report(
-        ["sessionSourceMedium"],
-        ["sessions", "engagedSessions", "engagementRate", "averageSessionDuration", "eventsPerSession", "eventCount"]
-    ):
-        traffic_sources.append({
-            "tenant_id": tenant_id,
-            "session_id": session_id,
-            "source_medium": row.dimension_values[0].value,
-            "sessions": int(row.metric_values[0].value),
-            "engaged_sessions": int(row.metric_values[1].value),
-            "engagement_rate": row.metric_values[2].value,
-            "avg_engagement_time": row.metric_values[3].value,
-            "events_per_session": float(row.metric_values[4].value),
-            "total_events": int(row.metric_values[5].value),
-            "date": fetch_date
-        })
-
-    # --- Country Metrics ---
-    country_metrics = []
-    for row in safe_report(
-        ["country"],
-        ["activeUsers", "newUsers", "engagedSessions", "engagementRate", "averageSessionDuration", "eventCount"]
-    ):
-        active_users = int(row.metric_values[0].value)
-        engaged_sessions = int(row.metric_values[2].value)
-        country_metrics.append({
-            "tenant_id": tenant_id,
-            "session_id": session_id,
-            "country": row.dimension_values[0].value,
-            "active_users": active_users,
-            "new_users": int(row.metric_values[1].value),
-            "engaged_sessions": engaged_sessions,
-            "engagement_rate": row.metric_values[3].value,
-            "avg_engagement_time": row.metric_values[4].value,
-            "event_count": int(row.metric_values[5].value),
-            "engaged_sessions_per_user": round(engaged_sessions / max(active_users, 1), 2),
-            "date": fetch_date
-        })
-
-    # --- Browser Metrics ---
-    browser_metrics = []
-    for row in safe_report(
-        ["browser"],
-        ["activeUsers", "newUsers", "engagedSessions", "engagementRate", "averageSessionDuration", "eventCount"]
-    ):
-        active_users = int(row.metric_values[0].value)
-        engaged_sessions = int(row.metric_values[2].value)
-        browser_metrics.append({
-            "tenant_id": tenant_id,
-            "session_id": session_id,
-            "browser": row.dimension_values[0].value,
-            "active_users": active_users,
-            "new_users": int(row.metric_values[1].value),
-            "engaged_sessions": engaged_sessions,
-            "engagement_rate": row.metric_values[3].value,
-            "avg_engagement_time": row.metric_values[4].value,
-            "event_count": int(row.metric_values[5].value),
-            "engaged_sessions_per_user": round(engaged_sessions / max(active_users, 1), 2),
-            "date": fetch_date
-        })
-
-    return {
-        "ga4_top_pages_daily": top_pages,
-        "ga4_traffic_acquisition_daily": traffic_sources,
-        "ga4_country_metrics_daily": country_metrics,
-        "ga4_browser_metrics_daily": browser_metrics
-    }
+            # fail the whole day (quota, permissions...) so callers don't record it as fetched
+            print(f"❌ Error fetching {table_name}: {e}")
+            raise
+        archive_response(tenant_id, "ga4", fetch_date, table_name, response_to_dict(response))
+        return decode_ga4_report(table_name, response)
 
+    return {table_name: fetch_report(table_name) for table_name in GA4_REPORTS}
 
-def run_ga4_fetch_for_tenant(tenant_id: str, fetch_date: date, service_account: dict, property_id: str):
-    session_id = str(uuid.uuid4())
-    print(f"📈 Running GA4 fetch for tenant: {tenant_id} | date: {fetch_date}")
-    ensure_tenant_exists(tenant_id)
 
-    ga4_data = fetch_ga4_data(tenant_id, fetch_date, session_id)
+def store_ga4_tables(tenant_id: str, fetch_date: date, ga4_data: dict, cur=None):
+    # Deterministic per-row session ids make a re-fetch of the same day a no-op on insert
+    session_base = f"{tenant_id}_{fetch_date}"
 
-    for table_suffix, rows in ga4_data.items():
+    for table_suffix, columns in ga4_data.items():
         table_name = table_suffix
         readable_name = table_suffix.replace("ga4_", "").replace("_", " ").title()
-        print(f"📊 GA4 {readable_name} Rows on {fetch_date}: {len(rows)}")
-        insert_rows(table_name, rows)
+        print(f"📊 GA4 {readable_name} Rows on {fetch_date}: {len(next(iter(columns.values())))}")
+        dimension = GA4_REPORTS[table_name]["dimensions"][0][1]
+        columns["session_id"] = np.array(
+            [f"{session_base}_{table_name}_{value}" for value in columns[dimension]], dtype=object
+        )
+        insert_columns(
+            table_name,
+            columns,
+            constants={"tenant_id": tenant_id, "date": fetch_date},
+            cur=cur,
+        )
+
+
+def run_ga4_fetch_for_tenant(tenant_id: str, fetch_date: date, service_account: dict, property_id: str):
+    print(f"📈 Running GA4 fetch for tenant: {tenant_id} | date: {fetch_date}")
+    ensure_tenant_exists(tenant_id)
+
+    ga4_data = fetch_ga4_data(tenant_id, fetch_date, f"{tenant_id}_{fetch_date}")
+    store_ga4_tables(tenant_id, fetch_date, ga4_data)
 
-    print("✅ GA4 data fetched and stored successfully.\n")
\ No newline at end of file
+    print("✅ GA4 data fetched and stored successfully.\n")
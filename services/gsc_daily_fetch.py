@@ -3,6 +3,7 @@ from datetime import date, timedelta
 from googleapiclient.discovery import build
 from google.oauth2 import service_account
 import json
+import os
 from sqlalchemy.orm import Session
 
 
@@ -12,14 +13,88 @@ from db.db import (
     insert_gsc_pages_daily,
     insert_gsc_countries_daily,
     insert_gsc_devices_daily,
+    insert_gsc_facts_daily,
+    derive_gsc_rollups,
     get_connection,
  # ✅ NEW import
 )
 from services.credential_service import get_credentials_for_service
+from services.raw_archive import archive_response
 from utils.credential_utils import build_gsc_credentials
 
 SCOPES = ["https://www.googleapis.com/auth/webmasters.readonly"]
 
+# Report kind -> searchanalytics dimensions
+GSC_REPORTS = {
+    "summary": [],
+    "query": ["query"],
+    "page": ["page"],
+    "country": ["country"],
+    "device": ["device"],
+}
+
+# "tables": one API call per table (default).
+# "facts": one paginated query,page,country,device pull into gsc_facts_daily,
+#          with the per-table rollups derived from it in SQL.
+GSC_INGEST_MODE = os.getenv("GSC_INGEST_MODE", "tables")
+
+GSC_FACT_DIMENSIONS = ["query", "page", "country", "device"]
+GSC_ROW_LIMIT = 25000
+
+# Report kind -> (dimension column, writer)
+GSC_WRITERS = {
+    "summary": (None, insert_gsc_summary_daily),
+    "query": ("query", insert_gsc_queries_daily),
+    "page": ("page", insert_gsc_pages_daily),
+    "country": ("country", insert_gsc_countries_daily),
+    "device": ("device", insert_gsc_devices_daily),
+}
+
+
+def build_gsc_rows(tenant_id: str, target_date: date, kind: str, api_rows: list) -> list:
+    """Turn searchanalytics response rows into rows for the `kind` table."""
+    dim_col, _ = GSC_WRITERS[kind]
+    session_base = f"{tenant_id}_{target_date}"
+    rows = []
+    for idx, row in enumerate(api_rows):
+        data = {"date": target_date}
+        if dim_col:
+            data[dim_col] = row["keys"][0]
+        data.update({
+            "clicks": row["clicks"],
+            "impressions": row["impressions"],
+            "ctr": row["ctr"],
+            "position": row["position"],
+            "tenant_id": tenant_id,
+            "session_id": f"{session_base}_{kind}_{idx}"
+        })
+        rows.append(data)
+    return rows
+
+
+def build_gsc_fact_rows(tenant_id: str, target_date: date, api_rows: list) -> list:
+    return [
+        {
+            "date": target_date,
+            "query": row["keys"][0],
+            "page": row["keys"][1],
+            "country": row["keys"][2],
+            "device": row["keys"][3],
+            "clicks": row["clicks"],
+            "impressions": row["impressions"],
+            "ctr": row["ctr"],
+            "position": row["position"],
+            "tenant_id": tenant_id,
+        }
+        for row in api_rows
+    ]
+
+
+def store_gsc_rows(tenant_id: str, target_date: date, kind: str, api_rows: list):
+    _, writer = GSC_WRITERS[kind]
+    writer(build_gsc_rows(tenant_id, target_date, kind, api_rows))
+
+
 def initialize_gsc_api(credentials_data: dict):
     service_creds = build_gsc_credentials(credentials_data)
     credentials = service_account.Credentials.from_service_account_info(
@@ -36,7 +111,7 @@ def build_gsc_credentials(creds_data: dict):
     )
 
 
-def fetch_gsc_data(tenant_id: str, creds, site_url: str, target_date: date = None):
+def fetch_gsc_data(tenant_id: str, creds, site_url: str, target_date: date = None, mode: str = None):
     service = build("searchconsole", "v1", credentials=creds)
 
     if not site_url:
@@ -56,92 +131,39 @@ def fetch_gsc_data(tenant_id: str, creds, site_url: str, target_date: date = Non
     if target_date is None:
         target_date = date.today() - timedelta(days=3)
     start_date = end_date = target_date.isoformat()
-    session_base = f"{tenant_id}_{target_date}"
 
     print(f"\n🔄 Running GSC fetch for tenant: {tenant_id} | date: {target_date}")
 
-    def query_gsc(dimensions):
+    def query_gsc(dimensions, start_row=0):
         request = {
             "startDate": start_date,
             "endDate": end_date,
             "dimensions": dimensions,
-            "rowLimit": 25000,
+            "rowLimit": GSC_ROW_LIMIT,
+            "startRow": start_row,
         }
-        response = service.searchanalytics().query(siteUrl=site_url, body=request).execute()
-        return response.get("rows", [])
-
-    insert_gsc_summary_daily([
-        {
-            "date": target_date,
-            "clicks": row["clicks"],
-            "impressions": row["impressions"],
-            "ctr": row["ctr"],
-            "position": row["position"],
-            "tenant_id": tenant_id,
-            "session_id": f"{session_base}_summary_{idx}"
-        }
-        for idx, row in enumerate(query_gsc([]))
-    ])
-
-    insert_gsc_queries_daily([
-        {
-            "date": target_date,
-            "query": row["keys"][0],
-            "clicks": row["clicks"],
-            "impressions": row["impressions"],
-            "ctr": row["ctr"],
-            "position": row["position"],
-            "tenant_id": tenant_id,
-            "session_id": f"{session_base}_query_{idx}"
-        }
-        for idx, row in enumerate(query_gsc(["query"]))
-    ])
-
-    insert_gsc_pages_daily([
-        {
-            "date": target_date,
-            "page": row["keys"][0],
-            "clicks": row["clicks"],
-            "impressions": row["impressions"],
-            "ctr": row["ctr"],
-            "position": row["position"],
-            "tenant_id": tenant_id,
-            "session_id": f"{session_base}_page_{idx}"
-        }
-        for idx, row in enumerate(query_gsc(["page"]))
-    ])
-
-    insert_gsc_countries_daily([
-        {
-            "date": target_date,
-            "country": row["keys"][0],
-            "clicks": row["clicks"],
-            "impressions": row["impressions"],
-            "ctr": row["ctr"],
-            "position": row["position"],
-            "tenant_id": tenant_id,
-            "session_id": f"{session_base}_country_{idx}"
-        }
-        for idx, row in enumerate(query_gsc(["country"]))
-    ])
-
-    insert_gsc_devices_daily([
-        {
-            "date": target_date,
-            "device": row["keys"][0],
-            "clicks": row["clicks"],
-            "impressions": row["impressions"],
-            "ctr": row["ctr"],
-            "position": row["position"],
-            "tenant_id": tenant_id,
-            "session_id": f"{session_base}_device_{idx}"
-        }
-        for idx, row in enumerate(query_gsc(["device"]))
-    ])
+        return service.searchanalytics().query(siteUrl=site_url, body=request).execute()
+
+    if (mode or GSC_INGEST_MODE) == "facts":
+        page = 0
+        while True:
+            response = query_gsc(GSC_FACT_DIMENSIONS, start_row=page * GSC_ROW_LIMIT)
+            archive_response(tenant_id, "gsc", target_date, f"facts_{page}", response)
+            api_rows = response.get("rows", [])
+            insert_gsc_facts_daily(build_gsc_fact_rows(tenant_id, target_date, api_rows))
+            if len(api_rows) < GSC_ROW_LIMIT:
+                break
+            page += 1
+        derive_gsc_rollups(tenant_id, target_date)
+    else:
+        for kind, dimensions in GSC_REPORTS.items():
+            response = query_gsc(dimensions)
+            archive_response(tenant_id, "gsc", target_date, kind, response)
+            store_gsc_rows(tenant_id, target_date, kind, response.get("rows", []))
 
     print("✅ GSC data fetched and stored successfully.")
     
-def run_gsc_fetch_for_tenant(tenant_id: str, target_date=None):
+def run_gsc_fetch_for_tenant(tenant_id: str, target_date=None, mode: str = None):
     with get_connection() as conn:
         db = Session(bind=conn)
         raw_creds = get_credentials_for_service(tenant_id, "gsc")  # Pass db session if needed
@@ -164,5 +186,5 @@ def run_gsc_fetch_for_tenant(tenant_id: str, target_date=None):
     if target_date is None:
         target_date = date.today() - timedelta(days=3)
 
-    fetch_gsc_data(tenant_id, creds, creds_data.get("site_url"), target_date)
+    fetch_gsc_data(tenant_id, creds, creds_data.get("site_url"), target_date, mode)
 
@@ -0,0 +1,27 @@
+# services/post_ingest.py
+import time
+
+from services.standard_comparisons import refresh_standard_comparisons
+
+# Work that derives from freshly ingested rows, run in order once a tenant's ingest succeeds
+POST_INGEST_STAGES = [
+    ("standard_comparisons", refresh_standard_comparisons),
+]
+
+
+def run_post_ingest(tenant_id: str) -> dict:
+    """
+    Runs every post-ingest stage for the tenant. A failing stage is logged and
+    does not stop the others; the ingest itself has already committed.
+    """
+    results = {}
+    for name, stage in POST_INGEST_STAGES:
+        started = time.perf_counter()
+        try:
+            results[name] = stage(tenant_id)
+            print(f"🧮 Post-ingest {name} for tenant {tenant_id}: {results[name]} "
+                  f"in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            print(f"❌ Post-ingest {name} failed for tenant {tenant_id}: {e}")
+            results[name] = None
+    return results
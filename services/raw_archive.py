@@ -0,0 +1,78 @@
+# services/raw_archive.py
+import gzip
+import json
+import os
+import threading
+from datetime import date, datetime
+
+# Raw API responses are spooled to ARCHIVE_DIR/<tenant>/<source>/<YYYY-MM-DD>.jsonl.gz
+ARCHIVE_DIR = os.getenv("RAW_ARCHIVE_DIR", "archive")
+ARCHIVE_ENABLED = os.getenv("RAW_ARCHIVE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+_write_lock = threading.Lock()
+
+
+def archive_path(tenant_id: str, source: str, day) -> str:
+    return os.path.join(ARCHIVE_DIR, str(tenant_id), source, f"{day}.jsonl.gz")
+
+
+def archive_response(tenant_id: str, source: str, day, kind: str, payload: dict):
+    """
+    Appends one raw response to the day's archive as a JSON line.
+    Each append is its own gzip member, which gzip readers concatenate transparently.
+    Archiving is best effort: a failure is logged and never fails the ingest.
+    """
+    if not ARCHIVE_ENABLED:
+        return
+
+    path = archive_path(tenant_id, source, day)
+    record = json.dumps({
+        "kind": kind,
+        "fetched_at": datetime.utcnow().isoformat(),
+        "payload": payload,
+    }, default=str)
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with _write_lock, gzip.open(path, "at", encoding="utf-8") as f:
+            f.write(record + "\n")
+    except OSError as e:
+        print(f"⚠️ Could not archive {source}/{kind} response for tenant {tenant_id} on {day}: {e}")
+
+
+def archive_cloudflare_response(tenant_id: str, raw_data: dict):
+    """Splits a multi-day Cloudflare response into one archived response per day."""
+    zones = raw_data.get("data", {}).get("viewer", {}).get("zones", [])
+    groups = zones[0].get("httpRequests1dGroups", []) if zones else []
+    for item in groups:
+        day_response = {"data": {"viewer": {"zones": [{"httpRequests1dGroups": [item]}]}}}
+        archive_response(tenant_id, "cloudflare", item["date"]["date"], "summary", day_response)
+
+
+def read_archive(tenant_id: str, source: str, day) -> dict:
+    """Returns kind -> payload for one archived day; the latest fetch of each kind wins."""
+    path = archive_path(tenant_id, source, day)
+    if not os.path.exists(path):
+        return {}
+
+    latest = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            latest[record["kind"]] = record["payload"]
+    return latest
+
+
+def archived_days(tenant_id: str, source: str, start: date = None, end: date = None) -> list:
+    source_dir = os.path.join(ARCHIVE_DIR, str(tenant_id), source)
+    if not os.path.isdir(source_dir):
+        return []
+
+    days = []
+    for name in os.listdir(source_dir):
+        if not name.endswith(".jsonl.gz"):
+            continue
+        day = datetime.strptime(name[:-len(".jsonl.gz")], "%Y-%m-%d").date()
+        if (start is None or day >= start) and (end is None or day <= end):
+            days.append(day)
+    return sorted(days)
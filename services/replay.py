@@ -0,0 +1,159 @@
+# services/replay.py
+import argparse
+from datetime import datetime
+
+from db.db import (
+    GSC_ROLLUPS,
+    delete_tenant_day,
+    derive_gsc_rollups,
+    ensure_tenant_exists,
+    get_connection,
+    insert_cloudflare_summary_daily,
+    insert_gsc_facts_daily,
+)
+from services.cloudflare_service import CloudflareAnalyticsExtractor
+from services.post_ingest import run_post_ingest
+from services.ga4_daily_fetch import decode_ga4_report, response_from_dict, store_ga4_tables
+from services.gsc_daily_fetch import GSC_WRITERS, build_gsc_fact_rows, build_gsc_rows
+from services.raw_archive import archived_days, read_archive
+
+# Rows buffered across GSC tables before the days holding them are committed
+REPLAY_BATCH_ROWS = 50000
+
+# GSC archive kind -> table it rebuilds
+GSC_KIND_TABLES = {dim_col or "summary": table for table, dim_col in GSC_ROLLUPS.items()}
+GSC_KIND_TABLES["facts"] = "gsc_facts_daily"
+
+
+# Each replayed day is deleted from the tables its archive covers before its rows
+# are re-inserted: the insert helpers skip existing session ids, so without this
+# a replay could only fill gaps, never rewrite rows stored by an older parser.
+# The delete and the re-insert share one transaction, so a replay that fails part
+# way (a corrupt archive, a decode or database error) leaves those days as they were.
+def replay_gsc(tenant_id: str, start=None, end=None) -> int:
+    writers = {kind: writer for kind, (_, writer) in GSC_WRITERS.items()}
+    writers["facts"] = insert_gsc_facts_daily
+    pending = {kind: [] for kind in writers}
+    fact_days = []
+    total = 0
+
+    def commit(conn, cur):
+        # whole days only: every day deleted in this transaction has all its rows pending
+        for kind, rows in pending.items():
+            if rows:
+                writers[kind](rows, cur)
+                pending[kind] = []
+        conn.commit()
+        for day in fact_days:
+            derive_gsc_rollups(tenant_id, day)
+        fact_days.clear()
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            for day in archived_days(tenant_id, "gsc", start, end):
+                archive = read_archive(tenant_id, "gsc", day)
+                kinds = {"facts" if kind.startswith("facts_") else kind for kind in archive}
+                delete_tenant_day(tenant_id, day, [GSC_KIND_TABLES[kind] for kind in sorted(kinds)], cur)
+                for kind, payload in archive.items():
+                    api_rows = payload.get("rows", [])
+                    # facts-mode days are archived as facts_0, facts_1, ... pages
+                    if kind.startswith("facts_"):
+                        kind = "facts"
+                        rows = build_gsc_fact_rows(tenant_id, day, api_rows)
+                        if not fact_days or fact_days[-1] != day:
+                            fact_days.append(day)
+                    else:
+                        rows = build_gsc_rows(tenant_id, day, kind, api_rows)
+                    pending[kind].extend(rows)
+                    total += len(rows)
+                if sum(len(rows) for rows in pending.values()) >= REPLAY_BATCH_ROWS:
+                    commit(conn, cur)
+            commit(conn, cur)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return total
+
+
+def replay_ga4(tenant_id: str, start=None, end=None) -> int:
+    total = 0
+    for day in archived_days(tenant_id, "ga4", start, end):
+        ga4_data = {
+            table_name: decode_ga4_report(table_name, response_from_dict(payload))
+            for table_name, payload in read_archive(tenant_id, "ga4", day).items()
+        }
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                delete_tenant_day(tenant_id, day, list(ga4_data), cur)
+                store_ga4_tables(tenant_id, day, ga4_data, cur)
+            conn.commit()
+        total += sum(len(next(iter(columns.values()))) for columns in ga4_data.values())
+    return total
+
+
+def replay_cloudflare(tenant_id: str, start=None, end=None) -> int:
+    days = []
+    rows = []
+    for day in archived_days(tenant_id, "cloudflare", start, end):
+        payload = read_archive(tenant_id, "cloudflare", day).get("summary")
+        if not payload:
+            continue
+        days.append(day)
+        df = CloudflareAnalyticsExtractor.format_data_to_dataframe(payload)
+        rows.extend(
+            {
+                "tenant_id": tenant_id,
+                "session_id": f"{tenant_id}_{row['date']}",
+                "date": row["date"],
+                "page_views": int(row["page_views"]),
+                "visits": int(row["visits"]),
+            }
+            for row in df.to_dict(orient="records")
+        )
+    # every archive is decoded before anything is deleted
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for day in days:
+                delete_tenant_day(tenant_id, day, ["cloudflare_summary_daily"], cur)
+            insert_cloudflare_summary_daily(rows, cur)
+        conn.commit()
+    return len(rows)
+
+
+REPLAYERS = {
+    "gsc": replay_gsc,
+    "ga4": replay_ga4,
+    "cloudflare": replay_cloudflare,
+}
+
+
+def replay(tenant_id: str, sources=None, start=None, end=None) -> dict:
+    """Rebuilds the *_daily tables for a tenant from the raw archive, without touching any API."""
+    ensure_tenant_exists(tenant_id)
+    counts = {}
+    for source in sources or REPLAYERS:
+        counts[source] = REPLAYERS[source](tenant_id, start, end)
+        print(f"♻️ Replayed {counts[source]} {source} rows for tenant {tenant_id}")
+    if any(counts.values()):
+        run_post_ingest(tenant_id)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild *_daily tables from the raw response archive")
+    parser.add_argument("tenant_id")
+    parser.add_argument("--source", nargs="+", choices=list(REPLAYERS), default=list(REPLAYERS))
+    parser.add_argument("--start", help="YYYY-MM-DD")
+    parser.add_argument("--end", help="YYYY-MM-DD")
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else None
+    end = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else None
+    replay(args.tenant_id, args.source, start, end)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# services/report_builder.py
+import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from io import StringIO
+
+from db.db import fetch_all, get_connection
+
+# Report keys the UI offers per source -> table
+REPORT_TABLES = {
+    "gsc": {
+        "GSC - Summary": "gsc_summary_daily",
+        "GSC - Queries": "gsc_queries_daily",
+        "GSC - Page": "gsc_pages_daily",
+        "GSC - Country": "gsc_countries_daily",
+        "GSC - Device": "gsc_devices_daily",
+    },
+    "ga4": {
+        "GA4 - Page": "ga4_top_pages_daily",
+        "GA4 - Traffic": "ga4_traffic_acquisition_daily",
+        "GA4 - Country": "ga4_country_metrics_daily",
+        "GA4 - Browser": "ga4_browser_metrics_daily",
+    },
+    "cf": {
+        "CF - Cloudflare CSV": "cloudflare_summary_daily",
+    },
+}
+
+# Attachments queried and encoded concurrently
+REPORT_BUILD_WORKERS = int(os.getenv("REPORT_BUILD_WORKERS", 4))
+
+
+def dicts_to_csv_attachment(data, metric_name="Report", filename="report.csv"):
+    if not data:
+        data = []
+
+    if data and isinstance(data[0], tuple):
+        headers = [f"col{i}" for i in range(len(data[0]))]
+        rows = data
+    else:
+        headers = list(data[0].keys()) if data else []
+        rows = [tuple(d[h] for h in headers) for d in data]
+
+    headers = ["Metric"] + headers
+    rows = [(metric_name, *row) for row in rows]
+
+    csv_buffer = StringIO()
+    writer = csv.writer(csv_buffer)
+    writer.writerow(headers)
+    writer.writerows(rows)
+
+    mime_part = MIMEBase('application', 'octet-stream')
+    mime_part.set_payload(csv_buffer.getvalue())
+    encoders.encode_base64(mime_part)
+    mime_part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
+
+    return mime_part
+
+def get_all_tenants():
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT tenant_id FROM tenants")
+            return [row[0] for row in cur.fetchall()]
+
+
+def report_selection(tables: dict) -> list:
+    """(report key, table) pairs requested per source, in source order; unknown keys are ignored."""
+    selection = []
+    for source, mapping in REPORT_TABLES.items():
+        selection += [(key, mapping[key]) for key in tables.get(source, []) if key in mapping]
+    return selection
+
+
+def build_attachment(tenant_id, key, table_name):
+    data = fetch_all(table_name, tenant_id)
+    safe_name = key.replace(" ", "").replace("-", "")
+    return dicts_to_csv_attachment(data, metric_name=key, filename=f"{safe_name}.csv")
+
+
+def build_attachments(tenants, selection, workers: int = REPORT_BUILD_WORKERS) -> list:
+    """
+    Build phase: queries and base64-encodes every (tenant, table) attachment
+    exactly once, `workers` at a time, in tenant-then-selection order.
+    """
+    jobs = [(tenant_id, key, table_name) for tenant_id in tenants for key, table_name in selection]
+    if workers <= 1 or len(jobs) <= 1:
+        return [build_attachment(*job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda job: build_attachment(*job), jobs))
+
+
+def render_report_message(sender, attachments, subject="📊 Analytics CSV Report",
+                          body="Please find attached CSV reports for all metrics.") -> str:
+    """
+    Serializes the message once, without a To header: every recipient gets the
+    same text with only their own To line prepended (see address_message).
+    """
+    msg = MIMEMultipart()
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg.attach(MIMEText(body, "plain"))
+    for part in attachments:
+        msg.attach(part)
+    return msg.as_string()
+
+
+def address_message(rendered: str, recipient: str) -> str:
+    if "\r" in recipient or "\n" in recipient:
+        raise ValueError(f"Invalid recipient address: {recipient!r}")
+    return f"To: {recipient}\n{rendered}"
@@ -0,0 +1,211 @@
+# services/report_dispatch.py
+import os
+import queue
+import smtplib
+import ssl
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from db.db import create_report_job, record_report_delivery, set_report_job_status
+from services.report_builder import (
+    address_message,
+    build_attachments,
+    get_all_tenants,
+    render_report_message,
+    report_selection,
+)
+
+# Parallel SMTP sessions per report job
+REPORT_SMTP_CONNECTIONS = int(os.getenv("REPORT_SMTP_CONNECTIONS", 4))
+# Sends to one recipient before it is marked failed (a dropped connection is retried)
+REPORT_SEND_ATTEMPTS = 2
+
+
+def smtp_settings() -> dict:
+    return {
+        "host": os.getenv("SMTP_HOST", "smtp.gmail.com"),
+        "port": int(os.getenv("SMTP_PORT", 587)),
+        "user": os.getenv("EMAIL_ACCOUNT"),
+        "password": os.getenv("EMAIL_PASSWORD"),
+        "starttls": os.getenv("SMTP_STARTTLS", "true").lower() not in ("0", "false", "no"),
+    }
+
+
+class SmtpPool:
+    """
+    Up to `size` logged-in SMTP sessions, opened on first use and reused
+    across sends. A session that errors at the connection level is discarded
+    and the next borrower opens a fresh one.
+    """
+
+    def __init__(self, host, port, user=None, password=None, starttls=True, size=4, timeout=30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls(context=ssl.create_default_context())
+        if self.user:
+            server.login(self.user, self.password)
+        return server
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            with self._lock:
+                server = self._idle.pop() if self._idle else None
+            server = server or self._connect()
+            try:
+                yield server
+            except smtplib.SMTPServerDisconnected:
+                server.close()
+                raise
+            except smtplib.SMTPException:
+                # refused sender/recipient/data: sendmail already reset the session
+                self._release(server)
+                raise
+            except OSError:
+                server.close()
+                raise
+            self._release(server)
+        finally:
+            self._slots.release()
+
+    def _release(self, server):
+        with self._lock:
+            self._idle.append(server)
+
+    def send(self, sender, recipient, message):
+        with self.connection() as server:
+            server.sendmail(sender, [recipient], message)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server in idle:
+            try:
+                server.quit()
+            except OSError:
+                server.close()
+
+
+def deliver(pool: SmtpPool, job_id, sender, recipient, rendered) -> bool:
+    """
+    Sends one recipient's copy and records the outcome. A refused recipient
+    fails alone; a dropped connection is retried on a fresh session.
+    """
+    error = None
+    attempts = 0
+    while attempts < REPORT_SEND_ATTEMPTS:
+        attempts += 1
+        try:
+            pool.send(sender, recipient, address_message(rendered, recipient))
+            record_report_delivery(job_id, recipient, "sent", attempts=attempts)
+            return True
+        except smtplib.SMTPServerDisconnected as e:
+            error = e
+        except (smtplib.SMTPException, ValueError) as e:
+            # SMTPException subclasses OSError, so it is matched before the socket errors
+            error = e
+            break
+        except OSError as e:
+            error = e
+    print(f"❌ Report {job_id} to {recipient} failed: {error}")
+    record_report_delivery(job_id, recipient, "failed", str(error), attempts)
+    return False
+
+
+def send_rendered(job_id: str, emails, rendered: str, settings: dict = None):
+    """Sends a rendered message to every recipient over a fresh SMTP pool and settles the job."""
+    settings = settings or smtp_settings()
+    pool = SmtpPool(**settings, size=min(REPORT_SMTP_CONNECTIONS, len(emails)) or 1)
+    try:
+        set_report_job_status(job_id, "sending")
+        with ThreadPoolExecutor(max_workers=pool.size) as executor:
+            sent = list(executor.map(
+                lambda email: deliver(pool, job_id, settings["user"], email, rendered), emails
+            ))
+    finally:
+        pool.close()
+
+    status = "completed" if all(sent) else "partial" if any(sent) else "failed"
+    print(f"📧 Report job {job_id} {status}: {sum(sent)}/{len(sent)} sent")
+    set_report_job_status(job_id, status, finished=True)
+
+
+def run_report_job(job_id: str, request: dict, settings: dict = None):
+    """Builds the job's attachments once, then sends every recipient's copy over the SMTP pool."""
+    settings = settings or smtp_settings()
+    try:
+        set_report_job_status(job_id, "building")
+        attachments = build_attachments(get_all_tenants(), report_selection(request))
+        rendered = render_report_message(settings["user"], attachments)
+        send_rendered(job_id, list(dict.fromkeys(request["emails"])), rendered, settings)
+    except Exception as e:
+        print(f"❌ Report job {job_id} failed: {e}")
+        set_report_job_status(job_id, "failed", str(e), finished=True)
+
+
+class ReportDispatcher:
+    """
+    Queue of report work drained by one background thread, so a request only
+    records the job and returns. Jobs run one at a time; each fans out over
+    its own SMTP pool.
+    """
+
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="report-dispatch", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            fn, args = job
+            try:
+                fn(*args)
+            except Exception as e:
+                # a status write failed; keep draining the queue
+                print(f"❌ Report dispatcher error in {fn.__name__}: {e}")
+
+    def enqueue(self, fn, *args):
+        """Runs `fn(*args)` on the dispatcher thread after the jobs already queued."""
+        self._jobs.put((fn, args))
+        self._ensure_worker()
+
+    def submit(self, request: dict, tenant_id: str) -> str:
+        job_id = str(uuid.uuid4())
+        create_report_job(job_id, tenant_id, request, dict.fromkeys(request["emails"]))
+        self.enqueue(run_report_job, job_id, request)
+        return job_id
+
+    def stop(self, timeout: float = 30):
+        """Lets queued jobs finish, then stops the worker."""
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._jobs.put(None)
+            thread.join(timeout)
+
+
+report_dispatcher = ReportDispatcher()
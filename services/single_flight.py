@@ -0,0 +1,114 @@
+# services/single_flight.py
+import hashlib
+import threading
+
+from db.db import get_connection
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one execution.
+    Callers that arrive while a call is in flight wait for it and share its
+    result (or its exception) instead of running the work again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+def advisory_lock_key(*parts) -> int:
+    """Stable signed 64-bit key for pg_advisory_lock from arbitrary key parts."""
+    digest = hashlib.blake2b("|".join(str(p) for p in parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _run_and_mark(cur, lock_key, fn):
+    fn()
+    cur.execute("""
+        INSERT INTO fetch_completions (lock_key, completed_at) VALUES (%s, now())
+        ON CONFLICT (lock_key) DO UPDATE SET completed_at = EXCLUDED.completed_at
+    """, (lock_key,))
+
+
+def run_with_advisory_lock(key, fn) -> bool:
+    """
+    Runs fn while holding a Postgres advisory lock for key, so only one
+    uvicorn worker fetches a given unit of work at a time.
+    If another worker already holds the lock, waits for it to finish and
+    returns False without running fn when that worker completed the unit
+    (its rows are already stored); if it failed, runs fn here instead.
+    Returns True when fn was run here.
+    """
+    lock_key = advisory_lock_key(*key)
+    conn = get_connection()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s), now()", (lock_key,))
+            locked, asked_at = cur.fetchone()
+            if not locked:
+                print(f"⏳ {key} is already being fetched by another worker, waiting...")
+                cur.execute("SELECT pg_advisory_lock(%s)", (lock_key,))
+            try:
+                if not locked:
+                    # the holder marks the unit only after fn succeeded
+                    cur.execute(
+                        "SELECT 1 FROM fetch_completions WHERE lock_key = %s AND completed_at >= %s",
+                        (lock_key, asked_at),
+                    )
+                    if cur.fetchone():
+                        return False
+                    print(f"🔁 {key} was not completed by the other worker, fetching it here")
+                _run_and_mark(cur, lock_key, fn)
+                return True
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (lock_key,))
+    finally:
+        conn.close()
+
+
+_flights = SingleFlight()
+
+
+def fetch_once(tenant_id: str, source: str, unit, fn) -> bool:
+    """
+    Deduplicated fetch of one (tenant, source, date) unit of work.
+    Concurrent callers in this process share one in-flight call; callers in
+    other workers are serialized on an advisory lock and skip the API.
+    Returns True if this call (or the in-process call it joined) hit the API.
+    """
+    key = (tenant_id, source, str(unit))
+    return _flights.do(key, lambda: run_with_advisory_lock(key, fn))
@@ -0,0 +1,80 @@
+# services/standard_comparisons.py
+from datetime import date, timedelta
+
+from db.db import get_data_version, prune_standard_comparisons, upsert_standard_comparison
+from models.token_data import TokenData
+from utils.response_cache import encode_json, params_key
+
+# Days between today and the newest complete day of each source (GSC is fetched 3 days behind)
+SOURCE_LAG_DAYS = {"gsc": 3, "ga4": 1, "cloudflare": 1}
+
+
+def _window(start1, end1, start2, end2) -> dict:
+    return {"start1": start1, "end1": end1, "start2": start2, "end2": end2}
+
+
+def standard_windows(today: date = None, lag_days: int = 1) -> dict:
+    """
+    The comparisons dashboards ask for most, ending on the newest complete day.
+    range1 is always the earlier period, range2 the recent one.
+    """
+    end = (today or date.today()) - timedelta(days=lag_days)
+
+    def trailing(days, shift):
+        return end - timedelta(days=shift + days - 1), end - timedelta(days=shift)
+
+    month_start = end.replace(day=1)
+    prev_month_end = month_start - timedelta(days=1)
+    prev_month_start = prev_month_end.replace(day=1)
+    # month to date against the same number of days of the previous month
+    prev_to_date = min(prev_month_start + (end - month_start), prev_month_end)
+
+    return {
+        "last_7_vs_previous_7": _window(*trailing(7, 7), *trailing(7, 0)),
+        "last_28_vs_previous_28": _window(*trailing(28, 28), *trailing(28, 0)),
+        "month_to_date_vs_last_month": _window(prev_month_start, prev_to_date, month_start, end),
+        # 364 days keeps weekdays aligned with last year
+        "last_28_vs_last_year": _window(*trailing(28, 364), *trailing(28, 0)),
+    }
+
+
+def refresh_standard_comparisons(tenant_id: str, today: date = None) -> int:
+    """
+    Computes every standard window of /compare/gsc, /compare/ga4 and
+    /compare/cloudflare for the tenant and stores the encoded responses,
+    stamped with the data generation they were computed from.
+    Returns the number of payloads stored.
+    """
+    # the compute functions live with their endpoints, which import this module
+    from router.compare_router import (
+        CompareRequest,
+        GscCompareRequest,
+        compute_cloudflare_comparison,
+        compute_ga4_comparison,
+        compute_gsc_comparison,
+    )
+
+    generation, _ = get_data_version(tenant_id)
+    if not generation:
+        return 0
+
+    endpoints = {
+        "gsc": (GscCompareRequest, compute_gsc_comparison),
+        "ga4": (CompareRequest, compute_ga4_comparison),
+        "cloudflare": (CompareRequest, compute_cloudflare_comparison),
+    }
+    user = TokenData(username="post-ingest", tenant_id=tenant_id)
+
+    stored = 0
+    for source, (request_model, compute) in endpoints.items():
+        for window_name, window in standard_windows(today, SOURCE_LAG_DAYS[source]).items():
+            req = request_model(**window)
+            payload = encode_json(compute(req, user)).decode()
+            upsert_standard_comparison(
+                tenant_id, f"compare/{source}", params_key(req.model_dump()),
+                window_name, generation, payload,
+            )
+            stored += 1
+
+    prune_standard_comparisons(tenant_id, generation)
+    return stored
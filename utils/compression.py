@@ -0,0 +1,154 @@
+# utils/compression.py
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it everything falls back to gzip
+    brotli = None
+
+# Already-compressed or streaming-event payloads are passed through untouched
+SKIP_CONTENT_TYPES = {
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/vnd.apache.parquet",
+    "application/vnd.apache.arrow.stream",
+    "text/event-stream",
+}
+
+
+def _accepted_encodings(scope) -> set:
+    header = Headers(scope=scope).get("accept-encoding", "")
+    return {token.split(";")[0].strip().lower() for token in header.split(",")}
+
+
+class _Responder:
+    """
+    Compresses one response with `encoding`, passing through responses that
+    are already encoded, of a SKIP_CONTENT_TYPES / media type, or smaller
+    than `minimum_size`. Subclasses provide process/flush/finish.
+    """
+
+    encoding = None
+
+    def __init__(self, app, minimum_size: int):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.initial_message = None
+        self.passthrough = False
+        self.started = False
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message):
+        if message["type"] == "http.response.start":
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+            self.passthrough = (
+                "content-encoding" in headers
+                or media_type in SKIP_CONTENT_TYPES
+                or media_type.startswith(("image/", "video/", "audio/"))
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            if not more_body and len(body) < self.minimum_size:
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                body = self.process(body) + self.finish()
+                headers["Content-Length"] = str(len(body))
+                await self.send(self.initial_message)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            await self.send(self.initial_message)
+
+        chunk = self.process(body)
+        chunk += self.flush() if more_body else self.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+class _BrotliResponder(_Responder):
+    encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int):
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def process(self, body):
+        return self.compressor.process(body)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class _GzipResponder(_Responder):
+    encoding = "gzip"
+
+    def __init__(self, app, minimum_size: int, level: int):
+        super().__init__(app, minimum_size)
+        # wbits 16 + 15: gzip header and trailer around a deflate stream
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def process(self, body):
+        return self.compressor.compress(body)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses of at least `minimum_size` bytes: brotli when the
+    client accepts it and the brotli package is installed, gzip otherwise.
+    Streaming responses are compressed chunk by chunk; SKIP_CONTENT_TYPES
+    are sent as they are with either encoding.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = _accepted_encodings(scope)
+        if brotli is not None and "br" in accepted:
+            responder = _BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+        elif "gzip" in accepted:
+            responder = _GzipResponder(self.app, self.minimum_size, self.gzip_level)
+        else:
+            await self.app(scope, receive, send)
+            return
+        await responder(scope, receive, send)
@@ -0,0 +1,108 @@
+# utils/export_formats.py
+import csv
+from io import StringIO
+
+from db.db import iter_query_batches
+from utils.zip_stream import ChunkSink
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; parquet/arrow exports are then unavailable
+    pa = None
+    pq = None
+
+CSV_BATCH_ROWS = 5000
+# Columnar formats compress better with larger batches (one parquet row group per batch)
+ARROW_BATCH_ROWS = 50000
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", ".arrows"),
+}
+
+
+def format_available(fmt: str) -> bool:
+    return fmt == "csv" or pa is not None
+
+
+def encode_csv(batches):
+    """Turns (columns, rows) batches into UTF-8 CSV chunks, header first."""
+    csv_buffer = StringIO()
+    writer = csv.writer(csv_buffer)
+    header_written = False
+    for columns, rows in batches:
+        if not header_written:
+            writer.writerow([col.name for col in columns])
+            header_written = True
+        writer.writerows(rows)
+        yield csv_buffer.getvalue().encode()
+        csv_buffer.seek(0)
+        csv_buffer.truncate()
+
+
+def _arrow_type(type_code):
+    # Postgres type OIDs -> Arrow types; NUMERIC becomes float64 for notebooks
+    return {
+        16: pa.bool_(),
+        20: pa.int64(),
+        21: pa.int16(),
+        23: pa.int32(),
+        700: pa.float32(),
+        701: pa.float64(),
+        1700: pa.float64(),
+        1082: pa.date32(),
+        1114: pa.timestamp("us"),
+        1184: pa.timestamp("us", tz="UTC"),
+    }.get(type_code, pa.string())
+
+
+def _column(values, arrow_type):
+    if pa.types.is_floating(arrow_type):
+        values = [None if v is None else float(v) for v in values]
+    elif pa.types.is_string(arrow_type):
+        values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+    return pa.array(values, type=arrow_type)
+
+
+def encode_arrow(batches, fmt: str, compression: str = "zstd"):
+    """
+    Turns (columns, rows) batches into a Parquet file (fmt="parquet", one row
+    group per batch) or an Arrow IPC stream (fmt="arrow"), yielding bytes as
+    each batch is written. The schema comes from the cursor's column types.
+    """
+    sink = ChunkSink()
+    out = pa.PythonFile(sink, mode="w")
+    writer = None
+    try:
+        for columns, rows in batches:
+            if writer is None:
+                schema = pa.schema([(col.name, _arrow_type(col.type_code)) for col in columns])
+                if fmt == "parquet":
+                    writer = pq.ParquetWriter(out, schema, compression=compression)
+                else:
+                    writer = pa.ipc.new_stream(
+                        out, schema, options=pa.ipc.IpcWriteOptions(compression=compression)
+                    )
+            if rows:
+                values = list(zip(*rows))
+                writer.write_batch(pa.record_batch(
+                    [_column(values[i], field.type) for i, field in enumerate(schema)],
+                    schema=schema,
+                ))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+def iter_export(query, params, fmt: str = "csv", pooled: bool = False):
+    """Streams the result of `query` in the given export format."""
+    if fmt == "csv":
+        return encode_csv(iter_query_batches(query, params, CSV_BATCH_ROWS, pooled=pooled))
+    return encode_arrow(iter_query_batches(query, params, ARROW_BATCH_ROWS, pooled=pooled), fmt)
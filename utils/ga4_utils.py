@@ -0,0 +1,40 @@
+# utils/ga4_utils.py
+import numpy as np
+
+
+def decode_report(response, dimensions, metrics):
+    """
+    Decode a GA4 RunReportResponse into one typed array per column.
+
+    dimensions: list of column names, in request order.
+    metrics: list of (column, dtype) tuples, in request order.
+    Returns a dict of column -> numpy array, all of the same length.
+    """
+    # proto-plus wraps every nested message on access; the raw protobuf is much cheaper to walk
+    rows = getattr(response, "_pb", response).rows
+    row_count = len(rows)
+
+    columns = {}
+
+    if dimensions:
+        dim_values = np.array(
+            [value.value for row in rows for value in row.dimension_values],
+            dtype=object,
+        ).reshape(row_count, len(dimensions))
+        for i, column in enumerate(dimensions):
+            columns[column] = dim_values[:, i]
+
+    if metrics:
+        metric_values = np.array(
+            [value.value for row in rows for value in row.metric_values],
+            dtype=np.float64,
+        ).reshape(row_count, len(metrics))
+        for i, (column, dtype) in enumerate(metrics):
+            columns[column] = metric_values[:, i].astype(dtype)
+
+    return columns
+
+
+def per_user(numerator, active_users):
+    """Vectorized `round(numerator / max(active_users, 1), 2)`."""
+    return np.round(numerator / np.maximum(active_users, 1), 2)
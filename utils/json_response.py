@@ -0,0 +1,29 @@
+# utils/json_response.py
+from decimal import Decimal
+
+import orjson
+from fastapi.responses import JSONResponse
+
+# orjson handles date/datetime/UUID/numpy natively; NON_STR_KEYS allows e.g. date dict keys
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    orjson-backed JSON response, used as the app's default response class.
+    Returning it directly from a handler also skips FastAPI's
+    jsonable_encoder pass, which dominates on large nested payloads.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
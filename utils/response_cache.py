@@ -0,0 +1,198 @@
+# utils/response_cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from db.db import get_data_version
+from utils.json_response import dumps
+
+
+class ResponseCache:
+    """
+    Bounded LRU of encoded JSON bodies, limited by entry count and total bytes.
+    Keys carry the tenant's data generation, so an ingest (which bumps the
+    generation) makes every older entry for that tenant unreachable; those
+    entries are dropped as soon as the newer generation is seen.
+    Hit/miss counters are logged at most every `stats_seconds` (0 disables);
+    they cover every tenant, so they are not served over HTTP.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, stats_seconds: float = 0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats_seconds = stats_seconds
+        self._stats_logged_at = time.monotonic()
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _observe_generation(self, tenant_id, generation):
+        # caller holds the lock
+        known = self._generations.get(tenant_id)
+        if known is not None and generation <= known:
+            return
+        if known is not None:
+            stale = [key for key in self._entries if key[0] == tenant_id and key[1] < generation]
+            for key in stale:
+                self._bytes -= len(self._entries.pop(key))
+            self.invalidations += len(stale)
+        self._generations[tenant_id] = generation
+
+    def get(self, key):
+        with self._lock:
+            self._observe_generation(key[0], key[1])
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        self._maybe_log_stats()
+        return body
+
+    def _maybe_log_stats(self):
+        if not self.stats_seconds:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._stats_logged_at < self.stats_seconds:
+                return
+            self._stats_logged_at = now
+        stats = self.stats()
+        print(f"📈 Response cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"(hit ratio {stats['hit_ratio']}), {stats['entries']} entries / {stats['bytes']} bytes, "
+              f"{stats['evictions']} evictions, {stats['invalidations']} invalidations")
+
+    def put(self, key, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._observe_generation(key[0], key[1])
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key))
+            self._entries[key] = body
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024)),
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    stats_seconds=float(os.getenv("RESPONSE_CACHE_STATS_SECONDS", 300)),
+)
+
+
+def _normalize(params: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in params.items() if v is not None))
+
+
+def cache_key(tenant_id: str, generation: int, endpoint: str, params: dict) -> tuple:
+    # relative ranges ("7" days) move at midnight without an ingest, so the day is part of the key
+    return (tenant_id, generation, endpoint, str(date.today()), _normalize(params))
+
+
+def params_key(params: dict) -> str:
+    """Stable text form of request parameters, for keys stored outside this process."""
+    return "&".join(f"{k}={v}" for k, v in _normalize(params))
+
+
+def encode_json(result) -> bytes:
+    if isinstance(result, bytes):
+        return result
+    if isinstance(result, str):
+        return result.encode()
+    return dumps(result)
+
+
+def etag_for(key: tuple) -> str:
+    return 'W/"' + hashlib.sha1(repr(key).encode()).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # weak comparison: W/"x" matches "x"
+    def opaque(tag):
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    candidates = {opaque(tag) for tag in header.split(",")}
+    return "*" in candidates or opaque(etag) in candidates
+
+
+def cached_json(tenant_id: str, endpoint: str, params: dict, compute, request: Request = None) -> Response:
+    """
+    Serves `compute()` (a JSON-able result or pre-encoded JSON text) from the
+    response cache, computing and storing it on a miss.
+    With `request`, the response carries an ETag derived from the tenant's data
+    generation and the parameters, and a matching If-None-Match gets a 304
+    without touching the cache or the fact tables.
+    """
+    generation, _ = get_data_version(tenant_id)
+    key = cache_key(tenant_id, generation, endpoint, params)
+
+    headers = {}
+    if request is not None:
+        etag = etag_for(key)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(key)
+    if body is None:
+        body = encode_json(compute())
+        response_cache.put(key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def export_freshness(request: Request, tenant_id: str):
+    """
+    Conditional-GET support for exports, based on when the tenant's data last changed.
+    Returns (304 response or None, headers to send with the export).
+    """
+    _, updated_at = get_data_version(tenant_id)
+    if updated_at is None:
+        return None, {}
+
+    updated_at = updated_at.astimezone(timezone.utc).replace(microsecond=0)
+    headers = {"Last-Modified": format_datetime(updated_at, usegmt=True), "Cache-Control": "private, no-cache"}
+
+    since = request.headers.get("if-modified-since")
+    if since and not request.headers.get("if-none-match"):
+        try:
+            if updated_at <= parsedate_to_datetime(since):
+                return Response(status_code=304, headers=headers), headers
+        except (TypeError, ValueError):
+            pass
+    return None, headers
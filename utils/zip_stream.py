@@ -0,0 +1,108 @@
+# utils/zip_stream.py
+import queue
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ChunkSink:
+    """
+    Write-only file object with no tell/seek. zipfile detects that it cannot
+    seek back to patch local headers and writes data descriptors instead,
+    so every byte can be handed to the client as soon as it is produced.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries, compression=zipfile.ZIP_DEFLATED):
+    """
+    Yields a ZIP archive built from `entries`, an iterable of (name, chunks)
+    where chunks is an iterable of bytes. Only the chunk being compressed and
+    the central directory entries are held in memory.
+    """
+    sink = ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression) as zip_file:
+        for name, chunks in entries:
+            # sizes are unknown up front, so allow entries past 4 GB
+            with zip_file.open(name, "w", force_zip64=True) as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+_DONE = object()
+
+
+def prefetch_entries(entries, workers: int = 4, depth: int = 4):
+    """
+    Produces each entry's chunks on a worker thread, up to `depth` chunks
+    ahead, while yielding the entries in their original order. Memory stays
+    bounded by workers * depth chunks. If the consumer stops early, producers
+    are told to stop and release their connections.
+    """
+    entries = list(entries)
+    queues = [queue.Queue(maxsize=depth) for _ in entries]
+    stop = threading.Event()
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(chunks, q):
+        try:
+            for chunk in chunks:
+                if not put(q, chunk):
+                    return
+            put(q, _DONE)
+        except Exception as e:
+            put(q, e)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+
+    def consume(q):
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for (_, chunks), q in zip(entries, queues):
+            pool.submit(produce, chunks, q)
+        for (name, _), q in zip(entries, queues):
+            yield name, consume(q)
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)